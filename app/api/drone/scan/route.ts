@@ -1,14 +1,16 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { prisma } from '@/lib/prisma'
 import { uploadImage } from '@/lib/storage'
-import { callPestDetection } from '@/lib/ml-client'
+import { callPestDetection, streamPestDetectionBatch, PestDetectionResult } from '@/lib/ml-client'
 import { awardCoins, COIN_RULES } from '@/lib/coins'
 import { sendWhatsAppMessage } from '@/lib/whatsapp'
 
 /**
  * POST /api/drone/scan
  * Handles drone scan uploads: verifies device, saves image, detects pest,
- * saves scan record, awards coins, and notifies farmer via WhatsApp
+ * saves scan record, awards coins, and notifies farmer via WhatsApp.
+ * A flight may send several `image` fields; they are scored in one batch
+ * request and each scan is saved as soon as its result streams back.
  */
 export async function POST(request: NextRequest) {
   try {
@@ -35,11 +37,11 @@ export async function POST(request: NextRequest) {
 
     // Parse multipart form data
     const formData = await request.formData()
-    const imageFile = formData.get('image') as File
+    const imageFiles = formData.getAll('image').filter((entry): entry is File => entry instanceof File)
     const volunteerId = formData.get('volunteer_id') as string
     const farmerId = formData.get('farmer_id') as string
 
-    if (!imageFile || !volunteerId || !farmerId) {
+    if (imageFiles.length === 0 || !volunteerId || !farmerId) {
       return NextResponse.json(
         { error: 'Missing required fields', code: 'MISSING_FIELDS' },
         { status: 400 }
@@ -70,65 +72,98 @@ export async function POST(request: NextRequest) {
       )
     }
 
-    // Convert file to buffer
-    const arrayBuffer = await imageFile.arrayBuffer()
-    const imageBuffer = Buffer.from(arrayBuffer)
+    // Convert files to buffers
+    const imageBuffers = await Promise.all(
+      imageFiles.map(async (imageFile) => Buffer.from(await imageFile.arrayBuffer()))
+    )
 
-    // Upload image to Supabase Storage
+    // Upload images to Supabase Storage
     const timestamp = Date.now()
-    const path = `drone/${farmerId}/${timestamp}.jpg`
-    const publicUrl = await uploadImage(imageBuffer, path)
+    const publicUrls = await Promise.all(
+      imageBuffers.map((imageBuffer, index) => {
+        const path = imageBuffers.length === 1
+          ? `drone/${farmerId}/${timestamp}.jpg`
+          : `drone/${farmerId}/${timestamp}-${index}.jpg`
+        return uploadImage(imageBuffer, path)
+      })
+    )
 
-    // Call pest detection ML service
-    const result = await callPestDetection(imageBuffer)
+    const recordScan = async (result: PestDetectionResult, publicUrl: string) => {
+      // Save scan to database
+      const scan = await prisma.scan.create({
+        data: {
+          farmerId,
+          volunteerId,
+          imageUrl: publicUrl,
+          diseaseDetected: result.disease,
+          confidence: result.confidence,
+          cropType: result.crop,
+          severity: result.severity,
+          quickFix: result.quick_fix,
+          permanentFix: result.permanent_fix,
+          scanType: 'drone',
+          rawModelOutput: result as any,
+        },
+      })
 
-    // Save scan to database
-    const scan = await prisma.scan.create({
-      data: {
-        farmerId,
+      // Award coins to volunteer
+      await awardCoins(
         volunteerId,
-        imageUrl: publicUrl,
-        diseaseDetected: result.disease,
-        confidence: result.confidence,
-        cropType: result.crop,
-        severity: result.severity,
-        quickFix: result.quick_fix,
-        permanentFix: result.permanent_fix,
-        scanType: 'drone',
-        rawModelOutput: result as any,
-      },
-    })
+        COIN_RULES.drone_scan,
+        'scan_complete',
+        scan.id,
+        'Drone scan completed'
+      )
 
-    // Award coins to volunteer
-    await awardCoins(
-      volunteerId,
-      COIN_RULES.drone_scan,
-      'scan_complete',
-      scan.id,
-      'Drone scan completed'
-    )
+      // Send diagnosis to farmer's WhatsApp
+      if (farmer.phone) {
+        const severityMap: Record<string, string> = {
+          low: 'Kam',
+          medium: 'Madhyam',
+          high: 'Adhik',
+        }
+
+        const whatsappMessage = `🌿 *Drone Jaanch Report*\n\n*Bimari:* ${result.disease}\n*Vishwas:* ${Math.round(result.confidence * 100)}%\n*Gambhirta:* ${severityMap[result.severity] || result.severity}\n\n⚡ *Turant Upay:*\n${result.quick_fix}\n\n🌱 *Sthayi Samadhan:*\n${result.permanent_fix}\n\nJaanch ki gayi: ${new Date().toLocaleDateString('hi-IN')}`
 
-    // Send diagnosis to farmer's WhatsApp
-    if (farmer.phone) {
-      const severityMap: Record<string, string> = {
-        low: 'Kam',
-        medium: 'Madhyam',
-        high: 'Adhik',
+        await sendWhatsAppMessage(farmer.phone, {
+          type: 'text',
+          text: { body: whatsappMessage },
+        })
       }
 
-      const whatsappMessage = `🌿 *Drone Jaanch Report*\n\n*Bimari:* ${result.disease}\n*Vishwas:* ${Math.round(result.confidence * 100)}%\n*Gambhirta:* ${severityMap[result.severity] || result.severity}\n\n⚡ *Turant Upay:*\n${result.quick_fix}\n\n🌱 *Sthayi Samadhan:*\n${result.permanent_fix}\n\nJaanch ki gayi: ${new Date().toLocaleDateString('hi-IN')}`
+      return scan
+    }
 
-      await sendWhatsAppMessage(farmer.phone, {
-        type: 'text',
-        text: { body: whatsappMessage },
-      })
+    if (imageBuffers.length === 1) {
+      // Call pest detection ML service
+      const result = await callPestDetection(imageBuffers[0])
+      const scan = await recordScan(result, publicUrls[0])
+
+      return NextResponse.json({
+        success: true,
+        scanId: scan.id,
+        result,
+      }, { status: 201 })
+    }
+
+    // Whole flight: save each scan as soon as its result arrives
+    const scans: Array<{ index: number; scanId: string; result: PestDetectionResult }> = []
+    const failed: Array<{ index: number; error: string; code?: string }> = []
+
+    for await (const record of streamPestDetectionBatch(imageBuffers)) {
+      if (record.status !== 'ok' || !record.result) {
+        failed.push({ index: record.index, error: record.error || 'Failed to process image', code: record.code })
+        continue
+      }
+      const scan = await recordScan(record.result, publicUrls[record.index])
+      scans.push({ index: record.index, scanId: scan.id, result: record.result })
     }
 
     return NextResponse.json({
-      success: true,
-      scanId: scan.id,
-      result,
-    }, { status: 201 })
+      success: scans.length > 0,
+      scans: scans.sort((a, b) => a.index - b.index),
+      failed,
+    }, { status: scans.length > 0 ? 201 : 502 })
   } catch (error) {
     console.error('Drone scan error:', error)
     return NextResponse.json(
@@ -2,18 +2,62 @@ const ML_SERVICE_URL = process.env.ML_SERVICE_URL!
 const ML_INTERNAL_KEY = process.env.ML_INTERNAL_KEY!
 
 export async function callPestDetection(imageBuffer: Buffer): Promise<PestDetectionResult> {
+  // Raw image body - the service identifies the format from the bytes and
+  // skips multipart parsing
+  const response = await fetch(`${ML_SERVICE_URL}/predict/pest`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/octet-stream',
+      'X-Internal-Key': ML_INTERNAL_KEY,
+    },
+    body: imageBuffer,
+  })
+
+  if (!response.ok) throw new Error(`ML service error: ${response.status}`)
+  return response.json()
+}
+
+/**
+ * Scores many images in one request. The ML service streams one NDJSON record
+ * per image as soon as its batch is scored (in completion order, not upload
+ * order), so callers can persist results while the rest are still running.
+ */
+export async function* streamPestDetectionBatch(
+  imageBuffers: Buffer[]
+): AsyncGenerator<PestBatchRecord> {
   const formData = new FormData()
-  const blob = new Blob([imageBuffer], { type: 'image/jpeg' })
-  formData.append('image', blob, 'image.jpg')
+  imageBuffers.forEach((imageBuffer, index) => {
+    const blob = new Blob([imageBuffer], { type: 'image/jpeg' })
+    formData.append('images', blob, `image-${index}.jpg`)
+  })
 
-  const response = await fetch(`${ML_SERVICE_URL}/predict/pest`, {
+  const response = await fetch(`${ML_SERVICE_URL}/predict/pest/batch`, {
     method: 'POST',
     headers: { 'X-Internal-Key': ML_INTERNAL_KEY },
     body: formData,
   })
 
-  if (!response.ok) throw new Error(`ML service error: ${response.status}`)
-  return response.json()
+  if (!response.ok || !response.body) throw new Error(`ML service error: ${response.status}`)
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ''
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffered += decoder.decode(value, { stream: true })
+
+    let newline = buffered.indexOf('\n')
+    while (newline >= 0) {
+      const line = buffered.slice(0, newline).trim()
+      buffered = buffered.slice(newline + 1)
+      if (line) yield JSON.parse(line) as PestBatchRecord
+      newline = buffered.indexOf('\n')
+    }
+  }
+
+  if (buffered.trim()) yield JSON.parse(buffered) as PestBatchRecord
 }
 
 export async function callSoilPrediction(data: SoilInputData): Promise<SoilPredictionResult> {
@@ -40,6 +84,15 @@ export interface PestDetectionResult {
   treatment_id: string
 }
 
+export interface PestBatchRecord {
+  index: number
+  filename: string | null
+  status: 'ok' | 'error'
+  result?: PestDetectionResult
+  error?: string
+  code?: string
+}
+
 export interface SoilInputData {
   nitrogen: number
   phosphorus: number
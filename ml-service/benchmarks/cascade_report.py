@@ -0,0 +1,211 @@
+"""Threshold sweep for the confidence-gated pest cascade.
+
+Runs every sample image through the first stage and the full model once
+(batch size 1, best of ``--repeats``) and then, for each threshold, reports
+what the cascade would have done:
+
+- first_share: images the first stage answers (top-1 confidence >= threshold)
+- mean_ms / speedup: mean model time per image, first stage plus the full
+  model for escalated images, against the full model alone
+- agreement: cascade top-1 equal to the full model's top-1, over all images
+  and over the first-stage answers only (the escalated ones agree by
+  construction)
+
+Preprocessing is shared and left out of the times. Finally the threshold
+``--check`` is run through ``PestDetectionModel.predict_batch`` with the
+cascade on, to confirm the served stage counts match the sweep.
+
+With ``--real`` the models are ``weights/pest_model_best.h5`` and
+``weights/pest_first_stage.tflite`` (tools/build_pest_first_stage.py).
+Otherwise both are stand-ins fitted to the samples (``stand_in_models``),
+the first stage exported as a dynamic-range quantized TFLite model.
+Stand-in agreement figures only exercise the mechanics; measure real ones
+on real photos.
+
+Run from the ml-service directory:
+
+    python -m benchmarks.cascade_report --synthetic 200
+    python -m benchmarks.cascade_report --real --images path/to/sample_dir --output /tmp/cascade.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+from benchmarks import stand_ins
+from benchmarks.preprocess_parity import load_samples
+from models.pest_detection import PestDetectionModel
+from models.pest_engines import GraphEngine, KerasEngine, create_engine
+
+DEFAULT_THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99]
+
+def stand_in_models(args, batch: np.ndarray, num_classes: int) -> tuple:
+    """Keras (full, first stage) stand-ins over the same random convolutions.
+
+    The full model standardizes its pooled features over ``batch`` and maps
+    them through a random output layer, so classes and confidences vary the
+    way a trained model's do (a raw random CNN gives every image the same
+    class at ~1/38). The first stage runs the same convolutions on a
+    half-resolution copy, like the distilled student's downscaled input,
+    with its output layer fitted to the full model's logits by ridge
+    regression, a closed-form stand-in for distillation.
+    """
+    import tensorflow as tf
+
+    trunk = stand_ins.build_pest_keras_model(num_classes, tuple(args.filters), args.seed)
+    convs = [layer for layer in trunk.layers if isinstance(layer, tf.keras.layers.Conv2D)]
+    rng = np.random.default_rng(args.seed)
+
+    models, logits = [], None
+    for downscale in (False, True):
+        inputs = tf.keras.Input(shape=(224, 224, 3))
+        x = tf.keras.layers.AveragePooling2D(2)(inputs) if downscale else inputs
+        for conv in convs:
+            x = conv(x)
+        pooled = tf.keras.layers.GlobalAveragePooling2D()(x)
+
+        features = tf.keras.Model(inputs, pooled)(batch).numpy()
+        mean, var = features.mean(axis=0), features.var(axis=0) + 1e-12
+        standardized = (features - mean) / np.sqrt(var)
+        width = features.shape[1]
+        if logits is None:
+            kernel = rng.normal(size=(width, num_classes)) * args.sharpen / np.sqrt(width)
+            logits = standardized @ kernel
+        else:
+            gram = standardized.T @ standardized + args.ridge * len(batch) * np.eye(width)
+            kernel = np.linalg.solve(gram, standardized.T @ logits)
+
+        dense = tf.keras.layers.Dense(num_classes, activation='softmax')
+        outputs = dense(tf.keras.layers.Normalization(mean=mean, variance=var)(pooled))
+        dense.set_weights([kernel.astype(np.float32), np.zeros(num_classes, dtype=np.float32)])
+        models.append(tf.keras.Model(inputs, outputs))
+    return tuple(models)
+
+def build_stages(args, samples: list, workdir: str) -> tuple:
+    """(full model, first-stage engine) for the sweep."""
+    if args.real:
+        full = PestDetectionModel(engine=args.full_engine)
+        full.load()
+        path = args.first_stage or os.path.join(os.path.dirname(__file__), '..', 'weights', 'pest_first_stage.tflite')
+        return full, create_engine('tflite', os.path.abspath(path))
+
+    from models.pest_export import convert_tflite
+
+    full = stand_ins.build_pest_model(filters=(8,), seed=args.seed)
+    batch = np.concatenate([full.preprocess_image(data) for _, data in samples])
+    full.model, first_model = stand_in_models(args, batch, len(full.class_labels))
+    if args.full_engine == 'graph':
+        full.engine = GraphEngine(full.model, (1, 2, 4, 8, 16))
+    else:
+        full.engine = KerasEngine(full.model)
+    path = convert_tflite(first_model, os.path.join(workdir, 'pest_first_stage.tflite'), quantize=True)
+    return full, create_engine('tflite', path)
+
+def time_ms(engine, batch: np.ndarray, repeats: int) -> tuple:
+    """Best-of-``repeats`` milliseconds and the output for one batch."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = engine.predict(batch)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, np.asarray(output)
+
+def sweep(first_ms, full_ms, first_probs, full_probs, thresholds) -> list:
+    confidence = first_probs.max(axis=1)
+    first_top1 = first_probs.argmax(axis=1)
+    full_top1 = full_probs.argmax(axis=1)
+    full_only_ms = float(full_ms.mean())
+    rows = []
+    for threshold in thresholds:
+        answered = confidence >= threshold
+        cascade_top1 = np.where(answered, first_top1, full_top1)
+        mean_ms = float((first_ms + np.where(answered, 0.0, full_ms)).mean())
+        rows.append({
+            'threshold': threshold,
+            'first_share': round(float(answered.mean()), 4),
+            'mean_ms': round(mean_ms, 2),
+            'speedup': round(full_only_ms / mean_ms, 2),
+            'agreement': round(float((cascade_top1 == full_top1).mean()), 4),
+            'first_agreement': round(float((first_top1 == full_top1)[answered].mean()), 4) if answered.any() else None,
+        })
+    return rows
+
+def check_served(full, first_stage, images: list, threshold: float) -> dict:
+    """Stage counts from the model's own cascade at ``threshold``."""
+    full.cascade_threshold = threshold
+    full.set_first_stage(first_stage, 'report')
+    results = []
+    for i in range(0, len(images), 16):
+        results.extend(full.predict_batch(images[i:i + 16]))
+    stages = [r['stage'] for r in results]
+    return {'threshold': threshold, 'first': stages.count('first'), 'full': stages.count('full')}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', help='Directory of sample images')
+    parser.add_argument('--synthetic', type=int, default=100, help='Synthetic images when --images is not given')
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=960)
+    parser.add_argument('--real', action='store_true', help='Use the real weights and first-stage artifact')
+    parser.add_argument('--first-stage', help='First-stage .tflite for --real (default weights/pest_first_stage.tflite)')
+    parser.add_argument('--full-engine', default='graph', choices=['keras', 'graph', 'tflite', 'onnx'],
+                        help='Full model engine (stand-ins: keras or graph)')
+    parser.add_argument('--filters', type=int, nargs='+', default=[32, 64, 128, 256], help='Stand-in CNN filters')
+    parser.add_argument('--sharpen', type=float, default=4.0, help='Stand-in logit scale (higher: more confident)')
+    parser.add_argument('--ridge', type=float, default=0.1, help='Stand-in first-stage fit regularization')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=DEFAULT_THRESHOLDS)
+    parser.add_argument('--check', type=float, default=0.9, help='Threshold to run through predict_batch')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write JSON results to this path')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    samples = load_samples(args)
+    with tempfile.TemporaryDirectory() as workdir:
+        full, first_stage = build_stages(args, samples, workdir)
+        batch = np.concatenate([full.preprocess_image(data) for _, data in samples])
+        for engine in (first_stage, full.engine):
+            engine.predict(batch[:1])
+
+        first_ms, full_ms, first_probs, full_probs = [], [], [], []
+        for image in batch:
+            ms, probs = time_ms(first_stage, image[None], args.repeats)
+            first_ms.append(ms)
+            first_probs.append(probs[0])
+            ms, probs = time_ms(full.engine, image[None], args.repeats)
+            full_ms.append(ms)
+            full_probs.append(probs[0])
+        rows = sweep(np.array(first_ms), np.array(full_ms), np.array(first_probs), np.array(full_probs), args.thresholds)
+        check = check_served(full, first_stage, [data for _, data in samples], args.check)
+
+    print(f"{len(samples)} images, first stage {np.median(first_ms):.2f} ms, full model {np.median(full_ms):.2f} ms (median)")
+    print(f"\n{'threshold':>9} {'first_share':>11} {'mean_ms':>8} {'speedup':>7} {'agreement':>9} {'first_agree':>11}")
+    for row in rows:
+        first_agreement = '-' if row['first_agreement'] is None else f"{row['first_agreement']:.4f}"
+        print(f"{row['threshold']:>9} {row['first_share']:>11.4f} {row['mean_ms']:>8.2f} {row['speedup']:>7.2f} "
+              f"{row['agreement']:>9.4f} {first_agreement:>11}")
+    expected = next((r for r in rows if r['threshold'] == args.check), None)
+    print(f"\npredict_batch at {check['threshold']}: {check['first']} first stage, {check['full']} full"
+          + (f" (sweep: {round(expected['first_share'] * len(samples))} first stage)" if expected else ''))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'settings': {name: value for name, value in vars(args).items() if name != 'output'},
+                'first_ms_median': round(float(np.median(first_ms)), 3),
+                'full_ms_median': round(float(np.median(full_ms)), 3),
+                'sweep': rows,
+                'served_check': check,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""Tail latency of mixed pest/soil traffic for each inference backend.
+
+Drives the real FastAPI app in-process (httpx ASGI transport) with local
+stand-in models and reports p50/p95/p99 per endpoint, plus the latency of a
+/health probe running alongside. ``inline`` reproduces the old behaviour of
+calling the models on the event loop.
+
+Run from the ml-service directory:
+
+    python -m benchmarks.executor_latency --backends inline thread process
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault('INTERNAL_API_KEY', 'benchmark-key')
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+import httpx
+
+import main
+from benchmarks import stand_ins
+from serving.batching import MicroBatcher
+from serving.executor import InferenceExecutor
+
+HEADERS = {'X-Internal-Key': os.environ['INTERNAL_API_KEY']}
+
+# Per-request INFO lines would dominate the output
+logging.getLogger('main').setLevel(logging.WARNING)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {'count': 0}
+    values = np.array(samples)
+    return {
+        'count': len(values),
+        'p50_ms': round(float(np.percentile(values, 50)), 2),
+        'p95_ms': round(float(np.percentile(values, 95)), 2),
+        'p99_ms': round(float(np.percentile(values, 99)), 2),
+        'max_ms': round(float(values.max()), 2),
+    }
+
+async def install(backend: str, workers: int, batch_size: int, batch_wait_ms: float):
+    """Put stand-in models, executor and batcher into main's globals."""
+    main.pest_model = stand_ins.build_pest_model()
+    main.soil_model = stand_ins.build_soil_model()
+    main.service_start_time = time.time()
+    main.limiter.enabled = False
+    main.startup.mark_ready('pest')
+    main.startup.mark_ready('soil')
+
+    executor = InferenceExecutor(
+        backend=backend,
+        workers=workers,
+        factories={'pest': stand_ins.build_pest_model, 'soil': stand_ins.build_soil_model},
+    )
+    executor.start({'pest': main.pest_model, 'soil': main.soil_model})
+    batcher = MicroBatcher(
+        lambda images: executor.run('pest', 'predict_batch', images),
+        max_batch_size=batch_size,
+        max_wait_ms=batch_wait_ms,
+        name='pest',
+    )
+    await batcher.start()
+    main.inference_executor = executor
+    main.pest_batcher = batcher
+    return executor, batcher
+
+async def run_backend(args, backend: str, images: list) -> dict:
+    executor, batcher = await install(backend, args.workers, args.batch_size, args.batch_wait_ms)
+    rng = np.random.default_rng(args.seed)
+    latencies = {'pest': [], 'soil': [], 'health': []}
+    errors = 0
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def pest_call():
+            files = {'image': ('frame.jpg', images[int(rng.integers(len(images)))], 'image/jpeg')}
+            return await client.post('/predict/pest', files=files, headers=HEADERS)
+
+        async def soil_call():
+            return await client.post('/predict/soil', json=stand_ins.make_soil_reading(rng), headers=HEADERS)
+
+        # Warm up both models (and the process workers) outside the measurement
+        for _ in range(3):
+            await pest_call()
+            await soil_call()
+
+        kinds = ['pest' if rng.random() < args.pest_ratio else 'soil' for _ in range(args.requests)]
+        slots = asyncio.Semaphore(args.concurrency)
+        done = asyncio.Event()
+
+        async def one(kind: str):
+            nonlocal errors
+            async with slots:
+                start = time.perf_counter()
+                response = await (pest_call() if kind == 'pest' else soil_call())
+                latencies[kind].append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        async def health_probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get('/health')
+                latencies['health'].append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(args.health_interval_ms / 1000)
+
+        probe = asyncio.create_task(health_probe())
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(one(kind) for kind in kinds))
+        wall_s = time.perf_counter() - wall_start
+        done.set()
+        await probe
+
+    await batcher.stop()
+    executor.shutdown()
+    return {
+        'backend': backend,
+        'workers': args.workers,
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'errors': errors,
+        'throughput_rps': round(args.requests / wall_s, 2),
+        'pest': percentiles(latencies['pest']),
+        'soil': percentiles(latencies['soil']),
+        'health': percentiles(latencies['health']),
+    }
+
+def print_table(results: list):
+    print(f"{'backend':<8} {'rps':>8}  {'endpoint':<7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for result in results:
+        for endpoint in ('pest', 'soil', 'health'):
+            row = result[endpoint]
+            if not row.get('count'):
+                continue
+            print(
+                f"{result['backend']:<8} {result['throughput_rps']:>8}  {endpoint:<7} "
+                f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}"
+            )
+
+async def run(args):
+    images = [stand_ins.make_jpeg(args.width, args.height, seed=i) for i in range(8)]
+    results = []
+    for backend in args.backends:
+        results.append(await run_backend(args, backend, images))
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=['inline', 'thread'],
+                        choices=['inline', 'thread', 'process'])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--pest-ratio', type=float, default=0.5, help='Share of pest requests (0-1)')
+    parser.add_argument('--batch-size', type=int, default=main.PEST_BATCH_MAX_SIZE)
+    parser.add_argument('--batch-wait-ms', type=float, default=main.PEST_BATCH_MAX_WAIT_MS)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=960)
+    parser.add_argument('--health-interval-ms', type=float, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write JSON results to this path')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,330 @@
+"""Concurrency ramp against the real server: throughput, latency and error curves.
+
+Starts ``python main.py`` on a stand-in model bundle (or targets ``--url``),
+then for each ``--concurrency`` level runs that many closed-loop clients for
+``--step-seconds``, sending the ``--mix`` of pest, soil and soil batch
+requests. Pest uploads are drawn from ``--image-dir`` (real files, replayed
+as-is) or from JPEGs generated to the ``--image-sizes`` distribution. Every
+level reports requests per second, p50/p95/p99 latency and the error rate;
+the run ends with the level where throughput stopped growing.
+
+The server runs with ``RATE_LIMIT_ENABLED=false``, since the 100/minute
+per-IP limit would otherwise turn everything past the first 100 requests a
+minute into 429s. ``--rate-limit on`` keeps it to see that behaviour; 429s
+are always counted separately from other errors. Prediction caches are off
+unless ``--keep-caches``, so repeated images reach the model.
+
+Several server configurations can be compared in one run, each given as
+``name:VAR=value,VAR=value`` environment overrides:
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --concurrency 1 4 16 64 --mix pest=0.3,soil=0.7
+    python -m benchmarks.load_test --config batch16:PEST_BATCH_MAX_SIZE=16 --config batch4:PEST_BATCH_MAX_SIZE=4
+    python -m benchmarks.load_test --image-dir ~/drone_survey/ --csv /tmp/curves.csv
+    python -m benchmarks.load_test --url http://localhost:8000 --api-key ...   # an already running server
+
+Run from the ml-service directory. The load generator shares the machine
+with the server, so on small hosts it takes CPU from it; ``--url`` to a
+server on another host avoids that.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+import httpx
+
+from benchmarks import stand_ins
+from benchmarks.prefork_scaling import prepare_stand_in_bundle, wait_ready
+
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), '..')
+REQUEST_KINDS = ('pest', 'soil', 'soil_batch')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# Phone photos to drone frames; weights are the share of uploads
+DEFAULT_IMAGE_SIZES = '640x480:0.15,1280x960:0.35,1920x1080:0.2,4000x3000:0.25,5472x3648:0.05'
+
+def parse_weights(spec: str, names) -> dict:
+    """``"a=0.3,b=0.7"`` -> normalized weights, for the request mix."""
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, value = item.partition('=')
+        if name not in names:
+            raise ValueError(f"Unknown request kind '{name}' in '{spec}'. Expected one of {names}")
+        weights[name] = float(value)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f"Request mix '{spec}' has no positive weight")
+    return {name: weight / total for name, weight in weights.items() if weight > 0}
+
+def parse_image_sizes(spec: str) -> list:
+    """``"1280x960:0.5,4000x3000:0.5"`` -> [((width, height), weight), ...]."""
+    sizes = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        size, _, weight = item.partition(':')
+        width, _, height = size.lower().partition('x')
+        sizes.append(((int(width), int(height)), float(weight or 1)))
+    return sizes
+
+def parse_config(spec: str) -> tuple:
+    """``"name:VAR=value,VAR=value"`` -> (name, {VAR: value})."""
+    name, _, overrides = spec.partition(':')
+    env = {}
+    for item in filter(None, (part.strip() for part in overrides.split(','))):
+        key, _, value = item.partition('=')
+        env[key.strip()] = value.strip()
+    return name, env
+
+def image_pool(args) -> tuple:
+    """Upload bodies and their sampling weights."""
+    if args.image_dir:
+        paths = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(os.path.expanduser(args.image_dir))
+            for name in names if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not paths:
+            raise ValueError(f"No images in {args.image_dir}")
+        images = []
+        for path in paths[:args.max_images]:
+            with open(path, 'rb') as f:
+                images.append(f.read())
+        return images, np.full(len(images), 1 / len(images))
+
+    images, weights = [], []
+    for (width, height), weight in parse_image_sizes(args.image_sizes):
+        for seed in range(args.images_per_size):
+            images.append(stand_ins.make_jpeg(width, height, seed=seed))
+            weights.append(weight / args.images_per_size)
+    weights = np.array(weights)
+    return images, weights / weights.sum()
+
+def latency_summary(samples: list) -> dict:
+    if not samples:
+        return {'count': 0}
+    values = np.array(samples)
+    return {
+        'count': len(values),
+        'p50_ms': round(float(np.percentile(values, 50)), 1),
+        'p95_ms': round(float(np.percentile(values, 95)), 1),
+        'p99_ms': round(float(np.percentile(values, 99)), 1),
+    }
+
+class LoadGenerator:
+    """Closed-loop clients sending the configured request mix."""
+
+    def __init__(self, client: httpx.AsyncClient, args, images: list, image_weights: np.ndarray):
+        self.client = client
+        self.args = args
+        self.images = images
+        self.image_weights = image_weights
+        self.mix = parse_weights(args.mix, REQUEST_KINDS)
+        self.headers = {'X-Internal-Key': args.api_key}
+        self.rng = np.random.default_rng(args.seed)
+        self.batch_rng = np.random.default_rng(args.seed + 1)
+
+    def _soil_batch(self) -> dict:
+        readings = [stand_ins.make_soil_reading(self.batch_rng) for _ in range(self.args.soil_batch_rows)]
+        return {name: [reading[name] for reading in readings] for name in readings[0]}
+
+    async def _send(self, kind: str) -> httpx.Response:
+        if kind == 'pest':
+            image = self.images[self.rng.choice(len(self.images), p=self.image_weights)]
+            files = {'image': ('upload.jpg', image, 'image/jpeg')}
+            return await self.client.post('/predict/pest', files=files, headers=self.headers)
+        if kind == 'soil':
+            return await self.client.post('/predict/soil', json=stand_ins.make_soil_reading(self.rng),
+                                          headers=self.headers)
+        return await self.client.post('/predict/soil/batch', json=self._soil_batch(), headers=self.headers)
+
+    async def run_level(self, concurrency: int, seconds: float) -> dict:
+        kinds = list(self.mix)
+        probabilities = np.array([self.mix[kind] for kind in kinds])
+        latencies = {kind: [] for kind in kinds}
+        outcomes = {'ok': 0, 'rate_limited': 0, 'errors': 0, 'timeouts': 0}
+        deadline = time.perf_counter() + seconds
+
+        async def client_loop():
+            while time.perf_counter() < deadline:
+                kind = kinds[self.rng.choice(len(kinds), p=probabilities)]
+                start = time.perf_counter()
+                try:
+                    response = await self._send(kind)
+                except httpx.TimeoutException:
+                    outcomes['timeouts'] += 1
+                    continue
+                except httpx.TransportError:
+                    outcomes['errors'] += 1
+                    continue
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if response.status_code == 200:
+                    outcomes['ok'] += 1
+                    latencies[kind].append(elapsed_ms)
+                elif response.status_code == 429:
+                    outcomes['rate_limited'] += 1
+                else:
+                    outcomes['errors'] += 1
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        wall_s = time.perf_counter() - wall_start
+        total = sum(outcomes.values())
+        every = [value for samples in latencies.values() for value in samples]
+        return {
+            'concurrency': concurrency,
+            'requests': total,
+            'throughput_rps': round(outcomes['ok'] / wall_s, 2),
+            'error_rate': round((outcomes['errors'] + outcomes['timeouts']) / total, 4) if total else 0.0,
+            'rate_limited_rate': round(outcomes['rate_limited'] / total, 4) if total else 0.0,
+            **outcomes,
+            'all': latency_summary(every),
+            **{kind: latency_summary(samples) for kind, samples in latencies.items()},
+        }
+
+def server_env(args, bundle_dir: str, overrides: dict) -> dict:
+    env = dict(
+        os.environ,
+        PORT=str(args.port),
+        SERVER_HOST='127.0.0.1',
+        MODEL_BUNDLE='on',
+        MODEL_BUNDLE_DIR=bundle_dir,
+        PEST_ENGINE=args.pest_engine,
+        INTERNAL_API_KEY=args.api_key,
+        RATE_LIMIT_ENABLED='true' if args.rate_limit == 'on' else 'false',
+    )
+    if not args.keep_caches:
+        env.update(PEST_CACHE_MAX_MB='0', SOIL_CACHE_MAX_MB='0')
+    env.update(overrides)
+    return env
+
+def saturation(levels: list) -> dict:
+    """The level after which more clients stopped adding 5% throughput."""
+    best = levels[0]
+    for level in levels[1:]:
+        if level['throughput_rps'] < best['throughput_rps'] * 1.05:
+            break
+        best = level
+    return {'concurrency': best['concurrency'], 'throughput_rps': best['throughput_rps'],
+            'p99_ms': best['all'].get('p99_ms'), 'saturated': best is not levels[-1]}
+
+async def run_config(args, name: str, overrides: dict, bundle_dir: str, images: list, weights: np.ndarray) -> dict:
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server = subprocess.Popen([sys.executable, 'main.py'], cwd=SERVICE_DIR,
+                                  env=server_env(args, bundle_dir, overrides),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        base_url = f'http://127.0.0.1:{args.port}'
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    levels = []
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            if server is not None:
+                await wait_ready(client, server, int(overrides.get('SERVER_WORKERS', 1)), args.ready_timeout)
+            generator = LoadGenerator(client, args, images, weights)
+            # Untimed pass so the first level does not pay for connection setup and warm-up
+            await generator.run_level(min(args.concurrency), args.warmup_seconds)
+            for concurrency in args.concurrency:
+                level = await generator.run_level(concurrency, args.step_seconds)
+                levels.append(level)
+                print(f"{name:<12} {concurrency:>5} {level['throughput_rps']:>8} {level['all'].get('p50_ms', '-'):>8} "
+                      f"{level['all'].get('p95_ms', '-'):>8} {level['all'].get('p99_ms', '-'):>8} "
+                      f"{level['error_rate']:>7.2%} {level['rate_limited_rate']:>7.2%}", flush=True)
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+    return {'name': name, 'overrides': overrides, 'levels': levels, 'saturation': saturation(levels)}
+
+def write_csv(path: str, results: list):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['config', 'concurrency', 'kind', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms',
+                         'count', 'error_rate', 'rate_limited_rate'])
+        for result in results:
+            for level in result['levels']:
+                for kind in ('all', *REQUEST_KINDS):
+                    if kind not in level or not level[kind].get('count'):
+                        continue
+                    row = level[kind]
+                    writer.writerow([result['name'], level['concurrency'], kind, level['throughput_rps'],
+                                     row['p50_ms'], row['p95_ms'], row['p99_ms'], row['count'],
+                                     level['error_rate'], level['rate_limited_rate']])
+
+async def run(args):
+    configs = [parse_config(spec) for spec in args.config] or [('default', {})]
+    if args.url and (len(configs) > 1 or configs[0][1]):
+        raise SystemExit("--config needs a server started by this script; drop --url")
+    images, weights = image_pool(args)
+    sizes = np.array([len(image) for image in images])
+    print(f"{len(images)} upload images, {np.average(sizes, weights=weights) / 1024:.0f}KB average upload")
+
+    print(f"\n{'config':<12} {'conc':>5} {'rps':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'errors':>7} {'429s':>7}")
+    with tempfile.TemporaryDirectory() as scratch:
+        bundle_dir = args.bundle_dir
+        if args.url is None and bundle_dir is None:
+            prepare_stand_in_bundle(scratch, args)
+            bundle_dir = args.bundle_dir
+        results = [await run_config(args, name, overrides, bundle_dir, images, weights) for name, overrides in configs]
+
+    print()
+    for result in results:
+        point = result['saturation']
+        where = "stops growing at" if point['saturated'] else "still growing at the highest level,"
+        print(f"{result['name']}: throughput {where} {point['concurrency']} concurrent clients, "
+              f"{point['throughput_rps']} req/s, p99 {point['p99_ms']}ms")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'mix': parse_weights(args.mix, REQUEST_KINDS), 'cpu_count': os.cpu_count(),
+                       'step_seconds': args.step_seconds, 'configs': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.csv:
+        write_csv(args.csv, results)
+        print(f"Curves written to {args.csv}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--step-seconds', type=float, default=20, help='Duration of each concurrency level')
+    parser.add_argument('--warmup-seconds', type=float, default=5)
+    parser.add_argument('--mix', default='pest=0.4,soil=0.55,soil_batch=0.05',
+                        help='Request proportions over pest, soil and soil_batch')
+    parser.add_argument('--soil-batch-rows', type=int, default=100)
+    parser.add_argument('--image-sizes', default=DEFAULT_IMAGE_SIZES,
+                        help='WIDTHxHEIGHT:weight list for generated uploads')
+    parser.add_argument('--images-per-size', type=int, default=4)
+    parser.add_argument('--image-dir', help='Replay the images in this directory instead')
+    parser.add_argument('--max-images', type=int, default=200, help='Most files read from --image-dir')
+    parser.add_argument('--config', action='append', default=[],
+                        help='name:VAR=value,... server environment to test (repeatable)')
+    parser.add_argument('--pest-engine', default='graph', choices=['graph', 'tflite'])
+    parser.add_argument('--rate-limit', default='off', choices=['off', 'on'],
+                        help='Keep the 100/minute limiter on (429s are reported separately)')
+    parser.add_argument('--keep-caches', action='store_true', help='Leave the prediction caches on')
+    parser.add_argument('--bundle-dir', help='Model bundle to serve (default: a stand-in bundle)')
+    parser.add_argument('--url', help='Target a running server instead of starting one')
+    parser.add_argument('--api-key', default=os.getenv('INTERNAL_API_KEY', 'benchmark-key'))
+    parser.add_argument('--port', type=int, default=8392)
+    parser.add_argument('--timeout', type=float, default=60, help='Per-request timeout in seconds')
+    parser.add_argument('--ready-timeout', type=float, default=180)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write JSON results to this path')
+    parser.add_argument('--csv', help='Write one row per config, level and request kind to this path')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    asyncio.run(run(parse_args()))
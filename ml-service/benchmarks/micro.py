@@ -0,0 +1,332 @@
+"""Microbenchmarks of the model classes and the HTTP path, compared against a baseline.
+
+Builds the stand-in models (benchmarks/stand_ins.py), times every stage of
+both models and the full request through the FastAPI app in-process, and
+writes the results as JSON. With ``--baseline`` each case's median (or
+``--metric``) is compared against an earlier results file; cases that moved
+by more than ``--threshold`` are flagged, and ``--fail-on-regression`` makes
+slower cases exit with status 1 (for CI). On a busy or single-core machine
+``--metric min`` with a longer ``--min-time`` is the least noisy.
+
+Cases (``--cases`` takes shell-style patterns, e.g. ``'pest.*'``):
+    pest.decode             JPEG decode to RGB pixels
+    pest.preprocess_exact   preprocess_image, exact mode (decode + LANCZOS + normalize)
+    pest.preprocess_fast    preprocess_image, fast mode (DCT downscale on decode)
+    pest.preprocess_tensor  preprocess_image on 224x224x3 uint8 pixels (normalize only)
+    pest.forward            engine.predict, batch of 1
+    pest.forward_batch8     engine.predict, batch of 8
+    pest.postprocess        top-3 and treatment lookup for one result
+    pest.postprocess_batch64 response dicts for a 64-row batch of probabilities
+    pest.predict            PestDetectionModel.predict end to end
+    soil.forward            class probabilities for one reading
+    soil.predict            SoilRecommendationModel.predict end to end
+    soil.predict_batch      predict_batch over --soil-rows readings
+    http.pest               POST /predict/pest (caches off, production batching window)
+    http.pest_tensor        POST /predict/pest with a pre-decoded application/x-agri-tensor body
+    http.soil               POST /predict/soil (caches off)
+    http.soil_batch         POST /predict/soil/batch with --soil-rows readings
+
+Only machine-local comparisons are meaningful; the results record the host
+so a baseline from another machine is called out.
+
+Run from the ml-service directory:
+
+    python -m benchmarks.micro --output /tmp/baseline.json
+    python -m benchmarks.micro --baseline /tmp/baseline.json --output /tmp/current.json
+    python -m benchmarks.micro --cases 'soil.*' 'http.soil' --min-time 2
+"""
+import argparse
+import asyncio
+import fnmatch
+import gc
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault('INTERNAL_API_KEY', 'benchmark-key')
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+from benchmarks import stand_ins
+
+CASES = (
+    'pest.decode', 'pest.preprocess_exact', 'pest.preprocess_fast', 'pest.preprocess_tensor', 'pest.forward',
+    'pest.forward_batch8', 'pest.postprocess', 'pest.postprocess_batch64', 'pest.predict',
+    'soil.forward', 'soil.predict', 'soil.predict_batch',
+    'http.pest', 'http.pest_tensor', 'http.soil', 'http.soil_batch',
+)
+RESULTS_FORMAT_VERSION = 1
+
+def summarize(samples_ns: list) -> dict:
+    values = np.array(samples_ns, dtype=np.float64) / 1e6
+    return {
+        'runs': len(values),
+        'median_ms': round(float(np.median(values)), 4),
+        'mean_ms': round(float(values.mean()), 4),
+        'p95_ms': round(float(np.percentile(values, 95)), 4),
+        'min_ms': round(float(values.min()), 4),
+        'stdev_ms': round(float(values.std()), 4),
+    }
+
+def measure(fn, args) -> dict:
+    """Time ``fn()`` call by call until ``--min-time`` has passed (and at least
+    ``--min-runs`` calls), with the garbage collector off like ``timeit``."""
+    for _ in range(args.warmup):
+        fn()
+    samples = []
+    gc.collect()
+    gc.disable()
+    try:
+        deadline = time.perf_counter() + args.min_time
+        while len(samples) < args.max_runs and (len(samples) < args.min_runs or time.perf_counter() < deadline):
+            start = time.perf_counter_ns()
+            fn()
+            samples.append(time.perf_counter_ns() - start)
+    finally:
+        gc.enable()
+    return summarize(samples)
+
+async def measure_async(fn, args) -> dict:
+    """``measure`` for a coroutine function; the GC stays on since the event loop allocates."""
+    for _ in range(args.warmup):
+        await fn()
+    samples = []
+    deadline = time.perf_counter() + args.min_time
+    while len(samples) < args.max_runs and (len(samples) < args.min_runs or time.perf_counter() < deadline):
+        start = time.perf_counter_ns()
+        await fn()
+        samples.append(time.perf_counter_ns() - start)
+    return summarize(samples)
+
+def soil_columns(rows: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    readings = [stand_ins.make_soil_reading(rng) for _ in range(rows)]
+    return {name: [reading[name] for reading in readings] for name in readings[0]}
+
+def model_cases(args, selected: list) -> dict:
+    """Benchmark functions for the selected pest.* and soil.* cases."""
+    image = stand_ins.make_jpeg(args.width, args.height, seed=args.seed)
+    cases = {}
+    if any(case.startswith('pest.') for case in selected):
+        exact = stand_ins.build_pest_model(preprocess_mode='exact', engine=args.pest_engine)
+        fast = stand_ins.build_pest_model(preprocess_mode='fast', engine=args.pest_engine)
+        batch1 = exact.preprocess_image(image)
+        batch8 = np.repeat(batch1, 8, axis=0)
+        probabilities = exact.engine.predict(batch1)[0]
+        probabilities64 = np.random.default_rng(args.seed).dirichlet(np.full(len(probabilities), 0.3), size=64)
+        # The same frame as a device would send it: resized to 224x224 before upload
+        pixels = np.asarray(exact._decode(image).resize((224, 224)))
+        cases.update({
+            'pest.decode': lambda: exact._decode(image),
+            'pest.preprocess_exact': lambda: exact.preprocess_image(image),
+            'pest.preprocess_fast': lambda: fast.preprocess_image(image),
+            'pest.preprocess_tensor': lambda: exact.preprocess_image(pixels),
+            'pest.forward': lambda: exact.engine.predict(batch1),
+            'pest.forward_batch8': lambda: exact.engine.predict(batch8),
+            'pest.postprocess': lambda: exact._build_result(probabilities, 0.0),
+            'pest.postprocess_batch64': lambda: exact._build_results(probabilities64, 0.0, ['full'] * 64),
+            'pest.predict': lambda: exact.predict(image),
+        })
+    if any(case.startswith('soil.') for case in selected):
+        soil = stand_ins.build_soil_model(engine=args.soil_engine)
+        reading = stand_ins.make_soil_reading(np.random.default_rng(args.seed))
+        features = np.array([[reading[name] for name in stand_ins.SOIL_FEATURE_RANGES]])
+        columns = soil_columns(args.soil_rows, args.seed)
+        selected_crops = columns.pop('selected_crop')
+        cases.update({
+            'soil.forward': lambda: soil._predict_proba(features),
+            'soil.predict': lambda: soil.predict(**reading),
+            'soil.predict_batch': lambda: soil.predict_batch(columns, selected_crops),
+        })
+    return cases
+
+async def run_http_cases(args, selected: list) -> dict:
+    """Time requests through the real app with stand-in models, caches off."""
+    import httpx
+
+    from PIL import Image
+
+    import main
+    from serving.batching import MicroBatcher
+    from serving.executor import InferenceExecutor
+    from serving.protocol import TENSOR, pack_tensor
+
+    logging.getLogger('main').setLevel(logging.WARNING)
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    models = {}
+    if any(case.startswith('http.pest') for case in selected):
+        models['pest'] = stand_ins.build_pest_model(preprocess_mode=main.PEST_PREPROCESS_MODE, engine=args.pest_engine)
+    if any(case.startswith('http.soil') for case in selected):
+        models['soil'] = stand_ins.build_soil_model(engine=args.soil_engine)
+    main.pest_model = models.get('pest')
+    main.soil_model = models.get('soil')
+    main.service_start_time = time.time()
+    main.limiter.enabled = False
+    # Every request must reach the model
+    main.pest_cache.max_bytes = 0
+    main.soil_cache.max_bytes = 0
+    for name in models:
+        main.startup.mark_ready(name)
+
+    executor = InferenceExecutor(backend='thread', workers=main.INFERENCE_WORKERS, max_pending=main.INFERENCE_MAX_PENDING)
+    executor.start(models)
+    batcher = MicroBatcher(
+        lambda images: executor.run('pest', 'predict_batch', images),
+        max_batch_size=main.PEST_BATCH_MAX_SIZE,
+        max_wait_ms=main.PEST_BATCH_MAX_WAIT_MS,
+        name='pest',
+    )
+    await batcher.start()
+    main.inference_executor = executor
+    main.pest_batcher = batcher
+
+    headers = {'X-Internal-Key': os.environ['INTERNAL_API_KEY']}
+    image = stand_ins.make_jpeg(args.width, args.height, seed=args.seed)
+    reading = stand_ins.make_soil_reading(np.random.default_rng(args.seed))
+    columns = soil_columns(args.soil_rows, args.seed)
+    # The same frame as a device would send it: resized to 224x224 before upload
+    tensor = pack_tensor(np.asarray(Image.open(io.BytesIO(image)).convert('RGB').resize((224, 224)))[None])
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            async def call(method: str, path: str, extra_headers: dict = None, **kwargs):
+                response = await client.request(method, path, headers={**headers, **(extra_headers or {})}, **kwargs)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{path} returned {response.status_code}: {response.text[:200]}")
+
+            requests = {
+                'http.pest': lambda: call('POST', '/predict/pest', files={'image': ('frame.jpg', image, 'image/jpeg')}),
+                'http.pest_tensor': lambda: call('POST', '/predict/pest', content=tensor,
+                                                 extra_headers={'Content-Type': TENSOR}),
+                'http.soil': lambda: call('POST', '/predict/soil', json=reading),
+                'http.soil_batch': lambda: call('POST', '/predict/soil/batch', json=columns),
+            }
+            for case in selected:
+                results[case] = await measure_async(requests[case], args)
+                print_case(case, results[case])
+    finally:
+        await batcher.stop()
+        executor.shutdown()
+    return results
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'processor': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'git_commit': commit,
+    }
+
+def compare(current: dict, baseline: dict, threshold: float, metric: str = 'median_ms') -> list:
+    """Per-case ``metric`` ratios against ``baseline``; returns the cases that got slower."""
+    for key in ('host', 'cpu_count', 'python'):
+        if baseline['environment'].get(key) != current['environment'].get(key):
+            print(f"Warning: baseline {key} is {baseline['environment'].get(key)}, "
+                  f"now {current['environment'].get(key)}; timings may not be comparable")
+
+    print(f"\n{'case':<24} {'baseline_ms':>12} {'current_ms':>11} {'ratio':>7}  verdict ({metric})")
+    slower = []
+    for case, result in current['cases'].items():
+        previous = baseline['cases'].get(case)
+        if previous is None:
+            print(f"{case:<24} {'-':>12} {result[metric]:>11} {'-':>7}  new")
+            continue
+        ratio = result[metric] / previous[metric] if previous[metric] else float('inf')
+        if ratio > 1 + threshold:
+            verdict = 'SLOWER'
+            slower.append(case)
+        elif ratio < 1 - threshold:
+            verdict = 'faster'
+        else:
+            verdict = 'same'
+        print(f"{case:<24} {previous[metric]:>12} {result[metric]:>11} {ratio:>7.2f}  {verdict}")
+    return slower
+
+def print_case(case: str, result: dict):
+    print(f"{case:<24} {result['median_ms']:>10} {result['p95_ms']:>10} {result['min_ms']:>10} {result['runs']:>7}",
+          flush=True)
+
+def run(args) -> int:
+    selected = [case for case in CASES if any(fnmatch.fnmatchcase(case, pattern) for pattern in args.cases)]
+    if not selected:
+        print(f"No cases match {args.cases}; choose from {', '.join(CASES)}")
+        return 2
+
+    print(f"{'case':<24} {'median_ms':>10} {'p95_ms':>10} {'min_ms':>10} {'runs':>7}")
+    results = {}
+    functions = model_cases(args, selected)
+    for case in selected:
+        if case in functions:
+            results[case] = measure(functions[case], args)
+            print_case(case, results[case])
+    http_cases = [case for case in selected if case.startswith('http.')]
+    if http_cases:
+        results.update(asyncio.run(run_http_cases(args, http_cases)))
+
+    current = {
+        'format_version': RESULTS_FORMAT_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': environment(),
+        'min_time': args.min_time,
+        'settings': {key: getattr(args, key) for key in
+                     ('width', 'height', 'soil_rows', 'pest_engine', 'soil_engine', 'seed')},
+        'cases': {case: results[case] for case in selected},
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('format_version') != RESULTS_FORMAT_VERSION:
+        print(f"{args.baseline} has results format {baseline.get('format_version')}, expected {RESULTS_FORMAT_VERSION}")
+        return 2
+    if baseline.get('settings') != current['settings']:
+        print(f"Warning: baseline settings {baseline.get('settings')} differ from {current['settings']}")
+    slower = compare(current, baseline, args.threshold, f'{args.metric}_ms')
+    if slower:
+        print(f"\n{len(slower)} cases more than {args.threshold:.0%} slower than the baseline: {', '.join(slower)}")
+    return 1 if slower and args.fail_on_regression else 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', nargs='+', default=['*'], help='Case names or patterns (default: all)')
+    parser.add_argument('--min-time', type=float, default=1.0, help='Seconds to spend timing each case')
+    parser.add_argument('--min-runs', type=int, default=5)
+    parser.add_argument('--max-runs', type=int, default=100000)
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed calls before each case')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=960)
+    parser.add_argument('--soil-rows', type=int, default=1000, help='Readings per soil batch case')
+    parser.add_argument('--pest-engine', default='keras', choices=['keras', 'graph'])
+    parser.add_argument('--soil-engine', default='auto', choices=['auto', 'numpy', 'xgboost'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write JSON results to this path')
+    parser.add_argument('--baseline', help='Compare against a results file written by --output')
+    parser.add_argument('--metric', default='median', choices=['median', 'min', 'mean', 'p95'],
+                        help='Statistic compared against the baseline')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative median change to flag (0.10 = 10%%)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit 1 if any case got slower')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
@@ -0,0 +1,171 @@
+"""Load time and memory of the legacy weight files against the model bundle.
+
+Every case loads one model in ``--workers`` fresh processes at once. It
+reports the slowest framework import (TensorFlow or XGBoost, the same for
+both formats) and the slowest load after it. Per worker it reports resident
+memory split into anonymous (private) and file-backed pages, and PSS
+(proportional set size: shared pages divided between the processes mapping
+them). PSS below RSS is memory the workers share.
+
+Cases:
+    soil:pickle        soil_model.pkl, trees exported for the NumPy engine
+    soil:bundle        bundle, native XGBoost model plus mapped forest arrays
+    soil:bundle-numpy  bundle, mapped forest arrays only (XGBoost not imported)
+    pest:h5            pest_model_best.h5 through the layer shim, graph engine
+    pest:bundle        bundle SavedModel graph
+
+Run from the ml-service directory:
+
+    python -m benchmarks.model_load --stand-in           # no weights needed
+    python -m benchmarks.model_load --workers 4          # real weights and weights/bundle
+"""
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+from models.artifacts import DEFAULT_BUNDLE_DIR
+from models.pest_engines import ENGINE_ARTIFACTS
+
+WEIGHTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'weights')
+CASES = ('soil:pickle', 'soil:bundle', 'soil:bundle-numpy', 'pest:h5', 'pest:bundle')
+
+def load_case(case: str, args):
+    """Load one model the way the service would for ``case``."""
+    from models.pest_detection import PestDetectionModel
+    from models.soil_recommendation import SoilRecommendationModel
+
+    if case == 'soil:pickle':
+        with open(args.soil_pickle, 'rb') as f:
+            artifacts = pickle.load(f)
+        model = SoilRecommendationModel(engine='auto', bundle='off')
+        model.model = artifacts['model']
+        model.class_names = artifacts['class_names']
+        model.init_engine()
+    elif case.startswith('soil:bundle'):
+        engine = 'numpy' if case.endswith('numpy') else 'auto'
+        model = SoilRecommendationModel(engine=engine, bundle='on', bundle_dir=args.bundle_dir)
+        model.load()
+    elif case == 'pest:h5':
+        from models.pest_detection import load_keras_model
+        from models.pest_engines import GraphEngine
+        model = GraphEngine(load_keras_model(args.pest_h5))
+    else:
+        model = PestDetectionModel(engine='graph', bundle='on', bundle_dir=args.bundle_dir)
+        model.load()
+    return model
+
+def memory_mb(pid: int) -> dict:
+    fields = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in ('VmRSS', 'RssAnon', 'RssFile'):
+                fields[name] = int(value.split()[0]) / 1024
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Pss:'):
+                fields['Pss'] = int(line.split()[1]) / 1024
+    return fields
+
+def child(args):
+    """Worker process: load, report, then keep the mappings alive until stdin closes."""
+    # The framework import is the same for both formats, so it is timed on its own
+    start = time.perf_counter()
+    if args.child.startswith('pest'):
+        import tensorflow  # noqa: F401
+    elif args.child != 'soil:bundle-numpy':
+        import xgboost  # noqa: F401
+    import_ms = round((time.perf_counter() - start) * 1000, 1)
+    start = time.perf_counter()
+    model = load_case(args.child, args)
+    print(json.dumps({'import_ms': import_ms, 'load_ms': round((time.perf_counter() - start) * 1000, 1)}), flush=True)
+    sys.stdin.read()
+    del model
+
+def run_case(case: str, args) -> dict:
+    command = [sys.executable, '-m', 'benchmarks.model_load', '--child', case,
+               '--bundle-dir', args.bundle_dir, '--soil-pickle', args.soil_pickle, '--pest-h5', args.pest_h5]
+    workers = [subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+               for _ in range(args.workers)]
+    try:
+        loads = []
+        for worker in workers:
+            line = worker.stdout.readline()
+            if not line:
+                raise RuntimeError(f"{case} worker exited with {worker.wait()}")
+            loads.append(json.loads(line))
+        # Every worker holds its model now, so PSS splits the shared pages between them
+        memory = [memory_mb(worker.pid) for worker in workers]
+    finally:
+        for worker in workers:
+            worker.stdin.close()
+            worker.wait()
+    return {
+        'case': case,
+        'import_ms': max(load['import_ms'] for load in loads),
+        'load_ms': max(load['load_ms'] for load in loads),
+        'rss_mb': round(sum(m['VmRSS'] for m in memory) / len(memory), 1),
+        'anon_mb': round(sum(m['RssAnon'] for m in memory) / len(memory), 1),
+        'file_mb': round(sum(m['RssFile'] for m in memory) / len(memory), 1),
+        'pss_mb': round(sum(m['Pss'] for m in memory) / len(memory), 1),
+    }
+
+def prepare_stand_ins(directory: str, args):
+    """Write stand-in legacy files and a bundle built from the same models."""
+    from benchmarks import stand_ins
+    from models.artifacts import write_pest_section, write_soil_section
+
+    soil = stand_ins.build_soil_model(engine='xgboost')
+    args.soil_pickle = os.path.join(directory, 'soil_model.pkl')
+    with open(args.soil_pickle, 'wb') as f:
+        pickle.dump({'model': soil.model, 'class_names': soil.class_names, 'features': soil.features}, f)
+    pest = stand_ins.build_pest_model()
+    args.pest_h5 = os.path.join(directory, 'pest_model.h5')
+    pest.model.save(args.pest_h5)
+
+    args.bundle_dir = os.path.join(directory, 'bundle')
+    write_soil_section(soil.model, soil.class_names, soil.features, args.bundle_dir)
+    write_pest_section(pest.model, pest.class_labels, args.bundle_dir)
+
+def run(args):
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.stand_in:
+            prepare_stand_ins(scratch, args)
+        rows = [run_case(case, args) for case in args.cases]
+
+    print(f"\n{'case':>18} {'import_ms':>10} {'load_ms':>9} {'rss_mb':>8} {'anon_mb':>8} {'file_mb':>8} {'pss_mb':>8}"
+          f"   ({args.workers} workers; slowest load, per-worker memory)")
+    for r in rows:
+        print(f"{r['case']:>18} {r['import_ms']:>10} {r['load_ms']:>9} {r['rss_mb']:>8} {r['anon_mb']:>8} "
+              f"{r['file_mb']:>8} {r['pss_mb']:>8}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'model': 'stand-in' if args.stand_in else 'real', 'workers': args.workers, 'cases': rows},
+                      f, indent=2)
+        print(f"Results written to {args.output}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=CASES)
+    parser.add_argument('--workers', type=int, default=2, help='Processes loading each case at once')
+    parser.add_argument('--stand-in', action='store_true', help='Build stand-in weights and bundle in a temp dir')
+    parser.add_argument('--bundle-dir', default=DEFAULT_BUNDLE_DIR)
+    parser.add_argument('--soil-pickle', default=os.path.join(WEIGHTS_DIR, 'soil_model.pkl'))
+    parser.add_argument('--pest-h5', default=os.path.join(WEIGHTS_DIR, ENGINE_ARTIFACTS['keras']))
+    parser.add_argument('--output', help='Write JSON results to this path')
+    parser.add_argument('--child', choices=CASES, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    if arguments.child:
+        child(arguments)
+    else:
+        run(arguments)
@@ -0,0 +1,156 @@
+"""Side-by-side report for the Keras, TFLite and ONNX Runtime pest engines.
+
+Each engine runs in its own fresh process so resident memory is comparable.
+The report lists load time, RSS added by loading, median latency per batch
+size, and top-1 agreement with the Keras engine on the same inputs.
+
+Run from the ml-service directory:
+
+    # Real weights (after python -m tools.convert_pest_model)
+    python -m benchmarks.pest_engines --images path/to/sample_dir
+
+    # No weights needed: converts the stand-in CNN into a temp directory
+    python -m benchmarks.pest_engines --stand-in
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+from models.pest_engines import ENGINE_ARTIFACTS
+
+WEIGHTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'weights')
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB (Linux)."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def _measure_engine(engine_name: str, artifact_dir: str, inputs_path: str, batch_sizes: list,
+                    repeats: int, threads) -> dict:
+    """Runs in a spawned process: load one engine, time it, return its outputs."""
+    inputs = np.load(inputs_path)
+    from models.pest_detection import load_keras_model
+    from models.pest_engines import KerasEngine, create_engine
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    path = os.path.abspath(os.path.join(artifact_dir, ENGINE_ARTIFACTS[engine_name]))
+    if engine_name == 'keras':
+        engine = KerasEngine(load_keras_model(path))
+    else:
+        engine = create_engine(engine_name, path, threads)
+    load_ms = (time.perf_counter() - start) * 1000
+    rss_loaded = rss_mb()
+
+    latency = {}
+    for batch_size in batch_sizes:
+        batch = np.ascontiguousarray(np.resize(inputs, (batch_size,) + inputs.shape[1:]))
+        engine.predict(batch)  # warm-up / allocation for this shape
+        samples = []
+        for _ in range(repeats):
+            t = time.perf_counter()
+            engine.predict(batch)
+            samples.append((time.perf_counter() - t) * 1000)
+        latency[str(batch_size)] = round(float(np.median(samples)), 2)
+
+    outputs = np.concatenate([engine.predict(inputs[i:i + 16]) for i in range(0, len(inputs), 16)])
+    return {
+        'engine': engine_name,
+        'load_ms': round(load_ms, 1),
+        'rss_load_mb': round(rss_loaded - rss_before, 1),
+        'rss_peak_mb': round(rss_mb(), 1),
+        'latency_ms': latency,
+        'top1': np.argmax(outputs, axis=1).tolist(),
+        'probs': outputs.tolist(),
+    }
+
+def prepare_inputs(args, work_dir: str) -> str:
+    """Preprocess the sample images once and save them for the engine processes."""
+    from benchmarks import stand_ins
+    from models.pest_detection import PestDetectionModel
+
+    model = PestDetectionModel()
+    if args.images:
+        names = sorted(n for n in os.listdir(args.images) if n.lower().endswith(('.jpg', '.jpeg', '.png')))
+        blobs = []
+        for name in names[:args.limit]:
+            with open(os.path.join(args.images, name), 'rb') as f:
+                blobs.append(f.read())
+    else:
+        blobs = [stand_ins.make_jpeg(640, 480, seed=i) for i in range(args.synthetic)]
+    inputs = np.concatenate([model.preprocess_image(blob) for blob in blobs])
+    path = os.path.join(work_dir, 'inputs.npy')
+    np.save(path, inputs)
+    return path
+
+def prepare_stand_in_artifacts(work_dir: str, quantize: bool) -> str:
+    from benchmarks import stand_ins
+    from models.pest_export import convert
+
+    keras_model = stand_ins.build_pest_keras_model()
+    keras_model.save(os.path.join(work_dir, ENGINE_ARTIFACTS['keras']))
+    convert(keras_model, work_dir, ('tflite', 'onnx'), quantize=quantize)
+    return work_dir
+
+def run(args):
+    with tempfile.TemporaryDirectory() as work_dir:
+        artifact_dir = prepare_stand_in_artifacts(work_dir, args.quantize) if args.stand_in else args.artifacts
+        inputs_path = prepare_inputs(args, work_dir)
+
+        context = multiprocessing.get_context('spawn')
+        results = []
+        for engine_name in args.engines:
+            with context.Pool(1) as pool:
+                results.append(pool.apply(
+                    _measure_engine,
+                    (engine_name, artifact_dir, inputs_path, args.batch_sizes, args.repeats, args.threads),
+                ))
+
+    reference = next((r for r in results if r['engine'] == 'keras'), results[0])
+    reference_probs = np.array(reference['probs'])
+    reference_top1 = np.array(reference['top1'])
+    for result in results:
+        result['top1_agreement'] = round(float(np.mean(np.array(result['top1']) == reference_top1)), 4)
+        result['max_prob_diff'] = round(float(np.abs(np.array(result.pop('probs')) - reference_probs).max()), 5)
+        result.pop('top1')
+
+    header = f"{'engine':<8} {'load_ms':>9} {'rss_mb':>8} " + ' '.join(f"{'b' + str(b):>9}" for b in args.batch_sizes)
+    print(header + f" {'top1_agree':>11} {'max_dprob':>10}")
+    for r in results:
+        cells = ' '.join(f"{r['latency_ms'][str(b)]:>9}" for b in args.batch_sizes)
+        print(f"{r['engine']:<8} {r['load_ms']:>9} {r['rss_load_mb']:>8} {cells} "
+              f"{r['top1_agreement']:>11} {r['max_prob_diff']:>10}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--engines', nargs='+', default=['keras', 'tflite', 'onnx'],
+                        choices=['keras', 'tflite', 'onnx'])
+    parser.add_argument('--artifacts', default=WEIGHTS_DIR, help='Directory holding the converted artifacts')
+    parser.add_argument('--stand-in', action='store_true', help='Build and convert the stand-in CNN instead')
+    parser.add_argument('--quantize', action='store_true', help='Quantize the stand-in TFLite model')
+    parser.add_argument('--images', help='Directory of sample images (default: synthetic JPEGs)')
+    parser.add_argument('--limit', type=int, default=200)
+    parser.add_argument('--synthetic', type=int, default=32)
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--threads', type=int, default=None, help='Intra-op threads for TFLite/ONNX')
+    parser.add_argument('--output', help='Write JSON results to this path')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    run(parse_args())
@@ -0,0 +1,105 @@
+"""Per-call overhead of Keras ``model.predict`` vs the pre-traced graph engine.
+
+Both engines wrap the same Keras model. For each batch size the report gives
+the median call time of ``model.predict`` and of the graph engine, the
+difference per call, and the largest probability difference between them.
+It also times each engine's setup and first call, which is what the first
+request after startup paid before warm-up existed.
+
+Run from the ml-service directory:
+
+    python -m benchmarks.pest_graph                  # stand-in CNN
+    python -m benchmarks.pest_graph --real           # weights/pest_model_best.h5
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+from benchmarks import stand_ins
+from models.pest_detection import INPUT_SIZE, load_keras_model
+from models.pest_engines import DEFAULT_GRAPH_BATCH_SIZES, ENGINE_ARTIFACTS, GraphEngine, KerasEngine
+
+WEIGHTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'weights')
+
+def median_ms(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
+def run(args):
+    if args.real:
+        keras_model = load_keras_model(os.path.join(WEIGHTS_DIR, ENGINE_ARTIFACTS['keras']))
+    else:
+        keras_model = stand_ins.build_pest_keras_model(seed=args.seed)
+
+    rng = np.random.default_rng(args.seed)
+    inputs = rng.random((max(args.batch_sizes), INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+
+    keras_engine = KerasEngine(keras_model)
+    _, keras_first_ms = timed(lambda: keras_engine.predict(inputs[:1]))
+    graph_engine, graph_setup_ms = timed(lambda: GraphEngine(keras_model, args.graph_batch_sizes))
+    _, graph_first_ms = timed(lambda: graph_engine.predict(inputs[:1]))
+
+    rows = []
+    for batch_size in args.batch_sizes:
+        batch = inputs[:batch_size]
+        # One untimed call each so shape-specific setup is not counted
+        reference = keras_engine.predict(batch)
+        candidate = graph_engine.predict(batch)
+        keras_ms = median_ms(lambda: keras_engine.predict(batch), args.repeats)
+        graph_ms = median_ms(lambda: graph_engine.predict(batch), args.repeats)
+        rows.append({
+            'batch_size': batch_size,
+            'predict_ms': round(keras_ms, 2),
+            'graph_ms': round(graph_ms, 2),
+            'saved_ms_per_call': round(keras_ms - graph_ms, 2),
+            'predict_ms_per_image': round(keras_ms / batch_size, 3),
+            'graph_ms_per_image': round(graph_ms / batch_size, 3),
+            'max_prob_diff': float(np.abs(reference - candidate).max()),
+        })
+
+    summary = {
+        'model': 'real' if args.real else 'stand-in',
+        'graph_batch_sizes': list(graph_engine.batch_sizes),
+        'predict_first_call_ms': keras_first_ms,
+        'graph_setup_ms': graph_setup_ms,
+        'graph_first_call_ms': graph_first_ms,
+    }
+    for key, value in summary.items():
+        print(f"{key:>22}: {value}")
+    print(f"\n{'batch':>6} {'predict_ms':>11} {'graph_ms':>9} {'saved_ms':>9} "
+          f"{'predict/img':>12} {'graph/img':>10} {'max_dprob':>10}")
+    for r in rows:
+        print(f"{r['batch_size']:>6} {r['predict_ms']:>11} {r['graph_ms']:>9} {r['saved_ms_per_call']:>9} "
+              f"{r['predict_ms_per_image']:>12} {r['graph_ms_per_image']:>10} {r['max_prob_diff']:>10.2e}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'summary': summary, 'batches': rows}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--real', action='store_true', help='Use weights/pest_model_best.h5')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 2, 3, 4, 8, 12, 16, 24, 32, 48, 64])
+    parser.add_argument('--graph-batch-sizes', nargs='+', type=int, default=list(DEFAULT_GRAPH_BATCH_SIZES))
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write JSON results to this path')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    run(parse_args())
@@ -0,0 +1,106 @@
+"""Latency of tiled whole-frame pest inference per stride and tile budget.
+
+Scores the same high-resolution frame with ``predict`` (the whole frame
+squashed into one 224x224 input) and with ``predict_tiles`` for every
+``--strides`` x ``--max-tiles`` combination, and reports the tile grid and
+the median time per stage (decode, tile normalization, forward passes) from
+the model's stage observer.
+
+Run from the ml-service directory:
+
+    python -m benchmarks.pest_tiles
+    python -m benchmarks.pest_tiles --image path/to/drone_frame.jpg --engine graph --real
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+from benchmarks import stand_ins
+from models.pest_detection import PestDetectionModel
+
+STAGES = ('decode', 'preprocess', 'forward', 'postprocess')
+
+def build_model(args) -> PestDetectionModel:
+    if args.real:
+        model = PestDetectionModel(engine=args.engine)
+        model.load()
+        model.warm_up()
+        return model
+    model = stand_ins.build_pest_model(engine=args.engine)
+    model.warm_up()
+    return model
+
+def measure(model, fn, repeats: int) -> dict:
+    """Median total and per-stage milliseconds of ``fn()`` over ``repeats`` runs."""
+    fn()
+    totals, stages = [], {stage: [] for stage in STAGES}
+    for _ in range(repeats):
+        seen = dict.fromkeys(STAGES, 0.0)
+        model.stage_observer = lambda stage, seconds: seen.__setitem__(stage, seen[stage] + seconds)
+        start = time.perf_counter()
+        result = fn()
+        totals.append(time.perf_counter() - start)
+        for stage in STAGES:
+            stages[stage].append(seen[stage])
+    model.stage_observer = None
+    row = {'total_ms': round(float(np.median(totals)) * 1000, 1)}
+    row.update({f'{stage}_ms': round(float(np.median(values)) * 1000, 1) for stage, values in stages.items()})
+    return row, result
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--image', help='Frame to score (default: a synthetic JPEG of --width x --height)')
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--strides', type=int, nargs='+', default=[224, 112])
+    parser.add_argument('--max-tiles', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--batch-size', type=int, default=16, help='Tiles per forward pass')
+    parser.add_argument('--engine', default='graph', choices=['keras', 'graph', 'tflite', 'onnx'])
+    parser.add_argument('--real', action='store_true', help='Use weights/ instead of the stand-in CNN')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', help='Write JSON results to this path')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.image:
+        with open(args.image, 'rb') as f:
+            frame = f.read()
+    else:
+        frame = stand_ins.make_jpeg(args.width, args.height, seed=0)
+    model = build_model(args)
+
+    rows = []
+    whole, _ = measure(model, lambda: model.predict(frame), args.repeats)
+    rows.append({'mode': 'whole frame', 'tiles': 1, 'grid': '1x1', **whole})
+    for stride in args.strides:
+        for max_tiles in args.max_tiles:
+            timing, result = measure(
+                model, lambda: model.predict_tiles(frame, stride, max_tiles, args.batch_size), args.repeats
+            )
+            tiles = result['tiles']
+            rows.append({
+                'mode': f'stride {stride}, max {max_tiles}',
+                'tiles': tiles['count'],
+                'grid': f"{tiles['cols']}x{tiles['rows']}",
+                'scale': tiles['scale'],
+                **timing,
+            })
+
+    print(f"\n{'mode':<22} {'tiles':>5} {'grid':>6} {'total_ms':>9} {'decode':>7} {'tiles_ms':>8} {'forward':>8}")
+    for row in rows:
+        print(f"{row['mode']:<22} {row['tiles']:>5} {row['grid']:>6} {row['total_ms']:>9} {row['decode_ms']:>7} "
+              f"{row['preprocess_ms']:>8} {row['forward_ms']:>8}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'settings': {name: value for name, value in vars(args).items() if name != 'output'},
+                       'results': rows}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
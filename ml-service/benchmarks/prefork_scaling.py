@@ -0,0 +1,229 @@
+"""Throughput and memory of the pre-fork server as workers are added.
+
+Starts ``python main.py`` with ``SERVER_WORKERS`` set to each of
+``--workers`` against a model bundle, drives mixed pest/soil traffic over
+real HTTP for ``--duration`` seconds and reports requests per second, p50/p99
+latency and memory summed over every server process. RSS counts shared
+pages once per process; PSS splits them between the processes, so the gap
+between the two is what copy-on-write preloading saves.
+
+``--compare-preload`` repeats every multi-worker run with
+``PREFORK_PRELOAD=`` (each worker loads its own models after the fork).
+
+Run from the ml-service directory:
+
+    python -m benchmarks.prefork_scaling --stand-in                    # no weights needed
+    python -m benchmarks.prefork_scaling --workers 1 2 4 --compare-preload
+    python -m benchmarks.prefork_scaling --pest-engine graph           # TensorFlow in every worker
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+import httpx
+
+from benchmarks import stand_ins
+from models.artifacts import DEFAULT_BUNDLE_DIR
+
+API_KEY = 'benchmark-key'
+HEADERS = {'X-Internal-Key': API_KEY}
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {'count': 0}
+    values = np.array(samples)
+    return {
+        'count': len(values),
+        'p50_ms': round(float(np.percentile(values, 50)), 2),
+        'p99_ms': round(float(np.percentile(values, 99)), 2),
+    }
+
+def server_pids(pid: int) -> list:
+    """``pid`` and every process below it."""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f'/proc/{current}/task/{current}/children') as f:
+                pids.extend(int(child) for child in f.read().split())
+        except FileNotFoundError:
+            pass
+    return pids
+
+def memory_mb(pids: list) -> dict:
+    totals = {'rss_mb': 0.0, 'pss_mb': 0.0}
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Rss:'):
+                        totals['rss_mb'] += int(line.split()[1]) / 1024
+                    elif line.startswith('Pss:'):
+                        totals['pss_mb'] += int(line.split()[1]) / 1024
+        except FileNotFoundError:
+            pass
+    return {name: round(value, 1) for name, value in totals.items()}
+
+def start_server(args, workers: int, preload: bool) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        SERVER_WORKERS=str(workers),
+        PORT=str(args.port),
+        SERVER_HOST='127.0.0.1',
+        MODEL_BUNDLE='on',
+        MODEL_BUNDLE_DIR=args.bundle_dir,
+        PEST_ENGINE=args.pest_engine,
+        INTERNAL_API_KEY=API_KEY,
+        RATE_LIMIT_ENABLED='false',
+    )
+    if not preload:
+        env['PREFORK_PRELOAD'] = ''
+    return subprocess.Popen([sys.executable, 'main.py'], cwd=SERVICE_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+async def wait_ready(client: httpx.AsyncClient, server: subprocess.Popen, workers: int, timeout: float) -> float:
+    """Seconds until /ready answers 200 from every worker."""
+    start = time.perf_counter()
+    ready_pids = set()
+    while time.perf_counter() - start < timeout:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with {server.returncode}")
+        try:
+            response = await client.get('/ready')
+            if response.status_code == 200:
+                worker = (await client.get('/health')).json().get('worker')
+                ready_pids.add(worker['pid'] if worker else server.pid)
+                if len(ready_pids) >= workers:
+                    return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise TimeoutError(f"Server not ready after {timeout}s")
+
+async def drive(client: httpx.AsyncClient, args, images: list) -> dict:
+    rng = np.random.default_rng(args.seed)
+    latencies = {'pest': [], 'soil': []}
+    errors = 0
+    deadline = time.perf_counter() + args.duration
+
+    async def user():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            kind = 'pest' if rng.random() < args.pest_ratio else 'soil'
+            start = time.perf_counter()
+            if kind == 'pest':
+                files = {'image': ('frame.jpg', images[int(rng.integers(len(images)))], 'image/jpeg')}
+                response = await client.post('/predict/pest', files=files, headers=HEADERS)
+            else:
+                response = await client.post('/predict/soil', json=stand_ins.make_soil_reading(rng), headers=HEADERS)
+            latencies[kind].append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(args.concurrency)))
+    wall_s = time.perf_counter() - wall_start
+    requests = len(latencies['pest']) + len(latencies['soil'])
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / wall_s, 2),
+        'pest': percentiles(latencies['pest']),
+        'soil': percentiles(latencies['soil']),
+    }
+
+async def run_case(args, workers: int, preload: bool, images: list) -> dict:
+    server = start_server(args, workers, preload)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=0)
+    try:
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{args.port}', timeout=60, limits=limits) as client:
+            ready_s = await wait_ready(client, server, workers, args.ready_timeout)
+            # Memory once every worker holds its models, before traffic grows the heaps
+            idle = memory_mb(server_pids(server.pid))
+            result = await drive(client, args, images)
+        loaded = memory_mb(server_pids(server.pid))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+    return {
+        'workers': workers,
+        'preload': preload and workers > 1,
+        'ready_s': round(ready_s, 2),
+        'idle': idle,
+        'after_load': loaded,
+        **result,
+    }
+
+def prepare_stand_in_bundle(directory: str, args):
+    from models.artifacts import write_pest_section, write_soil_section
+
+    soil = stand_ins.build_soil_model(engine='xgboost')
+    pest = stand_ins.build_pest_model()
+    args.bundle_dir = os.path.join(directory, 'bundle')
+    write_soil_section(soil.model, soil.class_names, soil.features, args.bundle_dir)
+    write_pest_section(pest.model, pest.class_labels, args.bundle_dir, formats=('tflite',))
+
+async def run(args):
+    images = [stand_ins.make_jpeg(args.width, args.height, seed=i) for i in range(8)]
+    cases = []
+    for workers in args.workers:
+        cases.append((workers, True))
+        if args.compare_preload and workers > 1:
+            cases.append((workers, False))
+
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.stand_in:
+            prepare_stand_in_bundle(scratch, args)
+        rows = [await run_case(args, workers, preload, images) for workers, preload in cases]
+
+    print(f"\n{'workers':>7} {'preload':>7} {'ready_s':>7} {'rps':>8} {'pest_p50':>9} {'pest_p99':>9} "
+          f"{'soil_p50':>9} {'soil_p99':>9} {'rss_mb':>8} {'pss_mb':>8}   (pest engine {args.pest_engine})")
+    for r in rows:
+        print(f"{r['workers']:>7} {str(r['preload']):>7} {r['ready_s']:>7} {r['throughput_rps']:>8} "
+              f"{r['pest'].get('p50_ms', '-'):>9} {r['pest'].get('p99_ms', '-'):>9} "
+              f"{r['soil'].get('p50_ms', '-'):>9} {r['soil'].get('p99_ms', '-'):>9} "
+              f"{r['idle']['rss_mb']:>8} {r['idle']['pss_mb']:>8}")
+    errors = sum(r['errors'] for r in rows)
+    if errors:
+        print(f"{errors} requests failed")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'model': 'stand-in' if args.stand_in else 'real', 'cpu_count': os.cpu_count(),
+                       'pest_engine': args.pest_engine, 'cases': rows}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, 2, 4])
+    parser.add_argument('--compare-preload', action='store_true',
+                        help='Also run every multi-worker case with PREFORK_PRELOAD empty')
+    parser.add_argument('--pest-engine', default='tflite', choices=['tflite', 'graph'])
+    parser.add_argument('--stand-in', action='store_true', help='Build a stand-in bundle in a temp dir')
+    parser.add_argument('--bundle-dir', default=DEFAULT_BUNDLE_DIR)
+    parser.add_argument('--port', type=int, default=8391)
+    parser.add_argument('--duration', type=float, default=15, help='Seconds of traffic per case')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--pest-ratio', type=float, default=0.5, help='Share of pest requests (0-1)')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=960)
+    parser.add_argument('--ready-timeout', type=float, default=180)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write JSON results to this path')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,121 @@
+"""Speed and accuracy parity of the exact vs fast pest preprocessing modes.
+
+For every image in the sample set this times both ``preprocess_image``
+modes, compares the resulting tensors, and checks whether the classifier's
+top-1 class agrees between them. Uses the real weights when they are present
+(``--real``), otherwise the stand-in CNN.
+
+Run from the ml-service directory:
+
+    python -m benchmarks.preprocess_parity --images path/to/sample_dir
+    python -m benchmarks.preprocess_parity --synthetic 20 --width 4000 --height 3000
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+from benchmarks import stand_ins
+from models.pest_detection import PestDetectionModel
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+def load_samples(args) -> list:
+    if args.images:
+        paths = sorted(
+            os.path.join(args.images, name) for name in os.listdir(args.images)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        samples = []
+        for path in paths[:args.limit]:
+            with open(path, 'rb') as f:
+                samples.append((os.path.basename(path), f.read()))
+        return samples
+    return [
+        (f'synthetic_{i}.jpg', stand_ins.make_jpeg(args.width, args.height, seed=i))
+        for i in range(args.synthetic)
+    ]
+
+def build_models(real: bool):
+    if real:
+        exact = PestDetectionModel(preprocess_mode='exact')
+        exact.load()
+        fast = PestDetectionModel(preprocess_mode='fast')
+        fast.engine, fast.class_labels, fast.treatment_lookup = exact.engine, exact.class_labels, exact.treatment_lookup
+        fast.is_loaded = True
+        return exact, fast
+    exact = stand_ins.build_pest_model(preprocess_mode='exact')
+    fast = stand_ins.build_pest_model(preprocess_mode='fast')
+    fast.engine = exact.engine
+    return exact, fast
+
+def time_ms(fn, repeats: int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+def run(args):
+    samples = load_samples(args)
+    if not samples:
+        raise SystemExit("No images found")
+    exact, fast = build_models(args.real)
+
+    rows = []
+    for name, image_bytes in samples:
+        exact_tensor = exact.preprocess_image(image_bytes)
+        fast_tensor = fast.preprocess_image(image_bytes)
+        exact_probs = exact.engine.predict(exact_tensor)[0]
+        fast_probs = fast.engine.predict(fast_tensor)[0]
+        diff = np.abs(exact_tensor - fast_tensor)
+        rows.append({
+            'image': name,
+            'bytes': len(image_bytes),
+            'exact_ms': round(time_ms(lambda: exact.preprocess_image(image_bytes), args.repeats), 2),
+            'fast_ms': round(time_ms(lambda: fast.preprocess_image(image_bytes), args.repeats), 2),
+            'mean_abs_pixel_diff': round(float(diff.mean()) * 255, 3),
+            'max_abs_pixel_diff': round(float(diff.max()) * 255, 3),
+            'top1_agree': bool(np.argmax(exact_probs) == np.argmax(fast_probs)),
+            'max_prob_diff': round(float(np.abs(exact_probs - fast_probs).max()), 4),
+        })
+
+    exact_ms = np.array([r['exact_ms'] for r in rows])
+    fast_ms = np.array([r['fast_ms'] for r in rows])
+    summary = {
+        'images': len(rows),
+        'model': 'real' if args.real else 'stand-in',
+        'exact_ms_mean': round(float(exact_ms.mean()), 2),
+        'fast_ms_mean': round(float(fast_ms.mean()), 2),
+        'speedup': round(float(exact_ms.mean() / fast_ms.mean()), 2),
+        'mean_abs_pixel_diff': round(float(np.mean([r['mean_abs_pixel_diff'] for r in rows])), 3),
+        'top1_agreement': round(sum(r['top1_agree'] for r in rows) / len(rows), 4),
+        'max_prob_diff': max(r['max_prob_diff'] for r in rows),
+    }
+
+    for key, value in summary.items():
+        print(f"{key:>22}: {value}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'summary': summary, 'images': rows}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', help='Directory of sample images (default: synthetic JPEGs)')
+    parser.add_argument('--limit', type=int, default=200, help='Most images to read from --images')
+    parser.add_argument('--synthetic', type=int, default=10, help='Number of synthetic JPEGs')
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--repeats', type=int, default=3, help='Timing repeats per image (best is kept)')
+    parser.add_argument('--real', action='store_true', help='Use weights/pest_model_best.h5')
+    parser.add_argument('--output', help='Write JSON results to this path')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    run(parse_args())
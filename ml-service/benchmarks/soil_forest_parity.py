@@ -0,0 +1,114 @@
+"""Parity and speed of the NumPy soil forest against XGBoost's predict_proba.
+
+Scores every row of the training CSV (or the stand-in's synthetic dataset)
+with both engines, reports the largest probability difference and top-1
+agreement, then times both at several batch sizes. Exits non-zero when the
+difference exceeds ``--tolerance`` or any top-1 class disagrees, so it can
+gate a retrained model before deployment.
+
+Run from the ml-service directory:
+
+    # Real model against the training data
+    python -m benchmarks.soil_forest_parity --csv path/to/Crop_recommendation.csv
+
+    # No weights needed
+    python -m benchmarks.soil_forest_parity --stand-in
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from benchmarks import stand_ins
+from models.soil_forest import NumpyForest
+from models.soil_recommendation import SoilRecommendationModel
+
+# Column names used by the training CSV (Soil_trainning.py)
+CSV_FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+def load_rows(args) -> np.ndarray:
+    if args.stand_in:
+        features, _, _ = stand_ins.synthetic_soil_dataset(seed=args.seed)
+        return features
+    import pandas as pd
+    return pd.read_csv(args.csv)[CSV_FEATURES].to_numpy(dtype=np.float64)
+
+def build_classifier(args):
+    if args.stand_in:
+        return stand_ins.build_soil_model(seed=args.seed, engine='xgboost').model
+    model = SoilRecommendationModel(engine='xgboost')
+    model.load()
+    return model.model
+
+def time_ms(fn, repeats: int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+def run(args) -> bool:
+    rows = load_rows(args)
+    classifier = build_classifier(args)
+
+    start = time.perf_counter()
+    forest = NumpyForest.from_xgboost(classifier)
+    export_ms = (time.perf_counter() - start) * 1000
+
+    reference = classifier.predict_proba(rows).astype(np.float64)
+    candidate = forest.predict_proba(rows)
+    max_diff = float(np.abs(reference - candidate).max())
+    top1_agreement = float(np.mean(reference.argmax(axis=1) == candidate.argmax(axis=1)))
+    passed = max_diff <= args.tolerance and top1_agreement == 1.0
+
+    timings = []
+    for batch_size in args.batch_sizes:
+        batch = rows[np.arange(batch_size) % len(rows)]
+        xgboost_ms = time_ms(lambda: classifier.predict_proba(batch), args.repeats)
+        numpy_ms = time_ms(lambda: forest.predict_proba(batch), args.repeats)
+        timings.append({
+            'batch_size': batch_size,
+            'xgboost_ms': round(xgboost_ms, 3),
+            'numpy_ms': round(numpy_ms, 3),
+            'speedup': round(xgboost_ms / numpy_ms, 2),
+        })
+
+    summary = {
+        'rows': len(rows),
+        'model': 'stand-in' if args.stand_in else 'real',
+        **forest.stats,
+        'export_ms': round(export_ms, 1),
+        'max_prob_diff': max_diff,
+        'tolerance': args.tolerance,
+        'top1_agreement': round(top1_agreement, 4),
+        'passed': passed,
+    }
+    for key, value in summary.items():
+        print(f"{key:>16}: {value}")
+    print(f"\n{'batch':>7} {'xgboost_ms':>11} {'numpy_ms':>9} {'speedup':>8}")
+    for t in timings:
+        print(f"{t['batch_size']:>7} {t['xgboost_ms']:>11} {t['numpy_ms']:>9} {t['speedup']:>8}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'summary': summary, 'timings': timings}, f, indent=2)
+        print(f"Results written to {args.output}")
+    return passed
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--csv', help='Training CSV with N, P, K, temperature, humidity, ph, rainfall')
+    source.add_argument('--stand-in', action='store_true', help='Synthetic data and stand-in classifier')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tolerance', type=float, default=1e-5, help='Largest allowed probability difference')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 4, 16, 64, 256])
+    parser.add_argument('--repeats', type=int, default=20, help='Timing repeats per batch size (best is kept)')
+    parser.add_argument('--output', help='Write JSON results to this path')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    sys.exit(0 if run(parse_args()) else 1)
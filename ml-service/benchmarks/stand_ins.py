@@ -0,0 +1,134 @@
+"""Small locally built stand-ins for the real model weights.
+
+The benchmarks must run on a fresh checkout without ``pest_model_best.h5`` or
+``soil_model.pkl``. These helpers build models with the same interfaces and
+input/output shapes as the real ones so the serving code paths are identical;
+only the absolute numbers differ from production.
+"""
+import io
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from models.pest_detection import PestDetectionModel
+from models.pest_engines import GraphEngine, KerasEngine
+from models.soil_recommendation import SoilRecommendationModel
+
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), '..')
+PEST_LABELS_PATH = os.path.join(SERVICE_DIR, 'weights', 'pest_class_labels.json')
+TREATMENT_PATH = os.path.join(SERVICE_DIR, 'data', 'treatment_lookup.json')
+SOIL_CLASSES_PATH = os.path.join(SERVICE_DIR, 'weights', 'soil_classes.json')
+
+# Value ranges accepted by SoilInput in main.py
+SOIL_FEATURE_RANGES = {
+    'nitrogen': (0, 200),
+    'phosphorus': (0, 200),
+    'potassium': (0, 200),
+    'temperature': (-10, 60),
+    'humidity': (0, 100),
+    'ph': (0, 14),
+    'rainfall': (0, 1000),
+}
+
+def build_pest_keras_model(num_classes: int = 38, filters=(16, 32, 64), seed: int = 0):
+    """A small CNN with the production input shape (224x224x3) and softmax output."""
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(seed)
+    inputs = tf.keras.Input(shape=(224, 224, 3))
+    x = inputs
+    for n in filters:
+        x = tf.keras.layers.Conv2D(n, 3, strides=2, padding='same', activation='relu')(x)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    outputs = tf.keras.layers.Dense(num_classes, activation='softmax')(x)
+    return tf.keras.Model(inputs, outputs)
+
+def build_pest_model(filters=(16, 32, 64), seed: int = 0, preprocess_mode: str = 'exact',
+                     engine: str = 'keras', **model_kwargs) -> PestDetectionModel:
+    """A loaded PestDetectionModel backed by ``build_pest_keras_model`` (keras or graph engine)."""
+    model = PestDetectionModel(preprocess_mode=preprocess_mode, engine=engine, **model_kwargs)
+    with open(os.path.abspath(PEST_LABELS_PATH)) as f:
+        model.class_labels = json.load(f)['idx_to_class']
+    with open(os.path.abspath(TREATMENT_PATH)) as f:
+        model.treatment_lookup = json.load(f)
+    model.model = build_pest_keras_model(len(model.class_labels), filters, seed)
+    if engine == 'graph':
+        model.engine = GraphEngine(model.model, model.graph_batch_sizes)
+    else:
+        model.engine = KerasEngine(model.model)
+    model.model_version = f"stand-in:{engine}:{preprocess_mode}:{seed}"
+    model.is_loaded = True
+    model.load_time = time.time()
+    return model
+
+def synthetic_soil_dataset(samples_per_class: int = 100, seed: int = 0):
+    """Clustered synthetic readings, one cluster per real crop class."""
+    with open(os.path.abspath(SOIL_CLASSES_PATH)) as f:
+        class_names = json.load(f)['classes']
+
+    rng = np.random.default_rng(seed)
+    lows = np.array([r[0] for r in SOIL_FEATURE_RANGES.values()], dtype=np.float64)
+    highs = np.array([r[1] for r in SOIL_FEATURE_RANGES.values()], dtype=np.float64)
+    spans = highs - lows
+
+    X, y = [], []
+    for label in range(len(class_names)):
+        centre = lows + spans * rng.uniform(0.15, 0.85, size=len(lows))
+        X.append(np.clip(rng.normal(centre, spans * 0.06, size=(samples_per_class, len(lows))), lows, highs))
+        y.append(np.full(samples_per_class, label))
+    return np.vstack(X), np.concatenate(y), class_names
+
+def build_soil_model(n_estimators: int = 200, max_depth: int = 6, seed: int = 0,
+                     engine: str = 'auto', **model_kwargs) -> SoilRecommendationModel:
+    """A loaded SoilRecommendationModel with an XGBClassifier trained on synthetic data."""
+    from sklearn.preprocessing import LabelEncoder
+    from xgboost import XGBClassifier
+
+    X, y, class_names = synthetic_soil_dataset(seed=seed)
+    classifier = XGBClassifier(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        learning_rate=0.1,
+        subsample=0.8,
+        colsample_bytree=0.8,
+        eval_metric='mlogloss',
+        random_state=seed,
+    )
+    classifier.fit(X, y)
+
+    model = SoilRecommendationModel(engine=engine, **model_kwargs)
+    model.model = classifier
+    model.label_encoder = LabelEncoder().fit(class_names)
+    model.class_names = list(class_names)
+    model.features = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+    model.model_version = f"stand-in:{n_estimators}:{max_depth}:{seed}"
+    model.init_engine()
+    model.init_grid()
+    model.is_loaded = True
+    return model
+
+def make_jpeg(width: int = 1280, height: int = 960, seed: int = 0, quality: int = 90) -> bytes:
+    """A JPEG with smooth structure plus noise, so it compresses like a photo."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([
+        127 + 100 * np.sin(xx / (17 + seed % 7)),
+        127 + 100 * np.cos(yy / (23 + seed % 5)),
+        127 + 100 * np.sin((xx + yy) / 31),
+    ], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+def make_soil_reading(rng: np.random.Generator) -> dict:
+    """One random reading inside the SoilInput ranges."""
+    reading = {
+        name: round(float(rng.uniform(low, high)), 2)
+        for name, (low, high) in SOIL_FEATURE_RANGES.items()
+    }
+    reading['selected_crop'] = None
+    return reading
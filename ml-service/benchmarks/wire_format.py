@@ -0,0 +1,212 @@
+"""Bytes on the wire and server CPU per request for each request/response format.
+
+Sends the same payloads through the FastAPI app in-process (stand-in models)
+in every format an endpoint accepts and reports, per format:
+
+- request and response size: body plus HTTP/1.1 start line and headers
+- server CPU per request (median and p90): CPU time of the event loop thread
+  while the app handles the request - body parsing, validation, cache lookup
+  and serialization. Model calls run in executor threads and are not counted;
+  the prediction caches are warmed first, so single pest and soil requests
+  never reach the model at all.
+
+Formats (request -> response):
+    pest        multipart -> json (the original format), octet-stream -> json,
+                octet-stream -> msgpack
+    soil        json -> json (original), msgpack -> msgpack
+    soil_batch  json -> json (original), msgpack -> msgpack, --soil-rows readings
+    pest_batch  multipart -> ndjson (original), msgpack -> msgpack, --batch-images images
+
+Formats the app does not accept (e.g. on an older checkout) are reported as
+skipped, so the original formats can be measured before and after a change.
+
+Run from the ml-service directory:
+
+    python -m benchmarks.wire_format
+    python -m benchmarks.wire_format --soil-rows 5000 --requests 500 --output /tmp/wire.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+os.environ.setdefault('INTERNAL_API_KEY', 'benchmark-key')
+
+import httpx
+import msgpack
+
+from benchmarks import stand_ins
+
+HEADERS = {'X-Internal-Key': os.environ['INTERNAL_API_KEY']}
+
+class CpuMeter:
+    """ASGI wrapper recording the calling thread's CPU time per request."""
+
+    def __init__(self, app):
+        self.app = app
+        self.samples = []
+
+    async def __call__(self, scope, receive, send):
+        start = time.thread_time_ns()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if scope['type'] == 'http':
+                self.samples.append(time.thread_time_ns() - start)
+
+def header_bytes(headers: httpx.Headers) -> int:
+    return sum(len(name) + len(value) + 4 for name, value in headers.raw) + 2
+
+def request_size(request: httpx.Request) -> int:
+    start_line = len(f"{request.method} {request.url.raw_path.decode()} HTTP/1.1\r\n")
+    return start_line + header_bytes(request.headers) + len(request.read())
+
+def response_size(response: httpx.Response) -> int:
+    return len(f"HTTP/1.1 {response.status_code} {response.reason_phrase}\r\n") + header_bytes(response.headers) + len(response.content)
+
+def soil_columns(rows: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    readings = [stand_ins.make_soil_reading(rng) for _ in range(rows)]
+    return {name: [reading[name] for reading in readings] for name in readings[0]}
+
+def formats(args) -> dict:
+    """``{(endpoint, format): request kwargs}`` for every case."""
+    image = stand_ins.make_jpeg(args.width, args.height, seed=args.seed)
+    images = [stand_ins.make_jpeg(args.width, args.height, seed=args.seed + i) for i in range(args.batch_images)]
+    reading = stand_ins.make_soil_reading(np.random.default_rng(args.seed))
+    columns = soil_columns(args.soil_rows, args.seed)
+    octet = {'Content-Type': 'application/octet-stream'}
+    packed = {'Content-Type': 'application/msgpack', 'Accept': 'application/msgpack'}
+    return {
+        ('pest', 'multipart -> json'): dict(url='/predict/pest', files={'image': ('frame.jpg', image, 'image/jpeg')}),
+        ('pest', 'octet -> json'): dict(url='/predict/pest', content=image, headers=octet),
+        ('pest', 'octet -> msgpack'): dict(url='/predict/pest', content=image,
+                                           headers={**octet, 'Accept': 'application/msgpack'}),
+        ('soil', 'json -> json'): dict(url='/predict/soil', json=reading),
+        ('soil', 'msgpack -> msgpack'): dict(url='/predict/soil', content=msgpack.packb(reading), headers=packed),
+        ('soil_batch', 'json -> json'): dict(url='/predict/soil/batch', json=columns),
+        ('soil_batch', 'msgpack -> msgpack'): dict(url='/predict/soil/batch', content=msgpack.packb(columns),
+                                                   headers=packed),
+        ('pest_batch', 'multipart -> ndjson'): dict(
+            url='/predict/pest/batch',
+            files=[('images', (f'frame_{i}.jpg', data, 'image/jpeg')) for i, data in enumerate(images)],
+        ),
+        ('pest_batch', 'msgpack -> msgpack'): dict(
+            url='/predict/pest/batch',
+            content=msgpack.packb({'images': images, 'filenames': [f'frame_{i}.jpg' for i in range(len(images))]}),
+            headers=packed,
+        ),
+    }
+
+async def start_app(args):
+    """The real app with stand-in models, an executor and a batcher, caches on."""
+    import main
+    from serving.batching import MicroBatcher
+    from serving.executor import InferenceExecutor
+
+    logging.getLogger('main').setLevel(logging.WARNING)
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    models = {
+        'pest': stand_ins.build_pest_model(preprocess_mode=main.PEST_PREPROCESS_MODE, engine=args.pest_engine),
+        'soil': stand_ins.build_soil_model(engine=args.soil_engine),
+    }
+    main.pest_model = models['pest']
+    main.soil_model = models['soil']
+    main.service_start_time = time.time()
+    main.limiter.enabled = False
+    for name in models:
+        main.startup.mark_ready(name)
+
+    executor = InferenceExecutor(backend='thread', workers=main.INFERENCE_WORKERS, max_pending=main.INFERENCE_MAX_PENDING)
+    executor.start(models)
+    batcher = MicroBatcher(
+        lambda images: executor.run('pest', 'predict_batch', images),
+        max_batch_size=main.PEST_BATCH_MAX_SIZE,
+        max_wait_ms=main.PEST_BATCH_MAX_WAIT_MS,
+        name='pest',
+    )
+    await batcher.start()
+    main.inference_executor = executor
+    main.pest_batcher = batcher
+    return main.app, executor, batcher
+
+async def measure(client: httpx.AsyncClient, meter: CpuMeter, kwargs: dict, args) -> dict:
+    kwargs = dict(kwargs)
+    url = kwargs.pop('url')
+    headers = {**HEADERS, **kwargs.pop('headers', {})}
+    request = client.build_request('POST', url, headers=headers, **kwargs)
+    sent = request_size(request)
+
+    try:
+        response = await client.send(request)
+    except Exception as e:
+        return {'skipped': f"app raised {type(e).__name__}"}
+    if response.status_code != 200:
+        return {'skipped': f"{response.status_code}: {response.text[:120]}"}
+    received = response_size(response)
+    # Warm-up, which also fills the prediction caches
+    for _ in range(args.warmup):
+        await client.send(client.build_request('POST', url, headers=headers, **kwargs))
+
+    meter.samples.clear()
+    for _ in range(args.requests):
+        response = await client.send(client.build_request('POST', url, headers=headers, **kwargs))
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} returned {response.status_code}: {response.text[:200]}")
+    cpu_us = np.array(meter.samples) / 1000
+    return {
+        'request_bytes': sent,
+        'response_bytes': received,
+        'server_cpu_us_p50': round(float(np.percentile(cpu_us, 50)), 1),
+        'server_cpu_us_p90': round(float(np.percentile(cpu_us, 90)), 1),
+    }
+
+async def run(args):
+    app, executor, batcher = await start_app(args)
+    meter = CpuMeter(app)
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=meter)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=120) as client:
+            for (endpoint, wire), kwargs in formats(args).items():
+                results.setdefault(endpoint, {})[wire] = await measure(client, meter, kwargs, args)
+    finally:
+        await batcher.stop()
+        executor.shutdown()
+
+    print(f"\n{'endpoint':<11} {'format':<21} {'req_bytes':>10} {'resp_bytes':>10} {'cpu_us_p50':>10} {'cpu_us_p90':>10}")
+    for endpoint, cases in results.items():
+        for wire, r in cases.items():
+            if 'skipped' in r:
+                print(f"{endpoint:<11} {wire:<21} skipped ({r['skipped']})")
+                continue
+            print(f"{endpoint:<11} {wire:<21} {r['request_bytes']:>10} {r['response_bytes']:>10} "
+                  f"{r['server_cpu_us_p50']:>10} {r['server_cpu_us_p90']:>10}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'settings': {name: value for name, value in vars(args).items() if name != 'output'},
+                       'results': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per format')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--soil-rows', type=int, default=1000, help='Readings per soil batch')
+    parser.add_argument('--batch-images', type=int, default=8, help='Images per pest batch')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=960)
+    parser.add_argument('--pest-engine', default='keras', choices=['keras', 'graph'])
+    parser.add_argument('--soil-engine', default='auto', choices=['auto', 'numpy', 'xgboost'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write JSON results to this path')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    asyncio.run(run(parse_args()))
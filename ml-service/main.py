@@ -1,20 +1,44 @@
-import os
 import time
+
+# Start of module import, for the import phase in /health
+_import_started = time.time()
+
+import os
+import asyncio
+import contextvars
+import functools
 import logging
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import Annotated, List, Optional
 
-from fastapi import FastAPI, HTTPException, Request, File, UploadFile, Depends, status
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request, File, UploadFile, Depends, Query, status
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from starlette.routing import Match
 from dotenv import load_dotenv
 
-from models.pest_detection import PestDetectionModel
-from models.soil_recommendation import SoilRecommendationModel
+from models.pest_detection import (
+    DEFAULT_TILE_MAX, DEFAULT_TILE_STRIDE, INPUT_SIZE as PEST_INPUT_SIZE, PestDetectionModel
+)
+from models.pest_engines import FORK_SAFE_ENGINES
+from models.soil_recommendation import SoilRecommendationModel, FEATURE_NAMES
+from models.soil_grid import parse_axes
+from serving.batching import MicroBatcher
+from serving.cache import PredictionCache, content_key, parse_steps, quantized_key
+from serving.executor import InferenceExecutor, build_and_load
+from serving.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from serving.prefork import worker_info
+from serving.protocol import (JSON, MSGPACK, NDJSON, OCTET_STREAM, TENSOR, UnsupportedMediaType,
+                              dumps as protocol_dumps, loads as protocol_loads, media_type, negotiate, unpack_tensor)
+from serving.startup import StartupTracker
+from serving.uploads import (BodySizeLimitMiddleware, MULTIPART_OVERHEAD_BYTES, UploadLimits, UploadRejected,
+                             check_image_bytes, read_image_upload)
 
 # Load environment variables
 load_dotenv()
@@ -29,10 +53,222 @@ logger = logging.getLogger(__name__)
 # Global state
 pest_model: Optional[PestDetectionModel] = None
 soil_model: Optional[SoilRecommendationModel] = None
+pest_batcher: Optional[MicroBatcher] = None
+inference_executor: Optional[InferenceExecutor] = None
 service_start_time: Optional[float] = None
 
-# Rate limiter
-limiter = Limiter(key_func=get_remote_address)
+# Serving processes when run as `python main.py`: 1 = a single uvicorn process,
+# more = pre-fork mode (serving/prefork.py), with models preloaded in the parent
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+# Recycle a worker after this many requests (0 = never), plus up to the jitter
+WORKER_MAX_REQUESTS = int(os.getenv("WORKER_MAX_REQUESTS", "0"))
+WORKER_MAX_REQUESTS_JITTER = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "0"))
+# Math library threads per worker (0 = cores / SERVER_WORKERS)
+WORKER_INTRA_OP_THREADS = int(os.getenv("WORKER_INTRA_OP_THREADS", "0")) or max(1, (os.cpu_count() or 1) // SERVER_WORKERS)
+WORKER_INTER_OP_THREADS = int(os.getenv("WORKER_INTER_OP_THREADS", "1"))
+
+# Micro-batching window for /predict/pest
+PEST_BATCH_MAX_SIZE = int(os.getenv("PEST_BATCH_MAX_SIZE", "16"))
+PEST_BATCH_MAX_WAIT_MS = float(os.getenv("PEST_BATCH_MAX_WAIT_MS", "5"))
+
+# Pest image preprocessing: exact (full decode) or fast (JPEG DCT downscale)
+PEST_PREPROCESS_MODE = os.getenv("PEST_PREPROCESS_MODE", "exact")
+
+# Pest inference runtime: keras (.h5), graph (.h5 traced per batch size),
+# tflite or onnx (see tools/convert_pest_model.py)
+PEST_ENGINE = os.getenv("PEST_ENGINE", "keras")
+PEST_ENGINE_THREADS = int(os.getenv("PEST_ENGINE_THREADS", "0")) or None
+if SERVER_WORKERS > 1 and PEST_ENGINE_THREADS is None:
+    PEST_ENGINE_THREADS = WORKER_INTRA_OP_THREADS
+PEST_GRAPH_BATCH_SIZES = tuple(int(v) for v in os.getenv("PEST_GRAPH_BATCH_SIZES", "1,2,4,8,16,32,64").split(","))
+
+# Run the pest engine on synthetic inputs before serving, so the first
+# requests do not pay for tracing and memory allocation
+PEST_WARMUP = os.getenv("PEST_WARMUP", "true").lower() == "true"
+
+# Versioned model bundle (models/artifacts.py, built by tools/build_model_bundle.py).
+# auto: load from it when MODEL_BUNDLE_DIR has the model, else the .pkl/.h5 files;
+# on: require it; off: always the .pkl/.h5 files
+MODEL_BUNDLE = os.getenv("MODEL_BUNDLE", "auto")
+MODEL_BUNDLE_DIR = os.getenv("MODEL_BUNDLE_DIR") or None
+
+# Pest cascade: a small first-stage classifier (tools/build_pest_first_stage.py)
+# answers when its top-1 confidence is at least PEST_CASCADE_THRESHOLD, other
+# images go to the full model. Empty disables it
+PEST_CASCADE_THRESHOLD = float(os.getenv("PEST_CASCADE_THRESHOLD") or "0") or None
+PEST_CASCADE_ENGINE = os.getenv("PEST_CASCADE_ENGINE", "tflite")
+PEST_CASCADE_PATH = os.getenv("PEST_CASCADE_PATH") or None
+
+PEST_MODEL_OPTIONS = {
+    "preprocess_mode": PEST_PREPROCESS_MODE,
+    "engine": PEST_ENGINE,
+    "engine_threads": PEST_ENGINE_THREADS,
+    "graph_batch_sizes": PEST_GRAPH_BATCH_SIZES,
+    "bundle": MODEL_BUNDLE,
+    "bundle_dir": MODEL_BUNDLE_DIR,
+    "cascade_threshold": PEST_CASCADE_THRESHOLD,
+    "first_stage_engine": PEST_CASCADE_ENGINE,
+    "first_stage_path": PEST_CASCADE_PATH,
+}
+
+# Soil runtime: xgboost, numpy (trees exported to NumPy arrays) or auto
+# (numpy for requests up to SOIL_NUMPY_MAX_ROWS readings, xgboost above)
+SOIL_ENGINE = os.getenv("SOIL_ENGINE", "auto")
+SOIL_NUMPY_MAX_ROWS = int(os.getenv("SOIL_NUMPY_MAX_ROWS", "4"))
+
+# Optional precomputed top-k lookup grid for /predict/soil (models/soil_grid.py).
+# SOIL_GRID_AXES overrides "feature=low:high:step" per axis; SOIL_GRID_SNAP is how
+# far from a grid node (in steps, 0-0.5) a reading may be and still be answered
+SOIL_GRID_ENABLED = os.getenv("SOIL_GRID_ENABLED", "false").lower() == "true"
+SOIL_GRID_AXES = parse_axes(os.getenv("SOIL_GRID_AXES", ""), FEATURE_NAMES) if SOIL_GRID_ENABLED else None
+SOIL_GRID_TOP_K = int(os.getenv("SOIL_GRID_TOP_K", "3"))
+SOIL_GRID_SNAP = float(os.getenv("SOIL_GRID_SNAP", "0"))
+SOIL_GRID_DIR = os.getenv("SOIL_GRID_DIR") or None
+# Soil health, weather risk and crop analysis thresholds; default data/soil_rules.json
+SOIL_RULES_PATH = os.getenv("SOIL_RULES_PATH") or None
+
+SOIL_MODEL_OPTIONS = {
+    "engine": SOIL_ENGINE,
+    "numpy_max_rows": SOIL_NUMPY_MAX_ROWS,
+    "grid_axes": SOIL_GRID_AXES,
+    "grid_top_k": SOIL_GRID_TOP_K,
+    "grid_snap": SOIL_GRID_SNAP,
+    "grid_dir": SOIL_GRID_DIR,
+    "bundle": MODEL_BUNDLE,
+    "bundle_dir": MODEL_BUNDLE_DIR,
+    "rules_path": SOIL_RULES_PATH,
+}
+
+# Build, load and warm up each model; used in this process and by process-pool workers
+model_factories = {
+    "pest": functools.partial(build_and_load, PestDetectionModel, warm_up=PEST_WARMUP, **PEST_MODEL_OPTIONS),
+    "soil": functools.partial(build_and_load, SoilRecommendationModel, warm_up=True, **SOIL_MODEL_OPTIONS),
+}
+
+# Content-addressed pest prediction cache (0 MB disables it, 0 s TTL never expires)
+PEST_CACHE_MAX_MB = float(os.getenv("PEST_CACHE_MAX_MB", "64"))
+PEST_CACHE_TTL_SECONDS = float(os.getenv("PEST_CACHE_TTL_SECONDS", "0"))
+
+# Soil prediction cache keyed by the features snapped to a step per feature
+# (SOIL_CACHE_PRECISION overrides, e.g. "ph=0.1,rainfall=5") plus selected_crop
+SOIL_CACHE_MAX_MB = float(os.getenv("SOIL_CACHE_MAX_MB", "16"))
+SOIL_CACHE_TTL_SECONDS = float(os.getenv("SOIL_CACHE_TTL_SECONDS", "0"))
+SOIL_CACHE_STEPS = parse_steps(os.getenv("SOIL_CACHE_PRECISION", ""), {
+    "nitrogen": 1.0,
+    "phosphorus": 1.0,
+    "potassium": 1.0,
+    "temperature": 0.5,
+    "humidity": 1.0,
+    "ph": 0.05,
+    "rainfall": 2.0,
+})
+
+# /predict/pest/tiles: default pixels between tile origins, and the most tiles
+# a frame may be cut into (also the cap on the max_tiles query parameter).
+# Frames needing more are scaled down, so latency stays bounded
+PEST_TILE_STRIDE = int(os.getenv("PEST_TILE_STRIDE", str(DEFAULT_TILE_STRIDE)))
+PEST_TILE_MAX = int(os.getenv("PEST_TILE_MAX", str(DEFAULT_TILE_MAX)))
+
+# Largest number of images accepted by /predict/pest/batch in one request
+PEST_BATCH_MAX_IMAGES = int(os.getenv("PEST_BATCH_MAX_IMAGES", "256"))
+
+# Largest number of readings accepted by /predict/soil/batch in one request
+SOIL_BATCH_MAX_ROWS = int(os.getenv("SOIL_BATCH_MAX_ROWS", "10000"))
+
+# Upload limits, checked while the body streams in and from the image header
+# before any decode (see README "Upload limits"). Per image: bytes, pixels
+# (width x height) and formats identified by magic bytes, not Content-Type
+PEST_UPLOAD_MAX_MB = float(os.getenv("PEST_UPLOAD_MAX_MB", "20"))
+PEST_UPLOAD_MAX_PIXELS = int(os.getenv("PEST_UPLOAD_MAX_PIXELS", "50000000"))
+PEST_UPLOAD_FORMATS = tuple(v.strip() for v in os.getenv("PEST_UPLOAD_FORMATS", "jpeg,png,webp").split(",") if v.strip())
+PEST_UPLOAD_LIMITS = UploadLimits(PEST_UPLOAD_MAX_MB * 1024 * 1024, PEST_UPLOAD_MAX_PIXELS, PEST_UPLOAD_FORMATS)
+# Whole request bodies: a pest batch, and every other route (soil JSON)
+PEST_BATCH_UPLOAD_MAX_MB = float(os.getenv("PEST_BATCH_UPLOAD_MAX_MB", "512"))
+REQUEST_MAX_MB = float(os.getenv("REQUEST_MAX_MB", "8"))
+
+# Where blocking model calls run: inline (on the event loop), thread or process
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "64"))
+if SERVER_WORKERS > 1 and INFERENCE_BACKEND == "process":
+    logger.warning("INFERENCE_BACKEND=process does not combine with SERVER_WORKERS > 1, using thread")
+    INFERENCE_BACKEND = "thread"
+
+# Models loaded in the pre-fork parent and inherited by every worker. TensorFlow
+# deadlocks in a forked child, so only the soil model and a TFLite pest engine
+# qualify (with a TFLite cascade first stage, if any); other pest engines load
+# in each worker after the fork
+PREFORK_PRELOAD = [
+    name for name in os.getenv("PREFORK_PRELOAD", "soil,pest").split(",")
+    if name == "soil" or (name == "pest" and PEST_ENGINE in FORK_SAFE_ENGINES
+                          and (PEST_CASCADE_THRESHOLD is None or PEST_CASCADE_ENGINE in FORK_SAFE_ENGINES))
+]
+# name -> model (None if it failed) loaded by preload_models()
+preloaded_models: dict = {}
+
+# Re-uploaded images (retries, WhatsApp re-sends, duplicate frames) skip inference
+pest_cache = PredictionCache(
+    max_bytes=int(PEST_CACHE_MAX_MB * 1024 * 1024),
+    ttl_seconds=PEST_CACHE_TTL_SECONDS,
+    name="pest"
+)
+
+# Per-model load state behind /ready and the predict endpoints
+startup = StartupTracker(model_factories)
+
+# Readings from one field barely change between uploads
+soil_cache = PredictionCache(
+    max_bytes=int(SOIL_CACHE_MAX_MB * 1024 * 1024),
+    ttl_seconds=SOIL_CACHE_TTL_SECONDS,
+    name="soil"
+)
+
+# Prometheus metrics at /metrics (per process; see README "Metrics")
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+metrics = MetricsRegistry()
+http_request_seconds = metrics.histogram(
+    "agri_http_request_duration_seconds",
+    "Request latency from the middleware's view, by route template, method and status",
+    ("endpoint", "method", "status"),
+)
+# upload_read: body received and parsed into the handler's input (plus the image read)
+# predict: cache lookup, batching queue, executor queue and the model call
+# serialize: response validation and JSON rendering after the handler returns
+request_stage_seconds = metrics.histogram(
+    "agri_request_stage_seconds",
+    "Time per request stage outside the model (upload_read, predict, serialize)",
+    ("endpoint", "stage"),
+)
+# Reported by the models themselves: decode and preprocess per image, forward
+# and postprocess per batch. Not visible with INFERENCE_BACKEND=process
+model_stage_seconds = metrics.histogram(
+    "agri_model_stage_seconds",
+    "Time per model stage (decode, preprocess, forward, postprocess), by endpoint",
+    ("endpoint", "model", "stage"),
+)
+# Route template of the request a model call serves; set by the logging
+# middleware, carried into executor threads and micro-batches
+model_stage_endpoint = contextvars.ContextVar("model_stage_endpoint", default="none")
+http_in_flight = metrics.gauge("agri_http_requests_in_flight", "HTTP requests being handled")
+metrics.gauge("agri_executor_in_flight", "Model calls running in the inference executor").set_function(
+    lambda: inference_executor.in_flight if inference_executor else 0
+)
+metrics.gauge("agri_executor_waiting", "Model calls queued for an inference executor slot").set_function(
+    lambda: inference_executor.waiting if inference_executor else 0
+)
+metrics.gauge("agri_batcher_queue_depth", "Requests waiting to join a micro-batch", ("model",)).set_function(
+    lambda: pest_batcher.stats["queue_depth"] if pest_batcher else 0, model="pest"
+)
+model_ready = metrics.gauge("agri_model_ready", "1 once the model serves requests", ("model",))
+for _name in model_factories:
+    model_ready.set_function(functools.partial(startup.is_ready, _name), model=_name)
+
+# Rate limiter (100 requests/minute per client IP); RATE_LIMIT_ENABLED=false
+# turns it off for local load tests
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+limiter = Limiter(key_func=get_remote_address, enabled=RATE_LIMIT_ENABLED)
 
 # Pydantic Models
 class SoilInput(BaseModel):
@@ -45,6 +281,21 @@ class SoilInput(BaseModel):
     rainfall: float = Field(..., ge=0, le=1000, description="Annual rainfall in mm")
     selected_crop: Optional[str] = Field(None, description="Optional crop name to analyze")
 
+class SoilBatchInput(BaseModel):
+    """Readings in column form: every list holds one value per reading.
+    
+    Values have the same ranges as SoilInput, so an out-of-range reading is
+    a 422 with its row in ``loc`` on both soil endpoints.
+    """
+    nitrogen: List[Annotated[float, Field(ge=0, le=200)]] = Field(..., description="Nitrogen content in soil (kg/ha)")
+    phosphorus: List[Annotated[float, Field(ge=0, le=200)]] = Field(..., description="Phosphorus content in soil (kg/ha)")
+    potassium: List[Annotated[float, Field(ge=0, le=200)]] = Field(..., description="Potassium content in soil (kg/ha)")
+    temperature: List[Annotated[float, Field(ge=-10, le=60)]] = Field(..., description="Temperature in Celsius")
+    humidity: List[Annotated[float, Field(ge=0, le=100)]] = Field(..., description="Humidity percentage")
+    ph: List[Annotated[float, Field(ge=0, le=14)]] = Field(..., description="Soil pH level")
+    rainfall: List[Annotated[float, Field(ge=0, le=1000)]] = Field(..., description="Annual rainfall in mm")
+    selected_crop: Optional[List[Optional[str]]] = Field(None, description="Optional crop name per reading")
+
 class APIInfoResponse(BaseModel):
     message: str
     version: str
@@ -63,8 +314,17 @@ class PestPredictionResponse(BaseModel):
     pesticide: Optional[str]
     raw_class: str
     inference_ms: float
+    stage: str = "full"
     top_3: list
 
+class PestTilesResponse(BaseModel):
+    detections: list
+    healthy_share: float
+    heatmap: dict
+    stages: dict
+    inference_ms: float
+    tiles: dict
+
 class SoilPredictionResponse(BaseModel):
     recommended_crops: list
     selected_crop_analysis: Optional[dict]
@@ -72,10 +332,21 @@ class SoilPredictionResponse(BaseModel):
     weather_risk: str
     inference_ms: float
 
+class SoilBatchPredictionResponse(BaseModel):
+    results: list
+    count: int
+    inference_ms: float
+
 class HealthResponse(BaseModel):
     status: str
     pest_model: dict
     soil_model: dict
+    pest_batching: Optional[dict] = None
+    executor: Optional[dict] = None
+    pest_cache: Optional[dict] = None
+    soil_cache: Optional[dict] = None
+    startup: Optional[dict] = None
+    worker: Optional[dict] = None
     uptime_seconds: float
     version: str
 
@@ -83,35 +354,199 @@ class ErrorResponse(BaseModel):
     error: str
     code: str
 
+def _activate(name: str, model):
+    """Publish a loaded model to the endpoints and the inference executor."""
+    global pest_model, soil_model
+    if name == "pest":
+        pest_model = model
+    else:
+        soil_model = model
+    model.stage_observer = functools.partial(_observe_model_stage, name)
+    inference_executor.register(name, model)
+
+def _observe_model_stage(model_name: str, stage: str, seconds: float):
+    model_stage_seconds.observe(seconds, endpoint=model_stage_endpoint.get(), model=model_name, stage=stage)
+
+def _endpoint_label(request: Request) -> str:
+    """Route template (e.g. /ready/{model_name}), so each route is one metrics series."""
+    route = request.scope.get("route")
+    if route is None:
+        route = next((r for r in app.router.routes if r.matches(request.scope)[0] == Match.FULL), None)
+    return getattr(route, "path", "unmatched")
+
+def _stage_done(request: Request, stage: str):
+    """Record ``stage`` as the time since the previous stage (or the request start) ended."""
+    now = time.perf_counter()
+    request_stage_seconds.observe(now - request.state.stage_start, endpoint=_endpoint_label(request), stage=stage)
+    request.state.stage_start = now
+    request.state.last_stage = stage
+
+def _respond(request: Request, content) -> Response:
+    """Serialize ``content`` as JSON or MessagePack, whichever the Accept header prefers.
+    
+    Handlers return this rather than a model instance: results are validated
+    once when they are computed, not again through ``response_model`` (which
+    still documents the shape).
+    """
+    media = negotiate(request.headers.get("accept"), (JSON, MSGPACK))
+    return Response(content=protocol_dumps(content, media), media_type=media)
+
+def _missing_field(name: str) -> RequestValidationError:
+    return RequestValidationError([{"type": "missing", "loc": ("body", name), "msg": "Field required", "input": None}])
+
+def _decode_error(media: str, error: ValueError) -> RequestValidationError:
+    """Same 422 FastAPI gives for malformed JSON, for either format."""
+    return RequestValidationError([{
+        "type": "json_invalid", "loc": ("body",), "input": {},
+        "msg": "MessagePack decode error" if media == MSGPACK else "JSON decode error",
+        "ctx": {"error": str(error) or type(error).__name__},
+    }])
+
+def _json_safe(value):
+    """``value`` with NaN/Infinity (which MessagePack can carry) as strings, so a 422 can echo it."""
+    if isinstance(value, float) and not np.isfinite(value):
+        return str(value)
+    if isinstance(value, list):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    return value
+
+def _decoded_body(model):
+    """Dependency parsing a JSON or MessagePack body (by Content-Type) into ``model``.
+    
+    Depends on ``verify_internal_key`` so an unauthenticated request gets 401
+    before its body is read, whatever order the route declares them in.
+    """
+    async def parse(request: Request, _: bool = Depends(verify_internal_key)):
+        media = media_type(request.headers.get("content-type"))
+        try:
+            payload = protocol_loads(await request.body(), media)
+        except UnsupportedMediaType as e:
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+        except ValueError as e:
+            raise _decode_error(media, e)
+        if not isinstance(payload, dict):
+            raise RequestValidationError([{
+                "type": "model_attributes_type", "loc": ("body",), "input": _json_safe(payload),
+                "msg": "Input should be a valid dictionary or object to extract fields from",
+            }])
+        try:
+            return model(**payload)
+        except ValidationError as e:
+            raise RequestValidationError([{**error, "loc": ("body", *error["loc"]), "input": _json_safe(error["input"])}
+                                          for error in e.errors(include_url=False)])
+    return parse
+
+def _body_schema(model) -> dict:
+    """``openapi_extra`` for a route whose body is parsed by ``_decoded_body``."""
+    schema = {"schema": model.model_json_schema()}
+    return {"requestBody": {"required": True, "content": {JSON: schema, MSGPACK: schema}}}
+
+async def _raw_image_body(request: Request) -> bytes:
+    """The image sent as the whole request body (octet-stream or image/*), without multipart parsing."""
+    media = media_type(request.headers.get("content-type"))
+    if media == "multipart/form-data":
+        raise _missing_field("image")
+    if media != OCTET_STREAM and not media.startswith("image/"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported Content-Type {media}. Send multipart/form-data, {OCTET_STREAM} or {TENSOR}"
+        )
+    return await request.body()
+
+async def _tensor_body(request: Request):
+    """Pixels decoded and resized on the device: a read-only (N, 224, 224, 3) uint8 view of the body."""
+    try:
+        return unpack_tensor(await request.body(), (PEST_INPUT_SIZE, PEST_INPUT_SIZE, 3))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def preload_models():
+    """Load the PREFORK_PRELOAD models in the pre-fork parent, before workers are forked."""
+    for name in PREFORK_PRELOAD:
+        preloaded_models[name] = startup.load_now(name, model_factories[name])
+
+async def _load_models():
+    """Load both models in parallel.
+    
+    With the inline/thread backends each model serves as soon as it is
+    loaded, so soil requests do not wait for TensorFlow. With the process
+    backend a model is ready once the workers have built their copies too.
+    """
+    async def load(name: str):
+        if name in preloaded_models:
+            # Loaded (or failed) in the pre-fork parent
+            model = preloaded_models[name]
+        else:
+            model = await startup.load(name, model_factories[name])
+        if model is not None:
+            _activate(name, model)
+            if INFERENCE_BACKEND != "process":
+                startup.mark_ready(name)
+        return model
+    
+    # Process workers build their copies while this process loads its own
+    phase_start = time.time()
+    priming = asyncio.ensure_future(inference_executor.prime()) if INFERENCE_BACKEND == "process" else None
+    loaded = dict(zip(model_factories, await asyncio.gather(*(load(name) for name in model_factories))))
+    if priming is None:
+        return
+    
+    try:
+        in_workers = await priming
+    except Exception as e:
+        logger.error(f"Inference workers failed to start: {e}")
+        in_workers = set()
+    startup.record_phase("workers_ms", (time.time() - phase_start) * 1000)
+    for name, model in loaded.items():
+        if model is None:
+            continue
+        if name in in_workers:
+            startup.mark_ready(name)
+        else:
+            startup.mark_failed(name, "Model did not load in the inference workers")
+
 # Lifespan context manager for startup/shutdown events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global pest_model, soil_model, service_start_time
+    global pest_batcher, inference_executor, service_start_time
     
     logger.info("Starting Agri Sathi ML Service...")
     service_start_time = time.time()
     
-    try:
-        # Load pest detection model
-        pest_model = PestDetectionModel()
-        pest_model.load()
-        logger.info("Pest detection model loaded successfully")
-        # logger.info("Pest detection model loading SKIPPED (compatibility issues)")
-        
-        # Load soil recommendation model
-        soil_model = SoilRecommendationModel()
-        soil_model.load()
-        logger.info("Soil recommendation model loaded successfully")
-        
-        logger.info("All models loaded. Service ready.")
-    except Exception as e:
-        logger.error(f"Failed to load models: {e}")
-        raise
+    # Run inference off the event loop so uploads and /health stay responsive
+    inference_executor = InferenceExecutor(
+        backend=INFERENCE_BACKEND,
+        workers=INFERENCE_WORKERS,
+        max_pending=INFERENCE_MAX_PENDING,
+        factories=model_factories
+    )
+    inference_executor.start()
+    
+    # Concurrent pest requests share batched forward passes
+    pest_batcher = MicroBatcher(
+        lambda images: inference_executor.run("pest", "predict_batch", images),
+        max_batch_size=PEST_BATCH_MAX_SIZE,
+        max_wait_ms=PEST_BATCH_MAX_WAIT_MS,
+        name="pest",
+        # One batch per inference worker, so a flight keeps every worker busy
+        max_in_flight=inference_executor.workers
+    )
+    await pest_batcher.start()
+    
+    # Models load in the background; /live answers now, /ready once they are in
+    loading = asyncio.create_task(_load_models())
     
     yield
     
     # Shutdown
     logger.info("Shutting down Agri Sathi ML Service...")
+    loading.cancel()
+    if pest_batcher:
+        await pest_batcher.stop()
+    if inference_executor:
+        inference_executor.shutdown()
 
 # Create FastAPI app
 app = FastAPI(
@@ -125,6 +560,17 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# Body size limits - added before CORS so it runs inside it and 413s keep their CORS headers
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    default_max_bytes=int(REQUEST_MAX_MB * 1024 * 1024),
+    max_bytes_by_path={
+        "/predict/pest": PEST_UPLOAD_LIMITS.max_bytes + MULTIPART_OVERHEAD_BYTES,
+        "/predict/pest/tiles": PEST_UPLOAD_LIMITS.max_bytes + MULTIPART_OVERHEAD_BYTES,
+        "/predict/pest/batch": int(PEST_BATCH_UPLOAD_MAX_MB * 1024 * 1024),
+    },
+)
+
 # CORS middleware - allow only Next.js backend
 allowed_origins = [os.getenv("NEXTJS_BACKEND_URL", "http://localhost:3000")]
 app.add_middleware(
@@ -157,10 +603,23 @@ async def verify_internal_key(request: Request):
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = time.time()
+    request.state.stage_start = time.perf_counter()
+    endpoint = _endpoint_label(request)
+    model_stage_endpoint.set(endpoint)
     
-    response = await call_next(request)
+    http_in_flight.inc()
+    try:
+        response = await call_next(request)
+    finally:
+        http_in_flight.dec()
     
     process_time = (time.time() - start_time) * 1000
+    # After the predict stage, the rest is building and rendering the response
+    if getattr(request.state, "last_stage", None) == "predict":
+        request_stage_seconds.observe(time.perf_counter() - request.state.stage_start, endpoint=endpoint, stage="serialize")
+    http_request_seconds.observe(
+        process_time / 1000, endpoint=endpoint, method=request.method, status=str(response.status_code)
+    )
     logger.info(
         f"{request.method} {request.url.path} - {response.status_code} - {process_time:.2f}ms"
     )
@@ -194,6 +653,24 @@ async def root():
                 "description": "Health check endpoint returning service and model status",
                 "authentication": "None"
             },
+            "metrics": {
+                "method": "GET",
+                "path": "/metrics",
+                "description": "Per-stage latency histograms and queue gauges in Prometheus text format",
+                "authentication": "None"
+            },
+            "liveness": {
+                "method": "GET",
+                "path": "/live",
+                "description": "Liveness probe; 200 while the process is up, even during model loading",
+                "authentication": "None"
+            },
+            "readiness": {
+                "method": "GET",
+                "path": "/ready",
+                "description": "Readiness probe; 200 once both models serve, 503 with per-model states before that. /ready/pest and /ready/soil check one model",
+                "authentication": "None"
+            },
             "pest_detection": {
                 "method": "POST",
                 "path": "/predict/pest",
@@ -201,66 +678,326 @@ async def root():
                 "authentication": "X-Internal-Key header required",
                 "request_body": "multipart/form-data with image file"
             },
+            "pest_detection_tiles": {
+                "method": "POST",
+                "path": "/predict/pest/tiles",
+                "description": "Run pest/disease detection over overlapping 224x224 tiles of a whole frame, with a per-frame summary and heatmap",
+                "authentication": "X-Internal-Key header required",
+                "request_body": "multipart/form-data with image file, or the raw image bytes"
+            },
+            "pest_detection_batch": {
+                "method": "POST",
+                "path": "/predict/pest/batch",
+                "description": "Run pest/disease detection on many images, streaming one NDJSON record per image",
+                "authentication": "X-Internal-Key header required",
+                "request_body": "multipart/form-data with repeated images fields"
+            },
             "soil_recommendation": {
                 "method": "POST",
                 "path": "/predict/soil",
                 "description": "Get crop recommendations based on soil and weather data",
                 "authentication": "X-Internal-Key header required",
                 "request_body": "JSON with soil parameters (nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall, selected_crop)"
+            },
+            "soil_recommendation_batch": {
+                "method": "POST",
+                "path": "/predict/soil/batch",
+                "description": "Get crop recommendations for many readings in one vectorized pass",
+                "authentication": "X-Internal-Key header required",
+                "request_body": "JSON with one list per soil parameter (same fields as /predict/soil)"
             }
         }
     )
 
+# Liveness probe - the process is up, even while models are loading
+@app.get("/live")
+async def liveness():
+    """Liveness probe; answers as soon as the server accepts connections."""
+    return {"status": "alive"}
+
+# Readiness probes - no auth required
+@app.get("/ready")
+async def readiness():
+    """200 once every model can serve, 503 (with per-model states) before that."""
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if startup.is_ready() else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=startup.stats
+    )
+
+@app.get("/ready/{model_name}")
+async def model_readiness(model_name: str):
+    """Readiness of one model (pest or soil), so soil traffic can start before pest."""
+    if model_name not in startup.models:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown model '{model_name}'. Expected one of: {', '.join(startup.models)}"
+        )
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if startup.is_ready(model_name) else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=startup.models[model_name]
+    )
+
 # Health check endpoint - no auth required
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint returning service and model status."""
-    global pest_model, soil_model, service_start_time
+    global pest_model, soil_model, pest_batcher, inference_executor, service_start_time
     
     uptime = time.time() - service_start_time if service_start_time else 0
     
     return HealthResponse(
-        status="healthy" if (pest_model and pest_model.is_loaded and soil_model and soil_model.is_loaded) else "degraded",
+        status={"ready": "healthy"}.get(startup.status, startup.status),
         pest_model=pest_model.stats if pest_model else {"is_loaded": False},
         soil_model=soil_model.stats if soil_model else {"is_loaded": False},
+        pest_batching=pest_batcher.stats if pest_batcher else None,
+        executor=inference_executor.stats if inference_executor else None,
+        pest_cache=pest_cache.stats,
+        soil_cache=soil_cache.stats,
+        startup=startup.stats,
+        worker=worker_info(),
         uptime_seconds=round(uptime, 2),
         version="1.0.0"
     )
 
+# Prometheus scrape endpoint - no auth required, like /health
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Stage latency histograms and queue gauges in Prometheus text format."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    return Response(content=metrics.render(), headers={"Content-Type": METRICS_CONTENT_TYPE})
+
+async def _predict_pest_cached(image_bytes) -> dict:
+    """Score one image (encoded bytes or pre-decoded pixels), answering repeats of the same bytes from the cache."""
+    async def compute():
+        return PestPredictionResponse(**(await pest_batcher.submit(image_bytes))).dict()
+    
+    return await pest_cache.get_or_compute(content_key(image_bytes), pest_model.model_version, compute)
+
 # Pest prediction endpoint
 @app.post("/predict/pest", response_model=PestPredictionResponse)
 @limiter.limit("100/minute")
 async def predict_pest(
     request: Request,
-    image: UploadFile = File(...),
+    image: Optional[UploadFile] = File(None),
     _: bool = Depends(verify_internal_key)
 ):
-    """Run pest/disease detection on uploaded image."""
-    global pest_model
+    """Run pest/disease detection on uploaded image.
+    
+    The image is either the ``image`` field of a multipart form, the raw
+    request body (``application/octet-stream``) or pixels already resized on
+    the device (``application/x-agri-tensor``, one item). The response is
+    JSON, or MessagePack with ``Accept: application/msgpack``.
+    """
+    global pest_model, pest_batcher
     
-    if not pest_model or not pest_model.is_loaded:
+    if not startup.is_ready("pest"):
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Pest detection model not available"
         )
     
-    # Validate file type
-    if not image.content_type or not image.content_type.startswith("image/"):
+    # Validate size, format and dimensions from the header before decoding
+    try:
+        if image is not None:
+            image_bytes = await read_image_upload(image, PEST_UPLOAD_LIMITS)
+        elif media_type(request.headers.get("content-type")) == TENSOR:
+            pixels = await _tensor_body(request)
+            if len(pixels) != 1:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Expected one image, got {len(pixels)}. Use /predict/pest/batch for several."
+                )
+            image_bytes = pixels[0]
+        else:
+            image_bytes = check_image_bytes(await _raw_image_body(request), PEST_UPLOAD_LIMITS)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    _stage_done(request, "upload_read")
+    
+    try:
+        result = await _predict_pest_cached(image_bytes)
+        _stage_done(request, "predict")
+        return _respond(request, result)
+    except Exception as e:
+        logger.error(f"Prediction error: {e}")
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid file type. Please upload an image file."
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to process image"
         )
+
+# Tiled whole-frame pest detection endpoint
+@app.post("/predict/pest/tiles", response_model=PestTilesResponse)
+@limiter.limit("100/minute")
+async def predict_pest_tiles(
+    request: Request,
+    image: Optional[UploadFile] = File(None),
+    stride: int = Query(PEST_TILE_STRIDE, ge=16, le=PEST_INPUT_SIZE),
+    max_tiles: int = Query(PEST_TILE_MAX, ge=1, le=PEST_TILE_MAX),
+    _: bool = Depends(verify_internal_key)
+):
+    """Run pest/disease detection over overlapping 224x224 tiles of a whole frame.
+    
+    For drone and other high-resolution frames that hold many plants, where
+    squashing the frame into one 224x224 input loses the lesions. Tiles
+    start ``stride`` pixels apart; a frame that would need more than
+    ``max_tiles`` is scaled down until it fits. The tiles run as batched
+    forward passes on an inference worker (not through the micro-batcher),
+    and the response summarizes them per frame plus a class/confidence grid.
+    """
+    global pest_model
+    
+    if not startup.is_ready("pest"):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Pest detection model not available"
+        )
+    
+    try:
+        if image is not None:
+            image_bytes = await read_image_upload(image, PEST_UPLOAD_LIMITS)
+        elif media_type(request.headers.get("content-type")) == TENSOR:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Tiled detection needs the full-resolution image, not pre-decoded 224x224 pixels"
+            )
+        else:
+            image_bytes = check_image_bytes(await _raw_image_body(request), PEST_UPLOAD_LIMITS)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    _stage_done(request, "upload_read")
     
     try:
-        image_bytes = await image.read()
-        result = pest_model.predict(image_bytes)
-        return PestPredictionResponse(**result)
+        result = await inference_executor.run(
+            "pest", "predict_tiles", image_bytes, stride, max_tiles, PEST_BATCH_MAX_SIZE
+        )
+    except ValueError as e:
+        # Frame too elongated to fit max_tiles at this stride
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        logger.error(f"Prediction error: {e}")
+        logger.error(f"Tiled prediction error: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to process image"
         )
+    _stage_done(request, "predict")
+    return _respond(request, PestTilesResponse(**result).dict())
+
+async def _score_batch_image(index: int, filename: Optional[str], image_bytes) -> dict:
+    """Score one image of a batch upload. Failures become an error record."""
+    record = {"index": index, "filename": filename}
+    
+    if isinstance(image_bytes, UploadRejected):
+        return {**record, "status": "error", "error": image_bytes.message, "code": image_bytes.code}
+    
+    try:
+        result = await _predict_pest_cached(image_bytes)
+        return {**record, "status": "ok", "result": result}
+    except Exception as e:
+        logger.error(f"Batch prediction error for image {index}: {e}")
+        return {**record, "status": "error", "error": "Failed to process image", "code": "PREDICTION_FAILED"}
+
+async def _packed_images(request: Request) -> list:
+    """(filename, bytes) pairs from a MessagePack batch body: ``{"images": [bin, ...], "filenames": [str, ...]}``."""
+    media = media_type(request.headers.get("content-type"))
+    if media == "multipart/form-data":
+        raise _missing_field("images")
+    if media != MSGPACK:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported Content-Type {media}. Send multipart/form-data or {MSGPACK}"
+        )
+    try:
+        payload = protocol_loads(await request.body(), MSGPACK)
+    except ValueError as e:
+        raise _decode_error(MSGPACK, e)
+    
+    images = payload.get("images") if isinstance(payload, dict) else None
+    if not isinstance(images, list) or not all(isinstance(image, bytes) for image in images):
+        raise RequestValidationError([{"type": "list_type", "loc": ("body", "images"),
+                                       "msg": "Input should be a list of binary images", "input": None}])
+    filenames = payload.get("filenames")
+    if filenames is None:
+        filenames = []
+    elif not isinstance(filenames, list) or not all(isinstance(name, str) for name in filenames):
+        raise RequestValidationError([{"type": "list_type", "loc": ("body", "filenames"),
+                                       "msg": "Input should be a list of strings", "input": None}])
+    return [(filenames[index] if index < len(filenames) else None, image) for index, image in enumerate(images)]
+
+# Batch pest prediction endpoint - streams newline-delimited JSON
+@app.post("/predict/pest/batch")
+@limiter.limit("100/minute")
+async def predict_pest_batch(
+    request: Request,
+    images: Optional[List[UploadFile]] = File(None),
+    _: bool = Depends(verify_internal_key)
+):
+    """Run pest/disease detection on many images, streaming results as NDJSON.
+    
+    Every image goes through the micro-batcher, so a flight is scored in
+    batched forward passes. One record is written per image as soon as its
+    batch finishes (not in upload order - use ``index``); a failed image only
+    produces an error record for itself.
+    
+    Images come as repeated multipart ``images`` fields, in a MessagePack
+    body or as N stacked pre-decoded tensors (``application/x-agri-tensor``);
+    ``Accept: application/msgpack`` streams the records as a sequence of
+    MessagePack objects instead of JSON lines.
+    """
+    global pest_model, pest_batcher
+    
+    if not startup.is_ready("pest"):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Pest detection model not available"
+        )
+    
+    if images is not None:
+        named = [(image.filename, image) for image in images]
+    elif media_type(request.headers.get("content-type")) == TENSOR:
+        # Views into the body: every image reaches normalization uncopied
+        named = [(None, pixels) for pixels in await _tensor_body(request)]
+    else:
+        named = await _packed_images(request)
+    
+    if len(named) > PEST_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many images. At most {PEST_BATCH_MAX_IMAGES} images per request."
+        )
+    
+    # Read every upload before streaming starts; the form files are closed
+    # once the handler returns. A rejected image becomes its error record.
+    uploads = []
+    for filename, image in named:
+        try:
+            if isinstance(image, np.ndarray):
+                uploads.append((filename, image))
+            elif isinstance(image, bytes):
+                uploads.append((filename, check_image_bytes(image, PEST_UPLOAD_LIMITS)))
+            else:
+                uploads.append((filename, await read_image_upload(image, PEST_UPLOAD_LIMITS)))
+        except UploadRejected as e:
+            uploads.append((filename, e))
+    _stage_done(request, "upload_read")
+    tasks = [
+        asyncio.create_task(_score_batch_image(index, *upload))
+        for index, upload in enumerate(uploads)
+    ]
+    
+    media = negotiate(request.headers.get("accept"), (NDJSON, MSGPACK))
+    separator = b"\n" if media == NDJSON else b""
+    
+    async def stream_records():
+        try:
+            for next_record in asyncio.as_completed(tasks):
+                yield protocol_dumps(await next_record, media) + separator
+        finally:
+            # Client went away - stop scoring what is left
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream_records(), media_type=media)
 
 # Informative handler for GET requests to pest endpoint
 @app.get("/predict/pest")
@@ -271,7 +1008,7 @@ async def pest_endpoint_info():
         content={
             "error": "Method Not Allowed",
             "message": "This endpoint only accepts POST requests.",
-            "usage": "Send a POST request with multipart form data containing an image file.",
+            "usage": "Send a POST request with multipart form data containing an image file, or the raw image bytes as application/octet-stream.",
             "required_fields": {
                 "image": "Image file (JPEG, PNG, etc.)"
             },
@@ -281,25 +1018,38 @@ async def pest_endpoint_info():
     )
 
 # Soil recommendation endpoint
-@app.post("/predict/soil", response_model=SoilPredictionResponse)
+@app.post("/predict/soil", response_model=SoilPredictionResponse, openapi_extra=_body_schema(SoilInput))
 @limiter.limit("100/minute")
 async def predict_soil(
     request: Request,
-    data: SoilInput,
+    data: SoilInput = Depends(_decoded_body(SoilInput)),
     _: bool = Depends(verify_internal_key)
 ):
-    """Get crop recommendations based on soil and weather data."""
-    global soil_model
+    """Get crop recommendations based on soil and weather data.
+    
+    The body is JSON or MessagePack (by Content-Type), and so is the
+    response (by Accept).
+    """
+    global soil_model, inference_executor
     
-    if not soil_model or not soil_model.is_loaded:
+    if not startup.is_ready("soil"):
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Soil recommendation model not available"
         )
     
+    _stage_done(request, "upload_read")
     try:
-        result = soil_model.predict(data.dict())
-        return SoilPredictionResponse(**result)
+        reading = data.dict()
+        selected_crop = (reading["selected_crop"] or "").lower() or None
+        key = quantized_key(reading, SOIL_CACHE_STEPS, FEATURE_NAMES) + (selected_crop,)
+        
+        async def compute():
+            return SoilPredictionResponse(**(await inference_executor.run("soil", "predict", **reading))).dict()
+        
+        result = await soil_cache.get_or_compute(key, soil_model.model_version, compute)
+        _stage_done(request, "predict")
+        return _respond(request, result)
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         raise HTTPException(
@@ -307,6 +1057,60 @@ async def predict_soil(
             detail="Failed to process soil data"
         )
 
+# Batch soil recommendation endpoint
+@app.post("/predict/soil/batch", response_model=SoilBatchPredictionResponse,
+          openapi_extra=_body_schema(SoilBatchInput))
+@limiter.limit("100/minute")
+async def predict_soil_batch(
+    request: Request,
+    data: SoilBatchInput = Depends(_decoded_body(SoilBatchInput)),
+    _: bool = Depends(verify_internal_key)
+):
+    """Get crop recommendations for many readings with one model call.
+    
+    JSON or MessagePack in and out, like /predict/soil.
+    """
+    global soil_model, inference_executor
+    
+    if not startup.is_ready("soil"):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Soil recommendation model not available"
+        )
+    
+    if len(data.nitrogen) > SOIL_BATCH_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many readings. At most {SOIL_BATCH_MAX_ROWS} readings per request."
+        )
+    
+    _stage_done(request, "upload_read")
+    columns = data.dict()
+    selected_crops = columns.pop("selected_crop")
+    
+    start_time = time.time()
+    try:
+        results = await inference_executor.run("soil", "predict_batch", columns, selected_crops)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Batch prediction error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to process soil data"
+        )
+    
+    _stage_done(request, "predict")
+    # Rows come straight from the model; validating thousands of them again would cost more than scoring
+    return _respond(request, {
+        "results": results,
+        "count": len(results),
+        "inference_ms": round((time.time() - start_time) * 1000, 2)
+    })
+
 # Informative handler for GET requests to soil endpoint
 @app.get("/predict/soil")
 async def soil_endpoint_info():
@@ -334,6 +1138,21 @@ async def soil_endpoint_info():
         }
     )
 
+# Everything above ran at import; the time shows up under startup.phases
+startup.record_phase("import_ms", (time.time() - _import_started) * 1000)
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if SERVER_WORKERS > 1:
+        from serving.prefork import PreforkServer
+        PreforkServer(
+            app,
+            workers=SERVER_WORKERS,
+            preload=preload_models,
+            max_requests=WORKER_MAX_REQUESTS,
+            max_requests_jitter=WORKER_MAX_REQUESTS_JITTER,
+            intra_op_threads=WORKER_INTRA_OP_THREADS,
+            inter_op_threads=WORKER_INTER_OP_THREADS,
+        ).run(SERVER_HOST, SERVER_PORT)
+    else:
+        import uvicorn
+        uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT)
@@ -9,13 +9,14 @@ from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import pickle
 import json
+import os
 import matplotlib.pyplot as plt
 import seaborn as sns
 
 # Load dataset
-df = pd.read_csv('model\Crop_recommendation.csv')
+df = pd.read_csv(os.path.join('model', 'Crop_recommendation.csv'))
 print(f"Dataset shape: {df.shape}")
-print(f"Crops: {df['label'].unique()}")``
+print(f"Crops: {df['label'].unique()}")
 print(f"Class distribution:\n{df['label'].value_counts()}")
 
 # Features and target
@@ -100,4 +101,21 @@ with open('soil_classes.json', 'w') as f:
     }, f, indent=2)
 
 print("\n✅ Soil model saved as soil_model.pkl")
-print(f"✅ soil_classes.json saved with {len(le.classes_)} crop classes")
\ No newline at end of file
+print(f"✅ soil_classes.json saved with {len(le.classes_)} crop classes")
+
+# Versioned model bundle the service loads fastest (native XGBoost model plus
+# memory-mapped tree arrays). Needs the ml-service directory on the import
+# path, e.g. run from there as: python -m models.Soil_trainning
+try:
+    from models.artifacts import write_soil_section
+except ImportError:
+    print("ℹ️ Bundle not written; convert later with: python -m tools.build_model_bundle --only soil")
+else:
+    bundle_version = write_soil_section(
+        xgb_model,
+        list(le.classes_),
+        FEATURES,
+        accuracy=float(accuracy_score(y_test, xgb_pred)),
+        n_classes=len(le.classes_),
+    )
+    print(f"✅ Model bundle soil section {bundle_version} written to weights/bundle")
@@ -0,0 +1,220 @@
+"""Versioned model bundle: one directory the service loads both models from.
+
+Layout (``weights/bundle`` by default)::
+
+    manifest.json          format version plus one entry per section
+    soil-<version>/
+        model.ubj          XGBoost native model (no pickle, no LabelEncoder)
+        forest/*.npy       NumpyForest arrays, opened memory-mapped
+    pest-<version>/
+        graph/             SavedModel of the forward pass (no .h5 layer shim)
+        pest_model.tflite  optional, for PEST_ENGINE=tflite
+        pest_model.onnx    optional, for PEST_ENGINE=onnx
+
+Each section's directory is named after a hash of its files, and
+``manifest.json`` is replaced atomically after the new directory is in
+place. Rewriting one section therefore never disturbs the other, and a
+process still reading an older section keeps working. Arrays are opened
+with ``mmap_mode='r'``, so worker processes on one host share their pages.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = 'agri-saathi-model-bundle'
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+DEFAULT_BUNDLE_DIR = os.path.join(os.path.dirname(__file__), '..', 'weights', 'bundle')
+
+# auto: use the bundle when it has the model's section, else the .pkl/.h5 files
+# on:   require the bundle; off: always the .pkl/.h5 files
+BUNDLE_MODES = ('auto', 'on', 'off')
+
+class ModelBundle:
+    """Read access to a bundle directory described by its manifest."""
+
+    def __init__(self, directory: str, manifest: dict):
+        self.directory = directory
+        self.manifest = manifest
+
+    @classmethod
+    def open(cls, directory: Optional[str] = None) -> 'ModelBundle':
+        directory = os.path.abspath(directory or DEFAULT_BUNDLE_DIR)
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != BUNDLE_FORMAT:
+            raise ValueError(f"{directory} is not a model bundle")
+        if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+            raise ValueError(
+                f"Model bundle format version {manifest.get('format_version')} is not supported "
+                f"(expected {BUNDLE_FORMAT_VERSION}); rebuild it with tools/build_model_bundle.py"
+            )
+        return cls(directory, manifest)
+
+    def has(self, section: str) -> bool:
+        return section in self.manifest.get('sections', {})
+
+    def section(self, section: str) -> dict:
+        if not self.has(section):
+            raise KeyError(f"Model bundle at {self.directory} has no '{section}' section")
+        return self.manifest['sections'][section]
+
+    def version(self, section: str) -> str:
+        return self.section(section)['version']
+
+    def metadata(self, section: str) -> dict:
+        return self.section(section)['metadata']
+
+    def path(self, section: str, name: str) -> str:
+        return os.path.join(self.directory, self.section(section)['path'], name)
+
+    def array(self, section: str, name: str) -> np.ndarray:
+        """A ``.npy`` file as a read-only array backed by the page cache."""
+        # asarray drops the np.memmap subclass, whose per-operation overhead
+        # shows up on small arrays; the data is still the shared mapping
+        return np.asarray(np.load(self.path(section, name), mmap_mode='r'))
+
+    def verify(self, section: str) -> list:
+        """Files whose size or hash no longer match the manifest."""
+        mismatched = []
+        for name, expected in self.section(section)['files'].items():
+            path = self.path(section, name)
+            if not os.path.exists(path) or _file_digest(path) != expected['blake2b']:
+                mismatched.append(name)
+        return mismatched
+
+def find_bundle(mode: str, section: str, directory: Optional[str] = None) -> Optional[ModelBundle]:
+    """The bundle to load ``section`` from, or None to use the .pkl/.h5 files."""
+    if mode not in BUNDLE_MODES:
+        raise ValueError(f"Unknown model bundle mode '{mode}'. Expected one of {BUNDLE_MODES}")
+    if mode == 'off':
+        return None
+    directory = os.path.abspath(directory or DEFAULT_BUNDLE_DIR)
+    if mode == 'auto' and not os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+        return None
+    bundle = ModelBundle.open(directory)
+    if bundle.has(section):
+        return bundle
+    if mode == 'on':
+        raise KeyError(f"Model bundle at {directory} has no '{section}' section")
+    return None
+
+def write_section(section: str, write_files: Callable[[str], None], metadata: dict,
+                  directory: Optional[str] = None) -> str:
+    """Write one section: ``write_files(path)`` fills a scratch directory, which is
+    hashed, moved to ``<section>-<version>`` and published in the manifest.
+
+    Returns the new section version.
+    """
+    directory = os.path.abspath(directory or DEFAULT_BUNDLE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    scratch = os.path.join(directory, f".{section}.building-{os.getpid()}")
+    if os.path.exists(scratch):
+        shutil.rmtree(scratch)
+    os.makedirs(scratch)
+    write_files(scratch)
+
+    files = {}
+    for root, _, names in os.walk(scratch):
+        for name in names:
+            path = os.path.join(root, name)
+            files[os.path.relpath(path, scratch)] = {
+                'bytes': os.path.getsize(path),
+                'blake2b': _file_digest(path),
+            }
+    files = dict(sorted(files.items()))
+    version = hashlib.blake2b(json.dumps(files, sort_keys=True).encode(), digest_size=8).hexdigest()
+    target = f"{section}-{version}"
+    if os.path.exists(os.path.join(directory, target)):
+        shutil.rmtree(scratch)
+    else:
+        os.replace(scratch, os.path.join(directory, target))
+
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        # An unreadable or older layout is replaced rather than mixed with this one
+        manifest = {'format': BUNDLE_FORMAT, 'format_version': BUNDLE_FORMAT_VERSION, 'sections': {}}
+    previous = manifest['sections'].get(section, {}).get('path')
+    manifest['sections'][section] = {
+        'version': version,
+        'path': target,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'bytes': sum(f['bytes'] for f in files.values()),
+        'files': files,
+        'metadata': metadata,
+    }
+    temporary = f"{manifest_path}.{os.getpid()}"
+    with open(temporary, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporary, manifest_path)
+
+    # Running processes keep their open files and mappings after the unlink
+    if previous and previous != target:
+        shutil.rmtree(os.path.join(directory, previous), ignore_errors=True)
+    logger.info(f"Model bundle {section} section {version} written to {os.path.join(directory, target)}")
+    return version
+
+def write_soil_section(classifier, class_names: list, features: list, directory: Optional[str] = None,
+                       **metadata) -> str:
+    """Bundle a trained soil ``XGBClassifier`` with its exported NumpyForest arrays."""
+    from models.soil_forest import NumpyForest
+
+    forest = NumpyForest.from_xgboost(classifier)
+
+    def write_files(path: str):
+        classifier.save_model(os.path.join(path, 'model.ubj'))
+        os.makedirs(os.path.join(path, 'forest'))
+        for name, array in forest.arrays().items():
+            np.save(os.path.join(path, 'forest', f'{name}.npy'), array)
+
+    return write_section('soil', write_files, {
+        'class_names': [str(name) for name in class_names],
+        'features': list(features),
+        'forest': forest.stats,
+        **metadata,
+    }, directory)
+
+def write_pest_section(keras_model, class_labels: Dict[str, str], directory: Optional[str] = None,
+                       formats=(), quantize: bool = False, **metadata) -> str:
+    """Bundle the pest classifier's forward pass as a SavedModel graph.
+
+    ``formats`` also converts TFLite and/or ONNX copies into the section
+    (see ``models/pest_export.py``).
+    """
+    import tensorflow as tf
+    from models.pest_export import convert, serving_function
+
+    def write_files(path: str):
+        module = tf.Module()
+        module.model = keras_model
+        module.serve = serving_function(keras_model)
+        tf.saved_model.save(module, os.path.join(path, 'graph'), signatures={'serving_default': module.serve})
+        if formats:
+            convert(keras_model, path, formats, quantize)
+
+    return write_section('pest', write_files, {
+        'class_labels': class_labels,
+        'input_shape': [int(d) for d in keras_model.input_shape[1:]],
+        'engines': ['graph', *formats],
+        **metadata,
+    }, directory)
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
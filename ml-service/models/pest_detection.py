@@ -1,12 +1,20 @@
-import tensorflow as tf
 import numpy as np
 from PIL import Image
 import io
 import json
+import hashlib
+import functools
 import os
 import time
 import logging
-from keras.utils import custom_object_scope
+import threading
+from typing import Optional
+
+from models.artifacts import BUNDLE_MODES, ModelBundle, find_bundle
+from models.pest_engines import (
+    DEFAULT_GRAPH_BATCH_SIZES, ENGINES, ENGINE_ARTIFACTS, FIRST_STAGE_ARTIFACTS, FIRST_STAGE_ENGINES, GraphEngine,
+    KerasEngine, create_engine
+)
 
 logger = logging.getLogger(__name__)
 
@@ -42,8 +50,6 @@ def create_compatible_layer(base_class):
             super().__init__(**kwargs)
     return CompatibleLayer
 
-# Create compatible versions of ALL common Keras layers
-compatible_layers = {}
 layer_classes = [
     'InputLayer', 'Conv2D', 'Dense', 'BatchNormalization', 'ReLU', 
     'DepthwiseConv2D', 'GlobalAveragePooling2D', 'Add', 'Multiply',
@@ -51,105 +57,560 @@ layer_classes = [
     'Flatten', 'Reshape', 'Concatenate', 'LeakyReLU', 'ELU', 'PReLU'
 ]
 
-for layer_name in layer_classes:
-    if hasattr(tf.keras.layers, layer_name):
-        base_class = getattr(tf.keras.layers, layer_name)
-        compatible_layers[layer_name] = create_compatible_layer(base_class)
+@functools.lru_cache(maxsize=None)
+def compatible_layers() -> dict:
+    """Compatible versions of ALL common Keras layers.
+    
+    Built on first use rather than at import, because it imports TensorFlow:
+    importing this module stays cheap for processes that never load Keras.
+    """
+    import tensorflow as tf
+    
+    layers = {}
+    for layer_name in layer_classes:
+        if hasattr(tf.keras.layers, layer_name):
+            base_class = getattr(tf.keras.layers, layer_name)
+            layers[layer_name] = create_compatible_layer(base_class)
+    return layers
+
+def load_keras_model(weights_path: str):
+    """Load the training .h5 through the layer compatibility shim, for inference only."""
+    import tensorflow as tf
+    from keras.utils import custom_object_scope
+    
+    # Try loading with different approaches
+    try:
+        # First try: with custom objects
+        with custom_object_scope(compatible_layers()):
+            return tf.keras.models.load_model(
+                os.path.abspath(weights_path),
+                compile=False
+            )
+    except Exception as e:
+        logger.warning(f"Failed with custom objects: {e}")
+        try:
+            # Second try: load architecture and weights separately
+            return tf.keras.models.load_model(
+                os.path.abspath(weights_path),
+                custom_objects=compatible_layers(),
+                compile=False
+            )
+        except Exception as e2:
+            logger.error(f"Failed to load model: {e2}")
+            raise
+
+# Model input resolution (MobileNetV2, 224x224 RGB)
+INPUT_SIZE = 224
+
+# exact: full decode + LANCZOS (training-time pipeline)
+# fast:  JPEG DCT-domain downscale on decode, uint8 until a single normalize
+PREPROCESS_MODES = ('exact', 'fast')
+
+# Tiled whole-frame inference: pixels between tile origins (112 = tiles
+# overlap by half) and the most tiles one frame may be cut into
+DEFAULT_TILE_STRIDE = 112
+DEFAULT_TILE_MAX = 64
+
+def tile_grid(width: int, height: int, stride: int, max_tiles: int) -> tuple:
+    """``(cols, rows, frame_width, frame_height)`` for tiling a width x height image.
+    
+    The frame is scaled so that the tiles, ``stride`` apart, end exactly on
+    its edges: by ~1 (at most stride/2 pixels per axis) when the native
+    resolution fits in ``max_tiles``, otherwise down to the largest size that
+    does. Frames with a side under 224 are scaled up to 224.
+    """
+    if not 0 < stride <= INPUT_SIZE:
+        raise ValueError(f"Tile stride must be between 1 and {INPUT_SIZE}, got {stride}")
+    
+    def grid(scale: float) -> tuple:
+        cols = max(1, round((width * scale - INPUT_SIZE) / stride) + 1)
+        rows = max(1, round((height * scale - INPUT_SIZE) / stride) + 1)
+        return cols, rows
+    
+    smallest = INPUT_SIZE / min(width, height)
+    scale = max(1.0, smallest)
+    cols, rows = grid(scale)
+    if cols * rows > max_tiles:
+        cols, rows = grid(smallest)
+        if cols * rows > max_tiles:
+            raise ValueError(f"A {width}x{height} frame needs at least {cols * rows} tiles at stride {stride}, "
+                             f"more than the maximum of {max_tiles}")
+        # Tile count only grows with the scale: bisect for the largest that fits
+        low, high = smallest, scale
+        for _ in range(32):
+            middle = (low + high) / 2
+            if grid(middle)[0] * grid(middle)[1] <= max_tiles:
+                low = middle
+            else:
+                high = middle
+        cols, rows = grid(low)
+    return cols, rows, INPUT_SIZE + (cols - 1) * stride, INPUT_SIZE + (rows - 1) * stride
 
 class PestDetectionModel:
-    def __init__(self):
+    def __init__(self, preprocess_mode: str = 'exact', engine: str = 'keras',
+                 engine_threads: Optional[int] = None, graph_batch_sizes=DEFAULT_GRAPH_BATCH_SIZES,
+                 bundle: str = 'auto', bundle_dir: Optional[str] = None,
+                 cascade_threshold: Optional[float] = None, first_stage_engine: str = 'tflite',
+                 first_stage_path: Optional[str] = None):
+        if preprocess_mode not in PREPROCESS_MODES:
+            raise ValueError(f"Unknown preprocess mode '{preprocess_mode}'. Expected one of {PREPROCESS_MODES}")
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown pest engine '{engine}'. Expected one of {ENGINES}")
+        if bundle not in BUNDLE_MODES:
+            raise ValueError(f"Unknown model bundle mode '{bundle}'. Expected one of {BUNDLE_MODES}")
+        if first_stage_engine not in FIRST_STAGE_ENGINES:
+            raise ValueError(f"Unknown first stage engine '{first_stage_engine}'. Expected one of {FIRST_STAGE_ENGINES}")
+        self.preprocess_mode = preprocess_mode
+        self.engine_name = engine
+        self.engine_threads = engine_threads
+        self.graph_batch_sizes = tuple(graph_batch_sizes)
+        # Model bundle (models/artifacts.py) or the legacy files in weights/
+        self.bundle_mode = bundle
+        self.bundle_dir = bundle_dir
+        self.artifact_source = None
+        # Cascade: the first stage answers when its top-1 confidence is at least
+        # cascade_threshold, everything else goes to the full model. None disables it
+        self.cascade_threshold = cascade_threshold
+        self.first_stage_engine = first_stage_engine
+        self.first_stage_path = first_stage_path
+        self.first_stage = None
+        self.first_stage_answers = 0
+        self.full_answers = 0
+        # Keras model (keras/graph engines) and the runtime that serves predictions
         self.model = None
+        self.engine = None
         self.class_labels = None
         self.treatment_lookup = None
         self.is_loaded = False
         self.load_time = None
+        # Startup phase timings in ms: import, deserialize, warmup
+        self.load_phases = {}
+        # Identifies the weights + pipeline producing predictions (cache invalidation)
+        self.model_version = None
         self.prediction_count = 0
         self.total_inference_ms = 0
+        # Optional callback(stage, seconds) for decode, preprocess, forward and
+        # postprocess timings; called from whichever thread runs the prediction
+        self.stage_observer = None
+        # Per-thread float32 input buffers reused by the fast preprocessing path
+        self._buffers = threading.local()
+        # (class_labels, treatment_lookup, templates, class names); see _response_templates
+        self._templates = None
     
     def load(self):
         """Load model weights and metadata. Call once at startup."""
         try:
-            weights_path = os.path.join(os.path.dirname(__file__), '..', 'weights', 'pest_model_best.h5')
-            labels_path = os.path.join(os.path.dirname(__file__), '..', 'weights', 'pest_class_labels.json')
+            weights_dir = os.path.join(os.path.dirname(__file__), '..', 'weights')
+            weights_path = os.path.join(weights_dir, ENGINE_ARTIFACTS[self.engine_name])
+            labels_path = os.path.join(weights_dir, 'pest_class_labels.json')
             treatment_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'treatment_lookup.json')
             
-            logger.info("Loading pest detection model...")
-            # Try loading with different approaches
-            try:
-                # First try: with custom objects
-                with custom_object_scope(compatible_layers):
-                    self.model = tf.keras.models.load_model(
-                        os.path.abspath(weights_path),
-                        compile=False
-                    )
-            except Exception as e:
-                logger.warning(f"Failed with custom objects: {e}")
-                try:
-                    # Second try: load architecture and weights separately
-                    self.model = tf.keras.models.load_model(
-                        os.path.abspath(weights_path),
-                        custom_objects=compatible_layers,
-                        compile=False
-                    )
-                except Exception as e2:
-                    logger.error(f"Failed to load model: {e2}")
-                    raise
-            # Recompile with appropriate settings
-            self.model.compile(
-                optimizer='adam',
-                loss='sparse_categorical_crossentropy',
-                metrics=['accuracy']
-            )
+            logger.info(f"Loading pest detection model ({self.engine_name} engine)...")
+            bundle = self._find_bundle()
+            phase_start = time.time()
+            if bundle is not None and self.engine_name == 'graph':
+                import tensorflow  # noqa: F401
+            elif self.engine_name in ('keras', 'graph'):
+                compatible_layers()
+            self.load_phases['import_ms'] = round((time.time() - phase_start) * 1000, 1)
             
-            with open(os.path.abspath(labels_path)) as f:
-                labels_data = json.load(f)
-                self.class_labels = labels_data['idx_to_class']
+            phase_start = time.time()
+            if bundle is not None:
+                self._load_bundle(bundle)
+            else:
+                # Inference only: no optimizer or loss, so no compile() step
+                if self.engine_name == 'keras':
+                    self.model = load_keras_model(weights_path)
+                    self.engine = KerasEngine(self.model)
+                elif self.engine_name == 'graph':
+                    self.model = load_keras_model(weights_path)
+                    self.engine = GraphEngine(self.model, self.graph_batch_sizes)
+                else:
+                    self.engine = create_engine(self.engine_name, os.path.abspath(weights_path), self.engine_threads)
+                
+                with open(os.path.abspath(labels_path)) as f:
+                    labels_data = json.load(f)
+                    self.class_labels = labels_data['idx_to_class']
+                
+                self.model_version = self._artifact_version(weights_path)
+                self.artifact_source = ENGINE_ARTIFACTS[self.engine_name]
             
             with open(os.path.abspath(treatment_path)) as f:
                 self.treatment_lookup = json.load(f)
             
+            self._response_templates(len(self.class_labels))
+            if self.cascade_threshold is not None:
+                self._load_first_stage(weights_dir)
+            
+            self.load_phases['deserialize_ms'] = round((time.time() - phase_start) * 1000, 1)
             self.is_loaded = True
             self.load_time = time.time()
-            logger.info(f"Pest model loaded. Classes: {len(self.class_labels)}")
+            logger.info(f"Pest model loaded. Classes: {len(self.class_labels)}, version: {self.model_version}")
             
         except Exception as e:
             logger.error(f"Failed to load pest model: {e}")
             raise
     
-    def preprocess_image(self, image_bytes: bytes) -> np.ndarray:
-        """Preprocess image bytes to model input tensor."""
-        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        image = image.resize((224, 224), Image.LANCZOS)
+    def _find_bundle(self) -> Optional[ModelBundle]:
+        """The model bundle to load from, if it has this engine's artifact."""
+        bundle = find_bundle(self.bundle_mode, 'pest', self.bundle_dir)
+        if bundle is None or self.engine_name in bundle.metadata('pest')['engines']:
+            return bundle
+        engines = bundle.metadata('pest')['engines']
+        message = f"Model bundle has no {self.engine_name} pest engine artifact (it has {', '.join(engines)})"
+        if self.bundle_mode == 'on':
+            raise ValueError(message)
+        logger.info(f"{message}, loading {ENGINE_ARTIFACTS[self.engine_name]}")
+        return None
+    
+    def _load_bundle(self, bundle: ModelBundle):
+        metadata = bundle.metadata('pest')
+        if self.engine_name == 'graph':
+            self.engine = GraphEngine.from_saved_model(bundle.path('pest', 'graph'), self.graph_batch_sizes)
+        else:
+            path = bundle.path('pest', ENGINE_ARTIFACTS[self.engine_name])
+            self.engine = create_engine(self.engine_name, path, self.engine_threads)
+        self.class_labels = metadata['class_labels']
+        self.model_version = f"{self.engine_name}:{self.preprocess_mode}:{bundle.version('pest')}"
+        self.artifact_source = 'bundle'
+    
+    def _load_first_stage(self, weights_dir: str):
+        """Open the cascade's first-stage classifier and fold it into ``model_version``."""
+        path = os.path.abspath(self.first_stage_path or os.path.join(weights_dir, FIRST_STAGE_ARTIFACTS[self.first_stage_engine]))
+        if self.first_stage_engine == 'keras':
+            engine = KerasEngine(load_keras_model(path))
+        else:
+            engine = create_engine(self.first_stage_engine, path, self.engine_threads)
+        self.set_first_stage(engine, self._artifact_digest(path))
+        logger.info(f"Pest cascade first stage loaded from {os.path.basename(path)} (threshold {self.cascade_threshold})")
+    
+    def set_first_stage(self, engine, version: str):
+        """Use ``engine`` as the cascade's first stage; it must output the full model's classes."""
+        outputs = engine.predict(np.zeros((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)).shape[-1]
+        if outputs != len(self.class_labels):
+            raise ValueError(f"First stage predicts {outputs} classes, the full model {len(self.class_labels)}")
+        self.first_stage = engine
+        self.model_version = f"{self.model_version}:cascade-{self.cascade_threshold}:{version}"
+    
+    def warm_up(self, batch_sizes=None):
+        """Run the engine once per batch size on zeros, so no request pays first-call costs.
+        
+        Defaults to every size the graph engine traced, otherwise a single image.
+        """
+        sizes = batch_sizes or getattr(self.engine, 'batch_sizes', (1,))
+        start_time = time.time()
+        for size in sizes:
+            self.engine.predict(np.zeros((size, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32))
+            if self.first_stage is not None:
+                self.first_stage.predict(np.zeros((size, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32))
+        self.load_phases['warmup_ms'] = round((time.time() - start_time) * 1000, 1)
+        logger.info(f"Pest engine warmed up for batch sizes {list(sizes)} in {self.load_phases['warmup_ms']}ms")
+    
+    def _artifact_version(self, weights_path: str) -> str:
+        """Content hash of the loaded artifact, qualified by engine and preprocessing."""
+        return f"{self.engine_name}:{self.preprocess_mode}:{self._artifact_digest(weights_path)}"
+    
+    @staticmethod
+    def _artifact_digest(path: str) -> str:
+        digest = hashlib.blake2b(digest_size=8)
+        with open(os.path.abspath(path), 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def preprocess_image(self, image_bytes) -> np.ndarray:
+        """Preprocess image bytes (or pre-decoded pixels, see ``_check_pixels``) to model input tensor."""
+        if isinstance(image_bytes, np.ndarray):
+            image = self._check_pixels(image_bytes)
+        else:
+            image = self._decode(image_bytes)
+        if self.preprocess_mode == 'fast':
+            img_array = np.empty((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+            self._resize_into(image, img_array[0])
+            return img_array
+        return self._resize(image)
+    
+    def _decode(self, image_bytes: bytes) -> Image.Image:
+        """Decode image bytes to RGB pixels.
+        
+        In fast mode, ``draft`` makes libjpeg scale by 1/2, 1/4 or 1/8 in the
+        DCT domain while decoding, to the smallest size still covering
+        224x224, so the pixels a 12MP frame would throw away are never
+        produced. Other formats ignore the draft request and take the normal
+        decode.
+        """
+        image = Image.open(io.BytesIO(image_bytes))
+        if self.preprocess_mode == 'fast':
+            image.draft('RGB', (INPUT_SIZE, INPUT_SIZE))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.load()
+        return image
+    
+    def _check_pixels(self, pixels: np.ndarray) -> np.ndarray:
+        """Validate pixels decoded and resized on the device: (224, 224, 3) uint8 RGB.
+        
+        They go straight to normalization - no copy, no resize - so anything
+        else is refused rather than converted.
+        """
+        if pixels.dtype != np.uint8 or pixels.shape != (INPUT_SIZE, INPUT_SIZE, 3):
+            raise ValueError(f"Expected ({INPUT_SIZE}, {INPUT_SIZE}, 3) uint8 pixels, got {pixels.shape} {pixels.dtype}")
+        return pixels
+    
+    def _resize(self, image) -> np.ndarray:
+        """Exact path: LANCZOS resize and normalize to a (1, 224, 224, 3) tensor."""
+        if not isinstance(image, np.ndarray):
+            image = image.resize((INPUT_SIZE, INPUT_SIZE), Image.LANCZOS)
         img_array = np.array(image, dtype=np.float32) / 255.0
         return np.expand_dims(img_array, axis=0)
     
-    def predict(self, image_bytes: bytes) -> dict:
-        """Run inference on image bytes. Returns structured prediction result."""
+    def _resize_into(self, image, out: np.ndarray):
+        """Fast path: resize the draft-decoded image (if needed) and normalize into ``out``."""
+        if not isinstance(image, np.ndarray) and image.size != (INPUT_SIZE, INPUT_SIZE):
+            image = image.resize((INPUT_SIZE, INPUT_SIZE), Image.LANCZOS)
+        # uint8 -> float32 / 255 in one pass, same rounding as the exact path
+        np.divide(np.asarray(image), np.float32(255.0), out=out, dtype=np.float32)
+    
+    def _input_buffer(self, batch_size: int) -> np.ndarray:
+        """This thread's reusable (batch, 224, 224, 3) float32 buffer."""
+        buffer = getattr(self._buffers, 'batch', None)
+        if buffer is None or buffer.shape[0] < batch_size:
+            buffer = np.empty((batch_size, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+            self._buffers.batch = buffer
+        return buffer[:batch_size]
+    
+    def _preprocess_batch(self, images: list, results: list) -> tuple:
+        """Decode every image into one input batch.
+        
+        Returns ``(batch, positions)`` where ``positions`` are the indices of
+        the images that made it into ``batch``; decode errors are stored in
+        ``results`` at the failing index. Entries may also be pre-decoded
+        (224, 224, 3) uint8 arrays, which are only normalized.
+        """
+        observe = self.stage_observer
+        fast = self.preprocess_mode == 'fast'
+        buffer = self._input_buffer(len(images)) if fast else None
+        positions = []
+        tensors = []
+        for i, image_bytes in enumerate(images):
+            try:
+                start = time.perf_counter()
+                if isinstance(image_bytes, np.ndarray):
+                    image = self._check_pixels(image_bytes)
+                else:
+                    image = self._decode(image_bytes)
+                decoded = time.perf_counter()
+                if fast:
+                    self._resize_into(image, buffer[len(positions)])
+                else:
+                    tensors.append(self._resize(image))
+                positions.append(i)
+            except Exception as e:
+                results[i] = e
+                continue
+            if observe is not None:
+                if not isinstance(image_bytes, np.ndarray):
+                    observe('decode', decoded - start)
+                observe('preprocess', time.perf_counter() - decoded)
+        if fast:
+            return buffer[:len(positions)], positions
+        batch = np.concatenate(tensors, axis=0) if tensors else None
+        return batch, positions
+    
+    def predict(self, image_bytes) -> dict:
+        """Run inference on image bytes (or pre-decoded pixels). Returns structured prediction result."""
+        result = self.predict_batch([image_bytes])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    def predict_batch(self, images: list) -> list:
+        """Run a single batched forward pass over several images.
+        
+        Returns one entry per input, in order. An image that fails to decode
+        gets the raised exception in its slot instead of a result dict, so one
+        bad upload does not fail the rest of the batch.
+        """
         if not self.is_loaded:
             raise RuntimeError("Model not loaded. Call load() first.")
         
         start_time = time.time()
+        results = [None] * len(images)
         
         # Preprocess
-        input_tensor = self.preprocess_image(image_bytes)
+        batch, positions = self._preprocess_batch(images, results)
+        if not positions:
+            return results
         
         # Inference
-        predictions = self.model.predict(input_tensor, verbose=0)
+        forward_start = time.perf_counter()
+        predictions, stages = self._forward(batch)
+        forward_end = time.perf_counter()
+        
+        # Every image in the batch shares the forward pass, so the stats are
+        # amortised per image while each result reports the batch wall time.
+        inference_ms = (time.time() - start_time) * 1000
+        self.prediction_count += len(positions)
+        self.total_inference_ms += inference_ms
+        
+        for i, result in zip(positions, self._build_results(predictions, inference_ms, stages)):
+            results[i] = result
+        if self.stage_observer is not None:
+            self.stage_observer('forward', forward_end - forward_start)
+            self.stage_observer('postprocess', time.perf_counter() - forward_end)
+        return results
+    
+    def _forward(self, batch: np.ndarray) -> tuple:
+        """Class probabilities for ``batch`` and the stage that answered each row.
+        
+        With the cascade on, the first stage scores the whole batch and only
+        rows under the threshold run through the full model, as one smaller
+        batch.
+        """
+        if self.first_stage is None:
+            predictions = self.engine.predict(batch)
+            self.full_answers += len(batch)
+            return predictions, ['full'] * len(batch)
+        
+        predictions = np.array(self.first_stage.predict(batch), dtype=np.float32)
+        escalated = np.flatnonzero(predictions.max(axis=1) < self.cascade_threshold)
+        if len(escalated):
+            predictions[escalated] = self.engine.predict(batch[escalated])
+        stages = ['first'] * len(batch)
+        for i in escalated:
+            stages[i] = 'full'
+        self.first_stage_answers += len(batch) - len(escalated)
+        self.full_answers += len(escalated)
+        return predictions, stages
+    
+    def predict_tiles(self, image_bytes: bytes, stride: int = DEFAULT_TILE_STRIDE, max_tiles: int = DEFAULT_TILE_MAX,
+                      batch_size: int = 16) -> dict:
+        """Score a whole frame as overlapping 224x224 tiles instead of one downscaled image.
+        
+        The decoded frame is cut with ``sliding_window_view``: every tile is a
+        view into it, and its pixels are only copied when they are normalized
+        straight into the reusable input buffer, ``batch_size`` tiles per
+        forward pass (through the cascade, if one is loaded). Returns the
+        per-frame summary from ``_summarize_tiles``.
+        """
+        if not self.is_loaded:
+            raise RuntimeError("Model not loaded. Call load() first.")
+        
+        start_time = time.time()
+        start = time.perf_counter()
+        frame, cols, rows, scale = self._decode_frame(image_bytes, stride, max_tiles)
+        decoded = time.perf_counter()
+        
+        # (rows, cols, 224, 224, 3), no copy
+        tiles = np.lib.stride_tricks.sliding_window_view(frame, (INPUT_SIZE, INPUT_SIZE, 3))[::stride, ::stride, 0]
+        count = rows * cols
+        buffer = self._input_buffer(min(batch_size, count))
+        probabilities = np.empty((count, len(self.class_labels)), dtype=np.float32)
+        stages = []
+        preprocess_seconds = forward_seconds = 0.0
+        for first in range(0, count, len(buffer)):
+            chunk = range(first, min(first + len(buffer), count))
+            chunk_start = time.perf_counter()
+            for j, index in enumerate(chunk):
+                np.divide(tiles[index // cols, index % cols], np.float32(255.0), out=buffer[j], dtype=np.float32)
+            forward_start = time.perf_counter()
+            predictions, chunk_stages = self._forward(buffer[:len(chunk)])
+            probabilities[chunk.start:chunk.stop] = predictions
+            stages.extend(chunk_stages)
+            preprocess_seconds += forward_start - chunk_start
+            forward_seconds += time.perf_counter() - forward_start
+        forward_end = time.perf_counter()
         
         inference_ms = (time.time() - start_time) * 1000
         self.prediction_count += 1
         self.total_inference_ms += inference_ms
         
-        # Get top 3 predictions
-        top_3_indices = np.argsort(predictions[0])[-3:][::-1]
-        top_prediction_idx = str(top_3_indices[0])
-        confidence = float(predictions[0][top_3_indices[0]])
+        result = self._summarize_tiles(probabilities.reshape(rows, cols, -1), stages, inference_ms)
+        result['tiles'] = {
+            'count': count,
+            'rows': rows,
+            'cols': cols,
+            'size': INPUT_SIZE,
+            'stride': stride,
+            # Tile (row, col) covers x from col * stride / scale in the uploaded image
+            'scale': round(scale, 6),
+        }
+        if self.stage_observer is not None:
+            self.stage_observer('decode', decoded - start)
+            self.stage_observer('preprocess', preprocess_seconds)
+            self.stage_observer('forward', forward_seconds)
+            self.stage_observer('postprocess', time.perf_counter() - forward_end)
+        return result
+    
+    def _decode_frame(self, image_bytes: bytes, stride: int, max_tiles: int) -> tuple:
+        """Decode to ``(pixels, cols, rows, scale)``, scaled to the tile grid from ``tile_grid``.
+        
+        A JPEG being shrunk to fit ``max_tiles`` is drafted (DCT-domain
+        downscale) to the nearest size above the grid before the LANCZOS
+        resize, as in fast preprocessing.
+        """
+        image = Image.open(io.BytesIO(image_bytes))
+        width, height = image.size
+        cols, rows, frame_width, frame_height = tile_grid(width, height, stride, max_tiles)
+        if frame_width < width and frame_height < height:
+            image.draft('RGB', (frame_width, frame_height))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if image.size != (frame_width, frame_height):
+            image = image.resize((frame_width, frame_height), Image.LANCZOS)
+        return np.asarray(image), cols, rows, frame_width / width
+    
+    def _summarize_tiles(self, probabilities: np.ndarray, stages: list, inference_ms: float) -> dict:
+        """Per-frame disease summary and class/confidence heatmap from (rows, cols, classes) tile probabilities.
         
-        # Get class name
-        class_name = self.class_labels.get(top_prediction_idx, 'Unknown')
+        Every tile votes for its top-1 class. ``detections`` lists the classes
+        that won at least one tile, most tiles first; the heatmap grid holds
+        each tile's index into ``heatmap['classes']`` (the detections' order)
+        and its confidence.
+        """
+        rows, cols, num_classes = probabilities.shape
+        flat = probabilities.reshape(-1, num_classes)
+        top = flat.argmax(axis=1)
+        confidence = flat[np.arange(len(flat)), top]
+        counts = np.bincount(top, minlength=num_classes)
+        total_confidence = np.bincount(top, weights=confidence, minlength=num_classes)
+        max_confidence = np.zeros(num_classes)
+        np.maximum.at(max_confidence, top, confidence)
         
-        # Get treatment info
-        treatment = self.treatment_lookup.get(class_name, {
+        templates, _ = self._response_templates(num_classes)
+        detected = sorted(np.flatnonzero(counts), key=lambda idx: (-counts[idx], -max_confidence[idx]))
+        legend = np.full(num_classes, -1)
+        legend[detected] = np.arange(len(detected))
+        detections = []
+        for idx in detected:
+            template = templates[idx]
+            detections.append({
+                'disease': template['disease'],
+                'crop': template['crop'],
+                'raw_class': template['raw_class'],
+                'severity': template['severity'],
+                'treatment_id': template['treatment_id'],
+                'tiles': int(counts[idx]),
+                'share': round(float(counts[idx]) / len(flat), 4),
+                'max_confidence': round(float(max_confidence[idx]), 4),
+                'mean_confidence': round(float(total_confidence[idx] / counts[idx]), 4),
+            })
+        healthy = sum(d['tiles'] for d in detections if d['raw_class'].endswith('___healthy'))
+        
+        return {
+            'detections': detections,
+            'healthy_share': round(healthy / len(flat), 4),
+            'heatmap': {
+                'classes': [d['raw_class'] for d in detections],
+                'grid': legend[top].reshape(rows, cols).tolist(),
+                'confidence': np.round(confidence.astype(np.float64), 3).reshape(rows, cols).tolist(),
+            },
+            'stages': {'first': stages.count('first'), 'full': stages.count('full')},
+            'inference_ms': round(inference_ms, 2),
+        }
+    
+    def _treatment(self, class_name: str) -> dict:
+        return self.treatment_lookup.get(class_name, {
             'id': 'UNKNOWN',
             'display_name': class_name.replace('___', ' - ').replace('_', ' '),
             'quick_fix': 'Please consult a local agronomist for this issue.',
@@ -159,31 +620,82 @@ class PestDetectionModel:
             'pesticide_name': None,
             'affected_crop': class_name.split('___')[0] if '___' in class_name else 'Unknown'
         })
-        
-        # Extract crop name from class name (format: Crop___Disease)
+    
+    @staticmethod
+    def _crop_name(class_name: str) -> str:
+        # Class names are formatted Crop___Disease
         parts = class_name.split('___')
-        crop_name = parts[0].replace('_', ' ') if parts else 'Unknown'
+        return parts[0].replace('_', ' ') if parts else 'Unknown'
+    
+    def _response_templates(self, num_classes: int) -> tuple:
+        """Per-class response fields and class names, indexed by class id.
         
-        return {
-            'disease': treatment.get('display_name', class_name),
-            'confidence': round(confidence, 4),
-            'crop': crop_name,
-            'quick_fix': treatment.get('quick_fix', ''),
-            'permanent_fix': treatment.get('permanent_fix', ''),
-            'organic_fix': treatment.get('organic_fix'),
-            'severity': treatment.get('severity', 'medium'),
-            'treatment_id': treatment.get('id', 'UNKNOWN'),
-            'pesticide': treatment.get('pesticide_name'),
-            'raw_class': class_name,
-            'inference_ms': round(inference_ms, 2),
-            'top_3': [
-                {
-                    'class': self.class_labels.get(str(idx), 'Unknown'),
-                    'confidence': round(float(predictions[0][idx]), 4)
-                }
-                for idx in top_3_indices
-            ]
-        }
+        Everything in a response that depends only on the class - display
+        name, crop, treatment fields - is resolved once per label and
+        treatment table instead of on every request. Built at load and again
+        only if ``class_labels`` or ``treatment_lookup`` is replaced.
+        """
+        cached = self._templates
+        if (cached is not None and cached[0] is self.class_labels and cached[1] is self.treatment_lookup
+                and len(cached[3]) == num_classes):
+            return cached[2], cached[3]
+        
+        names = [self.class_labels.get(str(idx), 'Unknown') for idx in range(num_classes)]
+        templates = []
+        for class_name in names:
+            treatment = self._treatment(class_name)
+            templates.append({
+                'disease': treatment.get('display_name', class_name),
+                'confidence': None,
+                'crop': self._crop_name(class_name),
+                'quick_fix': treatment.get('quick_fix', ''),
+                'permanent_fix': treatment.get('permanent_fix', ''),
+                'organic_fix': treatment.get('organic_fix'),
+                'severity': treatment.get('severity', 'medium'),
+                'treatment_id': treatment.get('id', 'UNKNOWN'),
+                'pesticide': treatment.get('pesticide_name'),
+                'raw_class': class_name,
+                'inference_ms': None,
+                # Which model answered: 'first' (cascade first stage) or 'full'
+                'stage': None,
+                'top_3': None,
+            })
+        self._templates = (self.class_labels, self.treatment_lookup, templates, names)
+        return templates, names
+    
+    def _build_results(self, predictions: np.ndarray, inference_ms: float, stages: list) -> list:
+        """Turn rows of class probabilities into API response dicts.
+        
+        Top-3 is selected for the whole batch at once: ``argpartition`` finds
+        each row's 3 largest without sorting the other classes, then only
+        those 3 are ordered (equal probabilities: lower class id first). Each
+        result starts as a copy of its class's template.
+        """
+        predictions = np.asarray(predictions)
+        templates, names = self._response_templates(predictions.shape[1])
+        k = min(3, predictions.shape[1])
+        rows = np.arange(len(predictions))[:, None]
+        top = np.argpartition(predictions, -k, axis=1)[:, -k:]
+        values = predictions[rows, top]
+        order = np.lexsort((top, -values), axis=1)
+        top = top[rows, order].tolist()
+        values = values[rows, order].tolist()
+        
+        inference_ms = round(inference_ms, 2)
+        results = []
+        for indices, confidences, stage in zip(top, values, stages):
+            top_3 = [{'class': names[idx], 'confidence': round(confidence, 4)} for idx, confidence in zip(indices, confidences)]
+            result = templates[indices[0]].copy()
+            result['confidence'] = top_3[0]['confidence']
+            result['inference_ms'] = inference_ms
+            result['stage'] = stage
+            result['top_3'] = top_3
+            results.append(result)
+        return results
+    
+    def _build_result(self, probabilities: np.ndarray, inference_ms: float, stage: str = 'full') -> dict:
+        """Turn one row of class probabilities into the API response dict."""
+        return self._build_results(np.asarray(probabilities)[None], inference_ms, [stage])[0]
     
     @property
     def avg_inference_ms(self) -> float:
@@ -198,4 +710,23 @@ class PestDetectionModel:
             'prediction_count': self.prediction_count,
             'avg_inference_ms': self.avg_inference_ms,
             'load_time': self.load_time,
+            'model_version': self.model_version,
+            'preprocess_mode': self.preprocess_mode,
+            'engine': self.engine_name,
+            'artifact': self.artifact_source,
+            'load_phases': self.load_phases,
+            'cascade': self.cascade_stats,
+        }
+    
+    @property
+    def cascade_stats(self) -> Optional[dict]:
+        if self.first_stage is None:
+            return None
+        answered = self.first_stage_answers + self.full_answers
+        return {
+            'threshold': self.cascade_threshold,
+            'first_stage_engine': self.first_stage_engine,
+            'first_stage_answers': self.first_stage_answers,
+            'full_answers': self.full_answers,
+            'first_stage_share': round(self.first_stage_answers / answered, 4) if answered else 0.0,
         }
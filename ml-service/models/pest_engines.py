@@ -0,0 +1,169 @@
+"""Interchangeable runtimes for the pest classifier.
+
+Every engine takes a float32 (batch, 224, 224, 3) array and returns the
+(batch, num_classes) softmax output, so PestDetectionModel does not care
+which runtime produced it. The Keras and graph engines run the ``.h5``
+model directly; TFLite and ONNX Runtime artifacts are produced from it by
+``models/pest_export.py`` (run as ``tools/convert_pest_model.py``). With a
+model bundle (``models/artifacts.py``) the graph, TFLite and ONNX engines
+load the bundle's copies instead.
+"""
+import logging
+import threading
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ('keras', 'graph', 'tflite', 'onnx')
+
+# Engines that keep working in a child forked after they were loaded. The
+# TensorFlow runtime (keras, graph) deadlocks after fork, and ONNX Runtime
+# starts its thread pools when the session is created
+FORK_SAFE_ENGINES = ('tflite',)
+
+# Artifact in weights/ that each engine loads
+ENGINE_ARTIFACTS = {
+    'keras': 'pest_model_best.h5',
+    'graph': 'pest_model_best.h5',
+    'tflite': 'pest_model.tflite',
+    'onnx': 'pest_model.onnx',
+}
+
+# Cascade first stage (PEST_CASCADE_THRESHOLD): a smaller classifier over the
+# same input and classes, built by tools/build_pest_first_stage.py
+FIRST_STAGE_ENGINES = ('keras', 'tflite', 'onnx')
+FIRST_STAGE_ARTIFACTS = {
+    'keras': 'pest_first_stage.h5',
+    'tflite': 'pest_first_stage.tflite',
+    'onnx': 'pest_first_stage.onnx',
+}
+
+class KerasEngine:
+    """Runs an already built Keras model."""
+    name = 'keras'
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.model.predict(batch, verbose=0)
+
+# Batch sizes the graph engine traces a function for
+DEFAULT_GRAPH_BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+class GraphEngine:
+    """The Keras model's forward pass as concrete graph functions, one per batch size.
+
+    ``model.predict`` builds a data adapter, callbacks and a step function on
+    every call, and the first call after startup also traces the graph. Here
+    each batch size in ``batch_sizes`` is traced once up front with a fixed
+    input signature. A batch is padded up to the next traced size, and batches
+    larger than the largest size are split, so no request ever retraces.
+    """
+    name = 'graph'
+
+    def __init__(self, model, batch_sizes=DEFAULT_GRAPH_BATCH_SIZES):
+        self.model = model
+        self._trace(lambda images: model(images, training=False), tuple(model.input_shape[1:]), batch_sizes)
+
+    @classmethod
+    def from_saved_model(cls, path: str, batch_sizes=DEFAULT_GRAPH_BATCH_SIZES) -> 'GraphEngine':
+        """Restore the forward pass exported into a model bundle (``graph/``).
+
+        Nothing is rebuilt from Keras layer configs, so this skips the ``.h5``
+        compatibility shim and most of the load time.
+        """
+        import tensorflow as tf
+
+        engine = cls.__new__(cls)
+        engine.model = tf.saved_model.load(path)
+        serve = engine.model.serve
+        engine._trace(serve, tuple(serve.input_signature[0].shape[1:]), batch_sizes)
+        return engine
+
+    def _trace(self, forward, input_shape: tuple, batch_sizes):
+        import tensorflow as tf
+
+        self.batch_sizes = tuple(sorted(set(batch_sizes)))
+        self.input_shape = input_shape
+        forward = tf.function(forward)
+        self._functions = {
+            size: forward.get_concrete_function(tf.TensorSpec((size,) + self.input_shape, tf.float32))
+            for size in self.batch_sizes
+        }
+        self._padding = np.zeros((self.batch_sizes[-1],) + self.input_shape, dtype=np.float32)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        count = len(batch)
+        largest = self.batch_sizes[-1]
+        if count > largest:
+            return np.concatenate([self.predict(batch[i:i + largest]) for i in range(0, count, largest)])
+
+        size = next(s for s in self.batch_sizes if s >= count)
+        if size != count:
+            batch = np.concatenate([batch, self._padding[:size - count]])
+        return self._functions[size](batch).numpy()[:count]
+
+class TFLiteEngine:
+    """TFLite interpreter, resized to the incoming batch size on demand.
+
+    Uses the standalone LiteRT (``ai_edge_litert``) or ``tflite_runtime``
+    interpreter when installed, so no full TensorFlow is needed, otherwise
+    ``tf.lite``. The interpreter is not thread-safe, so calls are serialised.
+    """
+    name = 'tflite'
+
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                import tensorflow as tf
+                Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input['index'], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self._input['index'], batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output['index']).copy()
+
+class ONNXEngine:
+    """ONNX Runtime session on the CPU execution provider."""
+    name = 'onnx'
+
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("PEST_ENGINE=onnx needs the onnxruntime package") from e
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: batch})[0]
+
+def create_engine(name: str, path: str, num_threads: Optional[int] = None):
+    """Open the TFLite or ONNX artifact at ``path``. Keras models are wrapped by the caller."""
+    if name == 'tflite':
+        return TFLiteEngine(path, num_threads)
+    if name == 'onnx':
+        return ONNXEngine(path, num_threads)
+    raise ValueError(f"Unknown pest engine '{name}'. Expected one of {ENGINES}")
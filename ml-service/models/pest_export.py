@@ -0,0 +1,68 @@
+"""Export the Keras pest classifier for the other pest engines.
+
+Shared by ``tools/convert_pest_model.py`` (TFLite and ONNX files in
+``weights/``) and ``models/artifacts.py`` (the model bundle's SavedModel
+graph and converted copies). TensorFlow is imported on first use, so the
+service does not pay for it unless it exports.
+"""
+import logging
+import os
+import time
+
+from models.pest_detection import INPUT_SIZE
+from models.pest_engines import ENGINE_ARTIFACTS
+
+logger = logging.getLogger(__name__)
+
+def serving_function(model):
+    """The model's forward pass as a tf.function with a dynamic batch dimension."""
+    import tensorflow as tf
+
+    @tf.function(input_signature=[tf.TensorSpec([None, INPUT_SIZE, INPUT_SIZE, 3], tf.float32, name='input')])
+    def serve(images):
+        return model(images, training=False)
+    return serve
+
+def convert_tflite(model, output_path: str, quantize: bool = False) -> str:
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize:
+        # Dynamic-range quantization: int8 weights, float32 inputs/outputs
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+    return output_path
+
+def convert_onnx(model, output_path: str, opset: int = 13) -> str:
+    try:
+        import tf2onnx
+    except ImportError as e:
+        raise RuntimeError("ONNX conversion needs the tf2onnx package") from e
+
+    serve = serving_function(model)
+    tf2onnx.convert.from_function(
+        serve,
+        input_signature=serve.input_signature,
+        opset=opset,
+        output_path=output_path,
+    )
+    return output_path
+
+def convert(model, output_dir: str, formats=('tflite', 'onnx'), quantize: bool = False) -> dict:
+    """Write the requested artifacts for ``model`` into ``output_dir``. Returns {format: path}."""
+    os.makedirs(output_dir, exist_ok=True)
+    written = {}
+    for fmt in formats:
+        path = os.path.abspath(os.path.join(output_dir, ENGINE_ARTIFACTS[fmt]))
+        start = time.time()
+        if fmt == 'tflite':
+            convert_tflite(model, path, quantize=quantize)
+        elif fmt == 'onnx':
+            convert_onnx(model, path)
+        else:
+            raise ValueError(f"Unknown format '{fmt}'")
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        logger.info(f"Wrote {path} ({size_mb:.1f} MB) in {time.time() - start:.1f}s")
+        written[fmt] = path
+    return written
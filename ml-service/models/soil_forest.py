@@ -0,0 +1,166 @@
+"""NumPy evaluator for the XGBoost soil classifier.
+
+``predict_proba`` on an ``XGBClassifier`` pays for a DMatrix, the sklearn
+wrapper and XGBoost's thread dispatch on every call, which dominates the
+cost of scoring one reading. ``NumpyForest`` exports the trained trees once
+into flat arrays (split feature, threshold, children, leaf value, target
+class) and walks every tree for every row at the same time, one tree level
+per step.
+"""
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# xgboost: always the booster; numpy: always NumpyForest;
+# auto: NumpyForest for small requests, the booster for large batches
+SOIL_ENGINES = ('xgboost', 'numpy', 'auto')
+
+class NumpyForest:
+    """All trees of a ``multi:softprob`` booster, packed into flat node arrays.
+
+    XGBoost allocates a node's children next to each other, so the next node
+    is ``left[node] + go_right``. Leaves point to themselves and never go
+    right, which lets every row take the same number of steps (the deepest
+    tree's depth) without checking whether it has already reached a leaf.
+    """
+
+    # Rows scored per traversal; bounds the (rows, nodes) decision matrix
+    CHUNK_ROWS = 256
+
+    def __init__(self, feature, threshold, left, default_left, leaf_value,
+                 roots, tree_class, base_margin, max_depth: int):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.default_left = default_left
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.tree_class = tree_class
+        self.base_margin = base_margin
+        self.max_depth = max_depth
+        self.num_class = len(base_margin)
+        # (trees, classes) one-hot: leaf values @ class_matrix sums each class's trees
+        self.class_matrix = np.zeros((len(roots), self.num_class), dtype=np.float64)
+        self.class_matrix[np.arange(len(roots)), tree_class] = 1.0
+
+    @classmethod
+    def from_xgboost(cls, booster) -> 'NumpyForest':
+        """Export a trained ``xgboost.Booster`` (or ``XGBClassifier``)."""
+        if hasattr(booster, 'get_booster'):
+            booster = booster.get_booster()
+        learner = json.loads(booster.save_raw('json'))['learner']
+        objective = learner['objective']['name']
+        if objective != 'multi:softprob':
+            raise ValueError(f"NumpyForest supports multi:softprob boosters, got '{objective}'")
+
+        params = learner['learner_model_param']
+        num_class = int(params['num_class'])
+        # A per-class vector in XGBoost >= 3, a single value before
+        base_margin = np.broadcast_to(
+            np.asarray(json.loads(params['base_score']), dtype=np.float64), (num_class,)
+        ).copy()
+
+        model = learner['gradient_booster']['model']
+        trees = model['trees']
+        features, thresholds, lefts, defaults, values, roots = [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for tree in trees:
+            left = np.asarray(tree['left_children'], dtype=np.intp)
+            right = np.asarray(tree['right_children'], dtype=np.intp)
+            is_leaf = left == -1
+            if np.any(~is_leaf & (right != left + 1)):
+                raise ValueError(f"Tree {tree['id']} does not store children consecutively")
+            split_conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+
+            features.append(np.where(is_leaf, 0, tree['split_indices']))
+            # x >= inf is never true, so a leaf keeps pointing at itself
+            thresholds.append(np.where(is_leaf, np.inf, split_conditions).astype(np.float32))
+            lefts.append(np.where(is_leaf, np.arange(len(left)), left) + offset)
+            defaults.append(np.asarray(tree['default_left'], dtype=bool) | is_leaf)
+            # XGBoost stores a leaf's output in split_conditions
+            values.append(np.where(is_leaf, split_conditions.astype(np.float64), 0.0))
+            roots.append(offset)
+            max_depth = max(max_depth, _tree_depth(left, right))
+            offset += len(left)
+
+        forest = cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts).astype(np.intp),
+            default_left=np.concatenate(defaults),
+            leaf_value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            tree_class=np.asarray(model['tree_info'], dtype=np.intp),
+            base_margin=base_margin,
+            max_depth=max_depth,
+        )
+        logger.info(f"Exported {len(trees)} trees ({offset} nodes, depth {max_depth}) for {num_class} classes")
+        return forest
+
+    # Arrays saved to / loaded from a model bundle (models/artifacts.py)
+    ARRAY_NAMES = ('feature', 'threshold', 'left', 'default_left', 'leaf_value', 'roots', 'tree_class', 'base_margin')
+
+    def arrays(self) -> dict:
+        return {name: getattr(self, name) for name in self.ARRAY_NAMES}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, max_depth: int) -> 'NumpyForest':
+        """Rebuild from ``arrays()`` output, e.g. memory-mapped ``.npy`` files."""
+        return cls(max_depth=max_depth, **{name: arrays[name] for name in cls.ARRAY_NAMES})
+
+    def predict_margin(self, features: np.ndarray) -> np.ndarray:
+        """Raw (rows, classes) scores before softmax."""
+        # XGBoost compares float32 feature values against float32 thresholds
+        features = np.ascontiguousarray(np.atleast_2d(features), dtype=np.float32)
+        margins = np.empty((len(features), self.num_class), dtype=np.float64)
+        for start in range(0, len(features), self.CHUNK_ROWS):
+            chunk = features[start:start + self.CHUNK_ROWS]
+            margins[start:start + len(chunk)] = self._traverse(chunk) @ self.class_matrix + self.base_margin
+        return margins
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        margins = self.predict_margin(features)
+        margins -= margins.max(axis=1, keepdims=True)
+        np.exp(margins, out=margins)
+        margins /= margins.sum(axis=1, keepdims=True)
+        return margins
+
+    def _traverse(self, chunk: np.ndarray) -> np.ndarray:
+        """Leaf value reached by every (row, tree) pair."""
+        # Every node's decision for every row up front; the walk is then pure indexing
+        values = chunk[:, self.feature]
+        go_right = values >= self.threshold
+        missing = np.isnan(values)
+        if missing.any():
+            # NaN compares false everywhere; send it the way training did
+            go_right |= missing & ~self.default_left
+        go_right = go_right.view(np.int8).ravel()
+
+        nodes = np.repeat(self.roots[None, :], len(chunk), axis=0)
+        row_offsets = (np.arange(len(chunk), dtype=np.intp) * len(self.feature))[:, None]
+        for _ in range(self.max_depth):
+            nodes = self.left[nodes] + go_right[row_offsets + nodes]
+        return self.leaf_value[nodes]
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'trees': len(self.roots),
+            'nodes': len(self.feature),
+            'max_depth': self.max_depth,
+            'classes': self.num_class,
+        }
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    """Number of splits on the longest root-to-leaf path."""
+    depth = 0
+    level = [0]
+    while True:
+        level = [child for node in level if left[node] != -1 for child in (left[node], right[node])]
+        if not level:
+            return depth
+        depth += 1
@@ -0,0 +1,219 @@
+"""Precomputed top-k soil recommendations over a quantized feature grid.
+
+Every node of a regular grid over the seven soil features is scored once,
+and the k most likely crops and their probabilities are stored in ``.npy``
+files that are opened memory-mapped. Process workers share the pages, and
+answering a reading becomes index arithmetic plus one array read.
+
+A reading is answered from the grid only when every feature is inside the
+grid's range and within ``snap`` grid steps of a node (0 = exactly on a
+node, 0.5 = always the nearest node). Everything else goes to the live model.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (low, high, step) per feature, in FEATURE_NAMES order. About 370k nodes,
+# built in well under a minute with XGBoost on one vCPU.
+DEFAULT_GRID_AXES = {
+    'nitrogen': (0.0, 200.0, 40.0),
+    'phosphorus': (0.0, 200.0, 40.0),
+    'potassium': (0.0, 200.0, 40.0),
+    'temperature': (0.0, 50.0, 10.0),
+    'humidity': (0.0, 100.0, 20.0),
+    'ph': (3.0, 10.0, 1.0),
+    'rainfall': (0.0, 500.0, 100.0),
+}
+
+BUILD_CHUNK_ROWS = 65536
+# Readings (uniform over the grid range) compared against the live model
+ERROR_SAMPLE_ROWS = 20000
+
+def parse_axes(spec: str, feature_names: list) -> Dict[str, Tuple[float, float, float]]:
+    """Parse ``"ph=4:9:0.5,rainfall=0:300:25"`` overrides on top of DEFAULT_GRID_AXES."""
+    axes = {name: DEFAULT_GRID_AXES[name] for name in feature_names}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, bounds = item.partition('=')
+        name = name.strip()
+        if name not in axes:
+            raise ValueError(f"Unknown feature '{name}' in soil grid axes '{spec}'")
+        low, high, step = (float(v) for v in bounds.split(':'))
+        if step <= 0 or high < low:
+            raise ValueError(f"Invalid soil grid axis '{item}'")
+        axes[name] = (low, high, step)
+    return axes
+
+class SoilGrid:
+    """Memory-mapped top-k crop table for every node of a feature grid."""
+
+    def __init__(self, axes: Dict[str, Tuple[float, float, float]], class_ids: np.ndarray,
+                 probs: np.ndarray, num_classes: int, snap: float = 0.0, report: Optional[dict] = None):
+        self.axes = axes
+        self.lows = np.array([a[0] for a in axes.values()], dtype=np.float64)
+        self.steps = np.array([a[2] for a in axes.values()], dtype=np.float64)
+        self.shape = tuple(_axis_size(*a) for a in axes.values())
+        self.class_ids = class_ids
+        self.probs = probs
+        self.num_classes = num_classes
+        self.snap = snap
+        self.report = report or {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load_or_build(cls, predict_proba: Callable[[np.ndarray], np.ndarray], num_classes: int,
+                      axes: dict, top_k: int, directory: str, model_version: str,
+                      snap: float = 0.0) -> 'SoilGrid':
+        """Open the grid for this model version and layout, building it first if needed."""
+        if top_k < 3 or top_k > num_classes:
+            raise ValueError(f"Soil grid top_k must be between 3 and {num_classes}, got {top_k}")
+
+        layout = {'model_version': model_version, 'axes': axes, 'top_k': top_k}
+        key = hashlib.blake2b(json.dumps(layout, sort_keys=True).encode(), digest_size=8).hexdigest()
+        path = os.path.join(directory, key)
+        if not os.path.exists(os.path.join(path, 'grid.json')):
+            cls._build(predict_proba, num_classes, axes, top_k, path, layout)
+
+        with open(os.path.join(path, 'grid.json')) as f:
+            report = json.load(f)
+        grid = cls(
+            axes={name: tuple(bounds) for name, bounds in report['axes'].items()},
+            class_ids=np.load(os.path.join(path, 'class_ids.npy'), mmap_mode='r'),
+            probs=np.load(os.path.join(path, 'probs.npy'), mmap_mode='r'),
+            num_classes=num_classes,
+            snap=snap,
+            report=report,
+        )
+        logger.info(f"Soil grid ready: {report['cells']} cells, {report['size_mb']} MB at {path}")
+        return grid
+
+    @classmethod
+    def _build(cls, predict_proba, num_classes: int, axes: dict, top_k: int, path: str, layout: dict):
+        start = time.time()
+        shape = tuple(_axis_size(*a) for a in axes.values())
+        cells = int(np.prod(shape))
+        logger.info(f"Building soil grid: {cells} cells, shape {shape}, top-{top_k}")
+
+        # Write into a scratch directory and rename, so a crash never leaves a half grid
+        scratch = f"{path}.building-{os.getpid()}"
+        os.makedirs(scratch, exist_ok=True)
+        class_ids = np.lib.format.open_memmap(os.path.join(scratch, 'class_ids.npy'), mode='w+',
+                                              dtype=np.uint8, shape=(cells, top_k))
+        probs = np.lib.format.open_memmap(os.path.join(scratch, 'probs.npy'), mode='w+',
+                                          dtype=np.float32, shape=(cells, top_k))
+        lows = np.array([a[0] for a in axes.values()])
+        steps = np.array([a[2] for a in axes.values()])
+        for begin in range(0, cells, BUILD_CHUNK_ROWS):
+            flat = np.arange(begin, min(begin + BUILD_CHUNK_ROWS, cells))
+            nodes = np.column_stack(np.unravel_index(flat, shape)) * steps + lows
+            ids, top = _top_k(predict_proba(nodes), top_k)
+            class_ids[flat] = ids
+            probs[flat] = top
+        class_ids.flush()
+        probs.flush()
+        build_seconds = time.time() - start
+
+        # Errors are measured for nearest-node answers, the worst any snap setting allows
+        grid = cls(axes, class_ids, probs, num_classes, snap=0.5)
+        report = {
+            **layout,
+            'shape': list(shape),
+            'cells': cells,
+            'size_mb': round((class_ids.nbytes + probs.nbytes) / 1024 / 1024, 2),
+            'build_seconds': round(build_seconds, 1),
+            **grid._measure_error(predict_proba),
+        }
+        with open(os.path.join(scratch, 'grid.json'), 'w') as f:
+            json.dump(report, f, indent=2)
+        del class_ids, probs, grid
+
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(scratch, path)
+        logger.info(f"Soil grid built: {json.dumps(report)}")
+
+    def _measure_error(self, predict_proba) -> dict:
+        """Worst-case difference from the live model at nodes and at arbitrary readings."""
+        rng = np.random.default_rng(0)
+        highs = self.lows + self.steps * (np.array(self.shape) - 1)
+        # Grid nodes themselves: only storage rounding
+        nodes = rng.integers(0, np.array(self.shape), size=(ERROR_SAMPLE_ROWS, len(self.shape)))
+        node_error, _ = self._compare(predict_proba, nodes * self.steps + self.lows)
+        # Arbitrary readings inside the range, answered from their nearest node
+        readings = rng.uniform(self.lows, highs, size=(ERROR_SAMPLE_ROWS, len(self.shape)))
+        nearest_error, nearest_top1 = self._compare(predict_proba, readings)
+        return {
+            'node_max_prob_error': node_error,
+            'nearest_max_prob_error': nearest_error,
+            'nearest_top1_agreement': nearest_top1,
+        }
+
+    def _compare(self, predict_proba, readings: np.ndarray) -> Tuple[float, float]:
+        """Largest probability error and top-1 agreement on the readings the grid answers."""
+        grid_probs, answered = self.lookup(readings)
+        if not answered.any():
+            return 0.0, 1.0
+        live = predict_proba(readings[answered])
+        stored = grid_probs[answered]
+        known = stored >= 0
+        error = np.abs(stored[known] - live[known]).max()
+        # The live model's top crops that the grid does not list count as probability 0
+        live_ids, live_top = _top_k(live, self.class_ids.shape[1])
+        listed = np.take_along_axis(np.maximum(stored, 0.0), live_ids, axis=1)
+        error = max(float(error), float(np.abs(live_top - listed).max()))
+        top1 = np.mean(grid_probs[answered].argmax(axis=1) == live_ids[:, 0])
+        return round(error, 6), round(float(top1), 4)
+
+    def lookup(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, classes) probabilities and a mask of rows answered from the grid.
+
+        Classes outside a row's stored top-k are -1; unanswered rows are all -1.
+        """
+        features = np.atleast_2d(features)
+        position = (features - self.lows) / self.steps
+        nearest = np.rint(position)
+        answered = (
+            (nearest >= 0).all(axis=1)
+            & (nearest <= np.array(self.shape) - 1).all(axis=1)
+            & (np.abs(position - nearest) <= self.snap + 1e-6).all(axis=1)
+        )
+        probabilities = np.full((len(features), self.num_classes), -1.0)
+        rows = np.nonzero(answered)[0]
+        if len(rows):
+            flat = np.ravel_multi_index(nearest[rows].astype(np.intp).T, self.shape)
+            probabilities[rows[:, None], self.class_ids[flat]] = self.probs[flat]
+        self.hits += len(rows)
+        self.misses += len(features) - len(rows)
+        return probabilities, answered
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'cells': self.report.get('cells'),
+            'size_mb': self.report.get('size_mb'),
+            'snap': self.snap,
+            'node_max_prob_error': self.report.get('node_max_prob_error'),
+            'nearest_max_prob_error': self.report.get('nearest_max_prob_error'),
+            'nearest_top1_agreement': self.report.get('nearest_top1_agreement'),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+def _axis_size(low: float, high: float, step: float) -> int:
+    return int(np.floor((high - low) / step + 1e-9)) + 1
+
+def _top_k(probabilities: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    ids = np.argpartition(probabilities, -k, axis=1)[:, -k:]
+    order = np.argsort(-np.take_along_axis(probabilities, ids, axis=1), axis=1, kind='stable')
+    ids = np.take_along_axis(ids, order, axis=1)
+    return ids, np.take_along_axis(probabilities, ids, axis=1)
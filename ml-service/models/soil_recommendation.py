@@ -1,4 +1,5 @@
 import pickle
+import hashlib
 import numpy as np
 import json
 import os
@@ -6,30 +7,81 @@ import time
 import logging
 from typing import Optional
 
+from models.artifacts import BUNDLE_MODES, ModelBundle, find_bundle
+from models.soil_forest import SOIL_ENGINES, NumpyForest
+from models.soil_grid import SoilGrid
+from models.soil_rules import SoilRules
+
 logger = logging.getLogger(__name__)
 
+# Model input columns, in training order, with the ranges accepted by the API
+FEATURE_NAMES = ['nitrogen', 'phosphorus', 'potassium', 'temperature', 'humidity', 'ph', 'rainfall']
+FEATURE_BOUNDS = np.array([
+    [0, 200],
+    [0, 200],
+    [0, 200],
+    [-10, 60],
+    [0, 100],
+    [0, 14],
+    [0, 1000],
+], dtype=np.float64)
+
 class SoilRecommendationModel:
-    def __init__(self):
+    def __init__(self, engine: str = 'auto', numpy_max_rows: int = 4, grid_axes: Optional[dict] = None,
+                 grid_top_k: int = 3, grid_snap: float = 0.0, grid_dir: Optional[str] = None,
+                 bundle: str = 'auto', bundle_dir: Optional[str] = None, rules_path: Optional[str] = None):
+        if engine not in SOIL_ENGINES:
+            raise ValueError(f"Unknown soil engine '{engine}'. Expected one of {SOIL_ENGINES}")
+        if bundle not in BUNDLE_MODES:
+            raise ValueError(f"Unknown model bundle mode '{bundle}'. Expected one of {BUNDLE_MODES}")
+        self.engine = engine
+        # Model bundle (models/artifacts.py) or the legacy soil_model.pkl
+        self.bundle_mode = bundle
+        self.bundle_dir = bundle_dir
+        self.artifact_source = None
+        # With engine='auto', requests up to this many rows use the NumPy forest
+        self.numpy_max_rows = numpy_max_rows
+        self.forest = None
+        # Precomputed lookup grid (see models/soil_grid.py); None disables it
+        self.grid_axes = grid_axes
+        self.grid_top_k = grid_top_k
+        self.grid_snap = min(max(grid_snap, 0.0), 0.5)
+        self.grid_dir = grid_dir or os.path.join(os.path.dirname(__file__), '..', 'weights', 'soil_grid')
+        self.grid = None
+        # Soil health, weather risk and crop analysis thresholds (models/soil_rules.py)
+        self.rules = SoilRules.from_file(rules_path, FEATURE_NAMES)
         self.model = None
         self.label_encoder = None
         self.class_names = None
         self.features = None
         self.is_loaded = False
+        # Identifies the weights producing predictions (cache invalidation)
+        self.model_version = None
+        # Startup phase timings in ms: import, deserialize, engine, grid, warmup
+        self.load_phases = {}
         self.prediction_count = 0
         self.total_inference_ms = 0
+        # Optional callback(stage, seconds) for forward and postprocess timings
+        self.stage_observer = None
     
     def load(self):
         try:
-            model_path = os.path.join(os.path.dirname(__file__), '..', 'weights', 'soil_model.pkl')
-            
             logger.info("Loading soil recommendation model...")
-            with open(os.path.abspath(model_path), 'rb') as f:
-                artifacts = pickle.load(f)
+            bundle = find_bundle(self.bundle_mode, 'soil', self.bundle_dir)
+            if bundle is not None:
+                self._load_bundle(bundle)
+            else:
+                self._load_pickle()
+            
+            phase_start = time.time()
+            # A bundle already carries the exported forest
+            if self.forest is None:
+                self.init_engine()
+            self._end_phase('engine_ms', phase_start)
             
-            self.model = artifacts['model']
-            self.label_encoder = artifacts['label_encoder']
-            self.class_names = artifacts['class_names']
-            self.features = artifacts['features']
+            phase_start = time.time()
+            self.init_grid()
+            self._end_phase('grid_ms', phase_start)
             self.is_loaded = True
             logger.info(f"Soil model loaded. Crops: {len(self.class_names)}")
             
@@ -37,6 +89,109 @@ class SoilRecommendationModel:
             logger.error(f"Failed to load soil model: {e}")
             raise
     
+    def _load_pickle(self):
+        """Legacy soil_model.pkl: pickled XGBClassifier, LabelEncoder and class list."""
+        model_path = os.path.join(os.path.dirname(__file__), '..', 'weights', 'soil_model.pkl')
+        phase_start = time.time()
+        import xgboost  # noqa: F401 - needed to unpickle the classifier
+        self._end_phase('import_ms', phase_start)
+        
+        phase_start = time.time()
+        with open(os.path.abspath(model_path), 'rb') as f:
+            blob = f.read()
+        artifacts = pickle.loads(blob)
+        self.model_version = f"{self.engine}:{hashlib.blake2b(blob, digest_size=8).hexdigest()}"
+        
+        self.model = artifacts['model']
+        self.label_encoder = artifacts['label_encoder']
+        self.class_names = artifacts['class_names']
+        self.features = artifacts['features']
+        self.artifact_source = 'pickle'
+        self._end_phase('deserialize_ms', phase_start)
+    
+    def _load_bundle(self, bundle: ModelBundle):
+        """Bundle section: native XGBoost model plus memory-mapped forest arrays.
+        
+        The NumPy engine never touches the booster, so XGBoost is not even imported.
+        """
+        metadata = bundle.metadata('soil')
+        phase_start = time.time()
+        if self.engine != 'numpy':
+            from xgboost import XGBClassifier
+        self._end_phase('import_ms', phase_start)
+        
+        phase_start = time.time()
+        if self.engine != 'numpy':
+            self.model = XGBClassifier()
+            self.model.load_model(bundle.path('soil', 'model.ubj'))
+        if self.engine != 'xgboost':
+            arrays = {name: bundle.array('soil', f'forest/{name}.npy') for name in NumpyForest.ARRAY_NAMES}
+            self.forest = NumpyForest.from_arrays(arrays, metadata['forest']['max_depth'])
+        self.class_names = metadata['class_names']
+        self.features = metadata['features']
+        self.model_version = f"{self.engine}:{bundle.version('soil')}"
+        self.artifact_source = 'bundle'
+        self._end_phase('deserialize_ms', phase_start)
+    
+    def warm_up(self):
+        """Score one mid-range reading so the first request does not pay first-call costs."""
+        start_time = time.time()
+        self._live_proba(FEATURE_BOUNDS.mean(axis=1)[None, :])
+        self._end_phase('warmup_ms', start_time)
+    
+    def _end_phase(self, name: str, start_time: float):
+        self.load_phases[name] = round((time.time() - start_time) * 1000, 1)
+    
+    def init_engine(self):
+        """Export the booster's trees for the NumPy engine, if that engine is used."""
+        self.forest = None
+        if self.engine == 'xgboost':
+            return
+        try:
+            self.forest = NumpyForest.from_xgboost(self.model)
+        except Exception as e:
+            if self.engine == 'numpy':
+                raise
+            logger.warning(f"NumPy soil engine unavailable, using XGBoost: {e}")
+    
+    def init_grid(self):
+        """Open (building on first use) the lookup grid for the loaded model version."""
+        self.grid = None
+        if self.grid_axes is None:
+            return
+        self.grid = SoilGrid.load_or_build(
+            self._live_proba,
+            num_classes=len(self.class_names),
+            axes=self.grid_axes,
+            top_k=self.grid_top_k,
+            directory=os.path.abspath(self.grid_dir),
+            model_version=self.model_version,
+            snap=self.grid_snap,
+        )
+    
+    def _predict_proba(self, features: np.ndarray, selected_idx: Optional[np.ndarray] = None) -> np.ndarray:
+        """Class probabilities per row; -1 marks classes the lookup grid does not list.
+        
+        ``selected_idx`` holds each row's requested crop class (-1 for none),
+        which must have a real probability, so such rows skip the grid when
+        their crop is outside the stored top-k.
+        """
+        if self.grid is None:
+            return self._live_proba(features)
+        
+        probabilities, answered = self.grid.lookup(features)
+        if selected_idx is not None:
+            rows = np.arange(len(features))
+            answered &= (selected_idx < 0) | (probabilities[rows, selected_idx] >= 0)
+        if not answered.all():
+            probabilities[~answered] = self._live_proba(features[~answered])
+        return probabilities
+    
+    def _live_proba(self, features: np.ndarray) -> np.ndarray:
+        if self.forest is not None and (self.engine == 'numpy' or len(features) <= self.numpy_max_rows):
+            return self.forest.predict_proba(features)
+        return self.model.predict_proba(features).astype(np.float64)
+    
     def predict(self, nitrogen: float, phosphorus: float, potassium: float,
                 temperature: float, humidity: float, ph: float, rainfall: float,
                 selected_crop: Optional[str] = None) -> dict:
@@ -46,10 +201,14 @@ class SoilRecommendationModel:
         
         start_time = time.time()
         
-        input_data = np.array([[nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall]])
+        reading = (nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall)
+        input_data = np.array([reading])
         
         # Get probability for all classes
-        probabilities = self.model.predict_proba(input_data)[0]
+        selected_idx = self._selected_class_indices([selected_crop]) if selected_crop else None
+        forward_start = time.perf_counter()
+        probabilities = self._predict_proba(input_data, selected_idx)[0]
+        forward_end = time.perf_counter()
         
         # Get top 3 crops by probability
         top_3_indices = np.argsort(probabilities)[-3:][::-1]
@@ -79,9 +238,7 @@ class SoilRecommendationModel:
             if matching_class:
                 class_idx = list(self.class_names).index(matching_class)
                 suitability = float(probabilities[class_idx])
-                selected_crop_analysis = self._analyze_selected_crop(
-                    matching_class, suitability, nitrogen, phosphorus, potassium, ph
-                )
+                selected_crop_analysis = self._analyze_selected_crop(matching_class, suitability, reading)
             else:
                 selected_crop_analysis = {
                     'crop': selected_crop,
@@ -91,72 +248,220 @@ class SoilRecommendationModel:
                 }
         
         # Overall soil health assessment
-        soil_health = self._assess_soil_health(nitrogen, phosphorus, potassium, ph, moisture=humidity)
-        weather_risk = self._assess_weather_risk(temperature, rainfall, humidity)
+        soil_health = self.rules.soil_health_row(reading)
+        weather_risk = self.rules.weather_risk_row(reading)
         
-        return {
+        result = {
             'recommended_crops': recommended_crops,
             'selected_crop_analysis': selected_crop_analysis,
             'current_soil_health': soil_health,
             'weather_risk': weather_risk,
             'inference_ms': round(inference_ms, 2),
         }
+        self._observe_stages(forward_start, forward_end)
+        return result
     
-    def _analyze_selected_crop(self, crop: str, suitability: float, n, p, k, ph) -> dict:
-        is_suitable = suitability > 0.6
-        issues = []
-        improvements = []
-        
-        # Generic issue detection based on NPK and pH
-        if n < 20:
-            issues.append('Low nitrogen may reduce yield by 15-25%')
-            improvements.append('Apply urea (46-0-0) at 50kg/acre before sowing')
-        if p < 15:
-            issues.append('Phosphorus deficiency may affect root development')
-            improvements.append('Add single superphosphate (SSP) at 40kg/acre')
-        if k < 15:
-            issues.append('Low potassium may reduce disease resistance')
-            improvements.append('Apply muriate of potash (MOP) at 30kg/acre')
-        if ph < 5.5:
-            issues.append('Soil is too acidic — most crops prefer pH 6.0-7.0')
-            improvements.append('Apply agricultural lime at 2-4 tonnes/acre to raise pH')
-        elif ph > 7.5:
-            issues.append('Soil is too alkaline — may lock nutrients')
-            improvements.append('Apply gypsum or sulfur to lower pH gradually')
-        
-        if not issues:
-            issues.append('Soil conditions look favorable for this crop')
-        if not improvements:
-            improvements.append('Maintain current soil management practices')
+    def predict_batch(self, columns: dict, selected_crops: Optional[list] = None) -> list:
+        """Score N readings with a single predict_proba call.
+        
+        ``columns`` maps every name in FEATURE_NAMES to a sequence of N values;
+        ``selected_crops`` is an optional sequence of N crop names (or None).
+        Ranking, crop lookup and the health/risk labels are computed on whole
+        columns; only the final per-row dicts are built in Python.
+        """
+        if not self.is_loaded:
+            raise RuntimeError("Model not loaded. Call load() first.")
+        
+        start_time = time.time()
+        
+        features = self._feature_matrix(columns)
+        n_rows = features.shape[0]
+        if n_rows == 0:
+            return []
+        
+        selected_idx = self._selected_class_indices(selected_crops, n_rows)
+        forward_start = time.perf_counter()
+        probabilities = self._predict_proba(features, selected_idx)
+        forward_end = time.perf_counter()
+        
+        top_k, top_k_probs = self._top_k(probabilities, 3)
+        
+        inference_ms = (time.time() - start_time) * 1000
+        self.prediction_count += n_rows
+        self.total_inference_ms += inference_ms
         
+        soil_health = self.rules.soil_health(features)
+        weather_risk = self.rules.weather_risk(features)
+        crop_analyses = self._analyze_selected_crops_batch(selected_crops, selected_idx, probabilities, features)
+        
+        class_names = np.asarray(self.class_names, dtype=object)
+        top_names = class_names[top_k].tolist()
+        top_probs = top_k_probs.tolist()
+        soil_health = soil_health.tolist()
+        weather_risk = weather_risk.tolist()
+        inference_ms = round(inference_ms, 2)
+        
+        results = [
+            {
+                'recommended_crops': [
+                    {'crop': crop, 'suitability': prob, 'rank': rank + 1}
+                    for rank, (crop, prob) in enumerate(zip(top_names[row], top_probs[row]))
+                ],
+                'selected_crop_analysis': crop_analyses[row],
+                'current_soil_health': soil_health[row],
+                'weather_risk': weather_risk[row],
+                'inference_ms': inference_ms,
+            }
+            for row in range(n_rows)
+        ]
+        self._observe_stages(forward_start, forward_end)
+        return results
+    
+    def score_matrix(self, features: np.ndarray, selected_crops: Optional[list] = None, top_k: int = 3) -> dict:
+        """Columnar scores for a validated N x 7 feature matrix (bulk re-scoring).
+        
+        The same probabilities and rules as predict_batch, returned as arrays
+        instead of per-row dicts: ``crop_i``/``suitability_i`` for each rank,
+        the health and risk labels and, with ``selected_crops``, the matched
+        class (None if unknown), its suitability and ``issue_flags``, where
+        bit i is crop analysis issue i of the rule table.
+        """
+        if not self.is_loaded:
+            raise RuntimeError("Model not loaded. Call load() first.")
+        if len(self.rules.crop_issues) > 64:
+            raise ValueError("issue_flags holds at most 64 crop analysis issues")
+        
+        n_rows = features.shape[0]
+        selected_idx = self._selected_class_indices(selected_crops, n_rows)
+        probabilities = self._predict_proba(features, selected_idx)
+        ranked, ranked_probs = self._top_k(probabilities, top_k)
+        class_names = np.asarray(self.class_names, dtype=object)
+        
+        columns = {}
+        for rank in range(ranked.shape[1]):
+            columns[f'crop_{rank + 1}'] = class_names[ranked[:, rank]]
+            columns[f'suitability_{rank + 1}'] = ranked_probs[:, rank]
+        assessed = self.rules.assess(features)
+        columns['current_soil_health'] = assessed['current_soil_health']
+        columns['weather_risk'] = assessed['weather_risk']
+        
+        if selected_idx is not None:
+            known = selected_idx >= 0
+            class_idx = np.maximum(selected_idx, 0)
+            suitability = np.where(known, probabilities[np.arange(n_rows), class_idx], np.nan)
+            raised = assessed['issue_mask'] & known[:, None]
+            bits = np.left_shift(np.uint64(1), np.arange(raised.shape[1], dtype=np.uint64))
+            columns['selected_crop'] = np.where(known, class_names[class_idx], None)
+            columns['selected_suitability'] = np.round(suitability, 4)
+            columns['is_suitable'] = known & (suitability > self.rules.suitable_above)
+            columns['issue_flags'] = (raised * bits).sum(axis=1, dtype=np.uint64)
+        return columns
+    
+    @staticmethod
+    def _top_k(probabilities: np.ndarray, k: int) -> tuple:
+        """Top ``k`` class indices per row, most likely first, and their rounded probabilities."""
+        # Partial selection, then order the k
+        k = min(k, probabilities.shape[1])
+        top_k = np.argpartition(probabilities, -k, axis=1)[:, -k:]
+        order = np.argsort(-np.take_along_axis(probabilities, top_k, axis=1), axis=1, kind='stable')
+        top_k = np.take_along_axis(top_k, order, axis=1)
+        return top_k, np.round(np.take_along_axis(probabilities, top_k, axis=1), 4)
+    
+    def _observe_stages(self, forward_start: float, forward_end: float):
+        """Report the forward pass and everything after it (ranking, labels, dicts)."""
+        if self.stage_observer is not None:
+            self.stage_observer('forward', forward_end - forward_start)
+            self.stage_observer('postprocess', time.perf_counter() - forward_end)
+    
+    def _feature_matrix(self, columns: dict) -> np.ndarray:
+        """Stack and validate the feature columns into an N x 7 float matrix."""
+        missing = [name for name in FEATURE_NAMES if name not in columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+        
+        lengths = {len(columns[name]) for name in FEATURE_NAMES}
+        if len(lengths) > 1:
+            raise ValueError("All feature columns must have the same length")
+        
+        features = np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in FEATURE_NAMES])
+        if features.size == 0:
+            return features.reshape(0, len(FEATURE_NAMES))
+        
+        invalid = ~np.isfinite(features) | (features < FEATURE_BOUNDS[:, 0]) | (features > FEATURE_BOUNDS[:, 1])
+        if invalid.any():
+            rows, cols = np.nonzero(invalid)
+            details = ', '.join(f"row {r} {FEATURE_NAMES[c]}" for r, c in zip(rows[:10], cols[:10]))
+            raise ValueError(f"{len(rows)} value(s) out of range: {details}")
+        return features
+    
+    def _selected_class_indices(self, selected_crops: Optional[list], n_rows: Optional[int] = None) -> Optional[np.ndarray]:
+        """Class index of each requested crop (case-insensitive), -1 for none or unknown."""
+        if selected_crops is None:
+            return None
+        if n_rows is not None and len(selected_crops) != n_rows:
+            raise ValueError("selected_crop must have one entry per reading")
+        
+        requested = np.array([crop or '' for crop in selected_crops], dtype=object)
+        class_lower = np.char.lower(np.asarray(self.class_names, dtype=str))
+        sort_order = np.argsort(class_lower)
+        sorted_lower = class_lower[sort_order]
+        requested_lower = np.char.lower(requested.astype(str))
+        position = np.clip(np.searchsorted(sorted_lower, requested_lower), 0, len(sorted_lower) - 1)
+        known = (requested != '') & (sorted_lower[position] == requested_lower)
+        return np.where(known, sort_order[position], -1)
+    
+    def _analyze_selected_crops_batch(self, selected_crops: Optional[list], selected_idx: Optional[np.ndarray],
+                                      probabilities: np.ndarray, features: np.ndarray) -> list:
+        n_rows = features.shape[0]
+        if selected_crops is None:
+            return [None] * n_rows
+        
+        has_request = np.array([bool(crop) for crop in selected_crops])
+        if not has_request.any():
+            return [None] * n_rows
+        
+        known = selected_idx >= 0
+        class_idx = np.maximum(selected_idx, 0)
+        
+        suitability = probabilities[np.arange(n_rows), class_idx]
+        is_suitable = suitability > self.rules.suitable_above
+        raised = self.rules.issue_mask(features) & known[:, None]
+        
+        analyses = [None] * n_rows
+        class_names = list(self.class_names)
+        for row in np.nonzero(has_request)[0]:
+            if known[row]:
+                analyses[row] = {
+                    'crop': class_names[class_idx[row]],
+                    'is_suitable': bool(is_suitable[row]),
+                    'suitability_score': round(float(suitability[row]), 4),
+                    **self._issue_texts(np.flatnonzero(raised[row])),
+                }
+            else:
+                crop = selected_crops[row]
+                analyses[row] = {
+                    'crop': crop,
+                    'is_suitable': False,
+                    'potential_issues': [f'{crop} is not in our trained crop database.'],
+                    'soil_improvements': ['Consult a local agronomist for specific guidance.']
+                }
+        return analyses
+    
+    def _analyze_selected_crop(self, crop: str, suitability: float, reading: tuple) -> dict:
         return {
             'crop': crop,
-            'is_suitable': is_suitable,
+            'is_suitable': suitability > self.rules.suitable_above,
             'suitability_score': round(suitability, 4),
-            'potential_issues': issues,
-            'soil_improvements': improvements,
+            **self._issue_texts(self.rules.issues_row(reading)),
         }
     
-    def _assess_soil_health(self, n, p, k, ph, moisture) -> str:
-        score = 0
-        if 30 <= n <= 80: score += 2
-        elif n > 0: score += 1
-        if 20 <= p <= 60: score += 2
-        elif p > 0: score += 1
-        if 20 <= k <= 60: score += 2
-        elif k > 0: score += 1
-        if 6.0 <= ph <= 7.0: score += 2
-        elif 5.5 <= ph <= 7.5: score += 1
-        
-        if score >= 7: return 'good'
-        elif score >= 4: return 'moderate'
-        else: return 'poor'
-    
-    def _assess_weather_risk(self, temp, rainfall, humidity) -> str:
-        if temp > 40 or temp < 5: return 'high'
-        if rainfall > 200 or rainfall < 20: return 'medium'
-        if humidity > 85: return 'medium'
-        return 'low'
+    def _issue_texts(self, raised) -> dict:
+        """Issue and improvement texts for the raised crop rules, or the all-clear texts."""
+        rules = self.rules
+        return {
+            'potential_issues': [rules.issue_texts[i] for i in raised] or [rules.no_issues],
+            'soil_improvements': [rules.improvement_texts[i] for i in raised] or [rules.no_improvements],
+        }
     
     @property
     def stats(self) -> dict:
@@ -164,4 +469,11 @@ class SoilRecommendationModel:
             'is_loaded': self.is_loaded,
             'prediction_count': self.prediction_count,
             'avg_inference_ms': round(self.total_inference_ms / max(self.prediction_count, 1), 2),
+            'model_version': self.model_version,
+            'artifact': self.artifact_source,
+            'engine': self.engine,
+            'numpy_forest': self.forest.stats if self.forest is not None else None,
+            'grid': self.grid.stats if self.grid is not None else None,
+            'rules': self.rules.stats,
+            'load_phases': self.load_phases,
         }
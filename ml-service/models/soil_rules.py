@@ -0,0 +1,185 @@
+"""Declarative soil health, weather risk and crop analysis rules.
+
+The thresholds live in a JSON table (``data/soil_rules.json`` by default,
+``SOIL_RULES_PATH`` to use another) so agronomists can change them without
+touching code. The table is validated and compiled once into column indices
+and comparison operators, then evaluated two ways from the same compiled
+form:
+
+- over an N x 7 feature matrix (FEATURE_NAMES order) with NumPy masks, for
+  batch requests and for re-scoring stored readings, where one table costs a
+  handful of array comparisons whatever the row count
+- over one reading as plain Python floats, for single /predict/soil calls,
+  where building arrays would cost more than the comparisons
+
+Conditions are ``{"feature": name, <op>: value, ...}`` with ops ``gt``,
+``ge``, ``lt`` and ``le``; several ops in one condition must all hold.
+Soil health adds the points of the first matching band per feature and
+takes the first label whose ``min_score`` the total reaches. Weather risk
+takes the first level with any matching condition. Crop analysis reports
+every issue whose condition holds.
+"""
+import hashlib
+import json
+import operator
+import os
+from typing import Optional, Sequence
+
+import numpy as np
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'soil_rules.json')
+
+OPERATORS = {'gt': operator.gt, 'ge': operator.ge, 'lt': operator.lt, 'le': operator.le}
+
+class SoilRules:
+    """Compiled rule table, evaluated over feature matrices or single readings."""
+
+    def __init__(self, table: dict, feature_names: Sequence[str], source: str = 'inline'):
+        self.feature_names = list(feature_names)
+        self.source = source
+        self.version = hashlib.blake2b(json.dumps(table, sort_keys=True).encode(), digest_size=8).hexdigest()
+        try:
+            health = table['soil_health']
+            self.health_points = [
+                (self._column(rule['feature']),
+                 [(self._ops(band, rule['feature'], extra=('points',)), float(band['points'])) for band in rule['bands']])
+                for rule in health['points']
+            ]
+            self.health_labels = [(float(level['min_score']), level['label']) for level in health['labels']]
+            self.health_default = health['default']
+
+            weather = table['weather_risk']
+            self.risk_levels = [
+                (level['label'], [self._condition(condition) for condition in level['any']])
+                for level in weather['levels']
+            ]
+            self.risk_default = weather['default']
+
+            crop = table['crop_analysis']
+            self.suitable_above = float(crop['suitable_above'])
+            self.crop_issues = [
+                self._condition(rule, extra=('issue', 'improvement')) for rule in crop['issues']
+            ]
+            self.issue_texts = [rule['issue'] for rule in crop['issues']]
+            self.improvement_texts = [rule['improvement'] for rule in crop['issues']]
+            self.no_issues = crop['no_issues']
+            self.no_improvements = crop['no_improvements']
+        except KeyError as e:
+            raise ValueError(f"Soil rules {source}: missing key {e}") from None
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Soil rules {source}: {e}") from None
+
+        self._health_labels = np.array([label for _, label in self.health_labels] + [self.health_default], dtype=object)
+        self._risk_labels = np.array([label for label, _ in self.risk_levels] + [self.risk_default], dtype=object)
+
+    @classmethod
+    def from_file(cls, path: Optional[str], feature_names: Sequence[str]) -> 'SoilRules':
+        path = os.path.abspath(path or DEFAULT_RULES_PATH)
+        with open(path, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        return cls(table, feature_names, source=path)
+
+    def _column(self, feature: str) -> int:
+        if feature not in self.feature_names:
+            raise ValueError(f"unknown feature '{feature}'")
+        return self.feature_names.index(feature)
+
+    def _ops(self, spec: dict, feature: str, extra: tuple = ()) -> list:
+        unknown = set(spec) - set(OPERATORS) - {'feature'} - set(extra)
+        if unknown:
+            raise ValueError(f"unknown key(s) {sorted(unknown)} in rule for '{feature}'")
+        ops = [(OPERATORS[name], float(spec[name])) for name in OPERATORS if name in spec]
+        if not ops:
+            raise ValueError(f"rule for '{feature}' has no comparison")
+        return ops
+
+    def _condition(self, spec: dict, extra: tuple = ()) -> tuple:
+        return self._column(spec['feature']), self._ops(spec, spec['feature'], extra)
+
+    # NumPy evaluation over an N x 7 feature matrix
+
+    @staticmethod
+    def _mask(values: np.ndarray, ops: list) -> np.ndarray:
+        mask = ops[0][0](values, ops[0][1])
+        for op, threshold in ops[1:]:
+            mask &= op(values, threshold)
+        return mask
+
+    def soil_health(self, features: np.ndarray) -> np.ndarray:
+        """Soil health label per row."""
+        score = np.zeros(len(features))
+        for column, bands in self.health_points:
+            values = features[:, column]
+            score += np.select([self._mask(values, ops) for ops, _ in bands], [points for _, points in bands], 0.0)
+        level = np.select([score >= min_score for min_score, _ in self.health_labels],
+                          np.arange(len(self.health_labels)), len(self.health_labels))
+        return self._health_labels[level]
+
+    def weather_risk(self, features: np.ndarray) -> np.ndarray:
+        """Weather risk label per row."""
+        matches = []
+        for _, conditions in self.risk_levels:
+            mask = np.zeros(len(features), dtype=bool)
+            for column, ops in conditions:
+                mask |= self._mask(features[:, column], ops)
+            matches.append(mask)
+        level = np.select(matches, np.arange(len(self.risk_levels)), len(self.risk_levels))
+        return self._risk_labels[level]
+
+    def issue_mask(self, features: np.ndarray) -> np.ndarray:
+        """N x len(crop issues) boolean matrix of the crop issues each row raises."""
+        mask = np.empty((len(features), len(self.crop_issues)), dtype=bool)
+        for i, (column, ops) in enumerate(self.crop_issues):
+            mask[:, i] = self._mask(features[:, column], ops)
+        return mask
+
+    def assess(self, features: np.ndarray) -> dict:
+        """Every rule-derived column for a feature matrix (re-scoring stored readings)."""
+        return {
+            'current_soil_health': self.soil_health(features),
+            'weather_risk': self.weather_risk(features),
+            'issue_mask': self.issue_mask(features),
+        }
+
+    # Plain Python evaluation of one reading (a sequence in FEATURE_NAMES order)
+
+    @staticmethod
+    def _holds(value: float, ops: list) -> bool:
+        for op, threshold in ops:
+            if not op(value, threshold):
+                return False
+        return True
+
+    def soil_health_row(self, row: Sequence[float]) -> str:
+        score = 0.0
+        for column, bands in self.health_points:
+            value = row[column]
+            for ops, points in bands:
+                if self._holds(value, ops):
+                    score += points
+                    break
+        for min_score, label in self.health_labels:
+            if score >= min_score:
+                return label
+        return self.health_default
+
+    def weather_risk_row(self, row: Sequence[float]) -> str:
+        for label, conditions in self.risk_levels:
+            for column, ops in conditions:
+                if self._holds(row[column], ops):
+                    return label
+        return self.risk_default
+
+    def issues_row(self, row: Sequence[float]) -> list:
+        """Indices of the crop issues this reading raises."""
+        return [i for i, (column, ops) in enumerate(self.crop_issues) if self._holds(row[column], ops)]
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'source': self.source,
+            'version': self.version,
+            'soil_health_features': len(self.health_points),
+            'weather_risk_levels': len(self.risk_levels),
+            'crop_issues': len(self.crop_issues),
+        }
@@ -0,0 +1,185 @@
+import asyncio
+import contextvars
+import inspect
+import logging
+import time
+from typing import Awaitable, Callable, Optional, Set, Union
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """Groups concurrent requests into one batched model call.
+
+    Callers ``await submit(item)``. A background worker takes the first
+    queued item, keeps collecting until ``max_batch_size`` items are waiting
+    or ``max_wait_ms`` has passed, then calls ``batch_fn(items)`` once and
+    hands each caller its own entry of the returned list. An entry that is an
+    ``Exception`` is raised to that caller only. ``batch_fn`` may also be a
+    coroutine function, e.g. one that hands the batch to an executor.
+
+    Each batch runs as its own task, so up to ``max_in_flight`` batches are
+    being scored at once (size it to the executor's workers). While every
+    slot is busy the next batch keeps filling instead of queueing behind
+    the running one. The task runs in the context of the batch's first
+    caller, so its context variables (e.g. the metrics endpoint label)
+    reach ``batch_fn``.
+    """
+
+    def __init__(self, batch_fn: Callable[[list], Union[list, Awaitable[list]]],
+                 max_batch_size: int = 16, max_wait_ms: float = 5.0, name: str = 'batcher',
+                 max_in_flight: int = 1):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._batches: Set[asyncio.Task] = set()
+        self.batch_count = 0
+        self.item_count = 0
+        self.largest_batch = 0
+        self.total_batch_ms = 0
+        self.batch_size_counts = {}
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        """Start the background worker. Call once from the running event loop."""
+        if self.is_running:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._worker = asyncio.create_task(self._run(), name=f"{self.name}-batcher")
+        logger.info(
+            f"{self.name} batcher started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait_ms}, max_in_flight={self.max_in_flight})"
+        )
+
+    async def stop(self):
+        """Stop the worker and fail any requests still queued, being collected or being scored."""
+        if self._worker is None:
+            return
+        for task in [self._worker, *self._batches]:
+            task.cancel()
+        await asyncio.gather(self._worker, *self._batches, return_exceptions=True)
+        self._worker = None
+
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError(f"{self.name} batcher stopped"))
+
+    async def submit(self, item):
+        """Queue one item and wait for its own result."""
+        if not self.is_running:
+            raise RuntimeError(f"{self.name} batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future, contextvars.copy_context()))
+        return await future
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait_ms / 1000
+
+        try:
+            while len(batch) < self.max_batch_size:
+                # Anything already queued joins the batch without waiting
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Stopped mid-collection: these items are off the queue already
+            self._fail(batch, RuntimeError(f"{self.name} batcher stopped"))
+            raise
+        return batch
+
+    async def _execute(self, items: list) -> list:
+        results = self.batch_fn(items)
+        if inspect.isawaitable(results):
+            results = await results
+        return results
+
+    async def _run(self):
+        while True:
+            # Wait for a free slot first, so the next batch fills meanwhile
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            # Callers that gave up (client disconnect, timeout) are dropped
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._dispatch(batch), name=f"{self.name}-batch", context=batch[0][2])
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _dispatch(self, batch: list):
+        """Score one batch and resolve its callers' futures."""
+        items = [item for item, _, _ in batch]
+        start_time = time.time()
+        try:
+            results = await self._execute(items)
+        except asyncio.CancelledError:
+            self._fail(batch, RuntimeError(f"{self.name} batcher stopped"))
+            raise
+        except Exception as e:
+            logger.error(f"{self.name} batch of {len(items)} failed: {e}")
+            self._fail(batch, e)
+            return
+        finally:
+            self._slots.release()
+
+        self._record(len(items), (time.time() - start_time) * 1000)
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _fail(batch: list, error: Exception):
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _record(self, size: int, elapsed_ms: float):
+        self.batch_count += 1
+        self.item_count += size
+        self.largest_batch = max(self.largest_batch, size)
+        self.total_batch_ms += elapsed_ms
+        self.batch_size_counts[size] = self.batch_size_counts.get(size, 0) + 1
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'is_running': self.is_running,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_ms,
+            'max_in_flight': self.max_in_flight,
+            'in_flight': len(self._batches),
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'batch_count': self.batch_count,
+            'item_count': self.item_count,
+            'avg_batch_size': round(self.item_count / max(self.batch_count, 1), 2),
+            'largest_batch': self.largest_batch,
+            'avg_batch_ms': round(self.total_batch_ms / max(self.batch_count, 1), 2),
+            'batch_size_counts': {str(k): v for k, v in sorted(self.batch_size_counts.items())},
+        }
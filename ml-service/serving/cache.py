@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry bookkeeping cost (key, OrderedDict node, timestamps)
+ENTRY_OVERHEAD_BYTES = 256
+
+def content_key(data: bytes) -> str:
+    """Content address for an uploaded file."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def quantized_key(values: dict, steps: Dict[str, float], fields: Iterable[str]) -> tuple:
+    """Key for near-identical numeric inputs: each field snapped to its step size."""
+    return tuple(
+        round(float(values[field]) / steps[field]) if steps.get(field) else float(values[field])
+        for field in fields
+    )
+
+def parse_steps(spec: str, defaults: Dict[str, float]) -> Dict[str, float]:
+    """Parse ``"name=step,name=step"`` overrides on top of ``defaults``."""
+    steps = dict(defaults)
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, value = item.partition('=')
+        if name.strip() not in steps:
+            raise ValueError(f"Unknown field '{name.strip()}' in cache precision '{spec}'")
+        steps[name.strip()] = float(value)
+    return steps
+
+class PredictionCache:
+    """Thread-safe LRU cache of prediction payloads, bounded by approximate size.
+
+    Entries are evicted least-recently-used first once ``max_bytes`` is
+    exceeded, and expire after ``ttl_seconds`` when that is set. Every lookup
+    passes the version of the model that would produce the answer; when it
+    differs from the version the cached entries were made with, the whole
+    cache is dropped, so a reloaded model never serves stale results.
+
+    ``get_or_compute`` also merges concurrent misses for the same key into a
+    single computation whose result every caller receives.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: Optional[float] = None, name: str = 'cache'):
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttl_seconds = ttl_seconds or None
+        self.name = name
+        self.version = None
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.coalesced = 0
+        # (version, key) -> task computing that payload; event-loop only
+        self._in_flight: Dict[tuple, asyncio.Future] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Hashable, version) -> Optional[dict]:
+        """Return the cached payload for ``key`` or None, counting the hit/miss."""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            payload, size, stored_at = entry
+            if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key: Hashable, payload: dict, version):
+        if not self.enabled:
+            return
+        size = len(json.dumps(payload, default=str)) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._check_version(version)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (payload, size, time.monotonic())
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    async def get_or_compute(self, key: Hashable, version, compute: Callable[[], Awaitable[dict]]) -> dict:
+        """Return the cached payload, or compute it once for all concurrent callers."""
+        cached = self.get(key, version)
+        if cached is not None:
+            return cached
+
+        flight_key = (version, key)
+        task = self._in_flight.get(flight_key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._in_flight[flight_key] = task
+            task.add_done_callback(lambda done: self._finish(flight_key, done))
+        else:
+            self.coalesced += 1
+        # One caller disconnecting must not cancel the others' computation
+        return await asyncio.shield(task)
+
+    def _finish(self, flight_key: tuple, task: asyncio.Future):
+        self._in_flight.pop(flight_key, None)
+        if not task.cancelled() and task.exception() is None:
+            version, key = flight_key
+            self.put(key, task.result(), version)
+
+    def _check_version(self, version):
+        if version == self.version:
+            return
+        if self._entries:
+            logger.info(f"{self.name} cache invalidated: model version {self.version} -> {version}")
+            self.invalidations += 1
+        self._entries.clear()
+        self.current_bytes = 0
+        self.version = version
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'size_bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._in_flight),
+            'model_version': self.version,
+        }
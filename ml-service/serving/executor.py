@@ -0,0 +1,175 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('inline', 'thread', 'process')
+
+# Models owned by a process-pool worker, filled in by _init_worker
+_worker_models: Dict[str, object] = {}
+
+def build_and_load(model_class, warm_up: bool = False, **kwargs):
+    """Default model factory: instantiate ``model_class(**kwargs)``, ``load()`` it and
+    optionally run its ``warm_up()``."""
+    model = model_class(**kwargs)
+    model.load()
+    if warm_up and hasattr(model, 'warm_up'):
+        model.warm_up()
+    return model
+
+def _init_worker(factories: Dict[str, Callable[[], object]]):
+    """Process-pool initializer: build and load every model once per worker.
+
+    A model that fails to load is left out rather than breaking the pool, so
+    the other model keeps serving; ``prime`` reports which models loaded.
+    """
+    for name, factory in factories.items():
+        try:
+            _worker_models[name] = factory()
+        except Exception as e:
+            logger.error(f"Inference worker failed to load {name} model: {e}")
+    logger.info(f"Inference worker ready with models: {sorted(_worker_models)}")
+
+def _worker_model_names() -> list:
+    return sorted(_worker_models)
+
+def _call_in_worker(model_name: str, method: str, args: tuple, kwargs: dict):
+    return getattr(_worker_models[model_name], method)(*args, **kwargs)
+
+class InferenceExecutor:
+    """Runs blocking model calls away from the asyncio event loop.
+
+    ``backend`` is one of:
+
+    - ``inline``: call the model directly on the event loop (the old behaviour,
+      kept for comparison benchmarks).
+    - ``thread``: a ``ThreadPoolExecutor`` sharing the models loaded in this
+      process. TensorFlow and XGBoost release the GIL for the heavy work.
+    - ``process``: a ``ProcessPoolExecutor`` (spawn) where every worker builds
+      its own models from ``factories``. Model ``stats`` in this process then
+      do not see worker predictions.
+
+    At most ``max_pending`` calls are queued or running at once; further
+    callers wait on the event loop without holding a worker.
+    """
+
+    def __init__(self, backend: str = 'thread', workers: int = 2, max_pending: int = 64,
+                 factories: Optional[Dict[str, Callable[[], object]]] = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}'. Expected one of {BACKENDS}")
+        self.backend = backend
+        self.workers = max(1, int(workers))
+        self.max_pending = max(self.workers, int(max_pending))
+        self.factories = factories or {}
+        self.models: Dict[str, object] = {}
+        self._pool: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self, models: Optional[Dict[str, object]] = None):
+        """Create the pool. ``models`` are the already loaded in-process models;
+        more can be added later with ``register``."""
+        self.models = dict(models or {})
+        self._slots = asyncio.Semaphore(self.max_pending)
+        if self.backend == 'thread':
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+        elif self.backend == 'process':
+            if not self.factories:
+                raise ValueError("The process backend needs model factories")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.factories,),
+            )
+        logger.info(
+            f"Inference executor started (backend={self.backend}, workers={self.workers}, "
+            f"max_pending={self.max_pending})"
+        )
+
+    def register(self, name: str, model):
+        """Make an in-process model available to the inline and thread backends."""
+        self.models[name] = model
+
+    async def prime(self) -> set:
+        """Start every process-pool worker now, building its models, instead of on first use.
+
+        Returns the names of the models loaded in every worker primed. Other
+        backends use the registered in-process models and return those.
+        """
+        if self.backend != 'process':
+            return set(self.models)
+        loop = asyncio.get_running_loop()
+        loaded = await asyncio.gather(*(
+            loop.run_in_executor(self._pool, _worker_model_names) for _ in range(self.workers)
+        ))
+        logger.info(f"Inference workers primed: {loaded}")
+        return set.intersection(*(set(names) for names in loaded))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, model_name: str, method: str, *args, **kwargs):
+        """Call ``models[model_name].method(*args, **kwargs)`` on the configured backend."""
+        self._update(waiting=1)
+        try:
+            await self._slots.acquire()
+        finally:
+            self._update(waiting=-1)
+
+        self._update(in_flight=1)
+        try:
+            result = await self._dispatch(model_name, method, args, kwargs)
+        except Exception:
+            self._update(failed=1)
+            raise
+        finally:
+            self._update(in_flight=-1)
+            self._slots.release()
+        self._update(completed=1)
+        return result
+
+    async def _dispatch(self, model_name: str, method: str, args: tuple, kwargs: dict):
+        if self.backend == 'inline':
+            return getattr(self.models[model_name], method)(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        if self.backend == 'thread':
+            # Context variables follow the call into the thread, like asyncio.to_thread
+            call = functools.partial(
+                contextvars.copy_context().run, getattr(self.models[model_name], method), *args, **kwargs
+            )
+        else:
+            call = functools.partial(_call_in_worker, model_name, method, args, kwargs)
+        return await loop.run_in_executor(self._pool, call)
+
+    def _update(self, waiting: int = 0, in_flight: int = 0, completed: int = 0, failed: int = 0):
+        with self._lock:
+            self.waiting += waiting
+            self.in_flight += in_flight
+            self.completed += completed
+            self.failed += failed
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'backend': self.backend,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'completed': self.completed,
+            'failed': self.failed,
+        }
@@ -0,0 +1,179 @@
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# A worker that exits sooner than this after being forked counts as a crash
+# and is restarted after a pause, so a broken deploy does not fork in a loop
+CRASH_WINDOW_SECONDS = 5.0
+CRASH_BACKOFF_SECONDS = 2.0
+
+# This worker's details for /health; None outside pre-fork workers
+_worker: Optional[dict] = None
+
+def worker_info() -> Optional[dict]:
+    return dict(_worker) if _worker is not None else None
+
+def limit_threads(intra_op: int, inter_op: int):
+    """Cap the math libraries' thread pools for this process and its children.
+
+    Every worker otherwise sizes its pools to all cores, so N workers run
+    N x cores threads and spend their time context switching. The
+    environment variables are read when each library first initializes; the
+    TensorFlow call covers a TensorFlow that is already imported.
+    """
+    for name in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS'):
+        os.environ[name] = str(intra_op)
+    os.environ['TF_NUM_INTEROP_THREADS'] = str(inter_op)
+    if 'tensorflow' in sys.modules:
+        tf = sys.modules['tensorflow']
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+        except RuntimeError as e:
+            logger.warning(f"TensorFlow thread limits not applied, runtime already initialized: {e}")
+
+class PreforkServer:
+    """Serves ``app`` from several forked uvicorn workers sharing one listening socket.
+
+    ``preload`` runs in the parent before any worker is forked. Whatever it
+    loads is inherited copy-on-write: NumPy arrays, XGBoost boosters and
+    memory-mapped files stay shared as long as no worker writes to them.
+    ``gc.freeze()`` keeps the garbage collector from touching (and so
+    copying) the inherited objects.
+
+    Workers that exit are replaced from the parent's preloaded state, which
+    is also how recycling works: after ``max_requests`` (plus up to
+    ``max_requests_jitter``, so workers do not all restart together) a worker
+    stops accepting, finishes its in-flight requests and exits.
+    """
+
+    def __init__(self, app, workers: int, preload: Optional[Callable[[], None]] = None,
+                 max_requests: int = 0, max_requests_jitter: int = 0,
+                 intra_op_threads: int = 0, inter_op_threads: int = 1,
+                 uvicorn_options: Optional[dict] = None):
+        self.app = app
+        self.workers = max(1, int(workers))
+        self.preload = preload
+        self.max_requests = max(0, int(max_requests))
+        self.max_requests_jitter = max(0, int(max_requests_jitter))
+        # 0 = split the cores evenly between workers
+        self.intra_op_threads = intra_op_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.inter_op_threads = max(1, inter_op_threads)
+        self.uvicorn_options = uvicorn_options or {}
+        # pid -> (worker index, fork time)
+        self.children: Dict[int, tuple] = {}
+        self.restarts = 0
+        self._stopping = False
+
+    def run(self, host: str, port: int):
+        limit_threads(self.intra_op_threads, self.inter_op_threads)
+        if self.preload is not None:
+            start_time = time.time()
+            self.preload()
+            logger.info(f"Preloaded models in the parent in {time.time() - start_time:.1f}s")
+        # Objects created so far are never collected, so the GC never writes to their pages
+        gc.collect()
+        gc.freeze()
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        logger.info(
+            f"Pre-fork server on {host}:{port}: {self.workers} workers, "
+            f"{self.intra_op_threads} intra-op / {self.inter_op_threads} inter-op threads each, "
+            f"max_requests={self.max_requests or 'unlimited'}"
+        )
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for index in range(self.workers):
+            self._spawn(index, sock)
+        self._supervise(sock)
+        sock.close()
+
+    def _spawn(self, index: int, sock: socket.socket):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self._serve(index, sock)
+                code = 0
+            except BaseException:
+                logger.exception(f"Worker {index} failed")
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        self.children[pid] = (index, time.time())
+
+    def _supervise(self, sock: socket.socket):
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            index, started = self.children.pop(pid, (None, 0.0))
+            if index is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if self._stopping:
+                continue
+            if code != 0 and time.time() - started < CRASH_WINDOW_SECONDS:
+                logger.error(f"Worker {index} (pid {pid}) exited with {code} right after starting")
+                time.sleep(CRASH_BACKOFF_SECONDS)
+            else:
+                logger.info(f"Worker {index} (pid {pid}) exited with {code}, replacing it")
+            self.restarts += 1
+            self._spawn(index, sock)
+
+    def _stop(self, signum, frame):
+        """Ask every worker to shut down gracefully; the supervisor loop waits for them."""
+        if self._stopping:
+            return
+        self._stopping = True
+        logger.info(f"Stopping {len(self.children)} workers")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _serve(self, index: int, sock: socket.socket):
+        """Worker process body: one uvicorn server on the inherited socket."""
+        global _worker
+        import uvicorn
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_DFL)
+        # Forked children share the parent's random state; reseed for the jitter
+        random.seed()
+        limit = self.max_requests + random.randint(0, self.max_requests_jitter) if self.max_requests else 0
+        _worker = {'index': index, 'pid': os.getpid(), 'requests': 0, 'max_requests': limit or None}
+
+        config = uvicorn.Config(self._counting_app, interface='asgi3', **self.uvicorn_options)
+        server = uvicorn.Server(config)
+
+        def count_request():
+            _worker['requests'] += 1
+            if limit and _worker['requests'] >= limit and not server.should_exit:
+                logger.info(f"Worker {index} served {limit} requests, recycling")
+                server.should_exit = True
+
+        self._count_request = count_request
+        server.run(sockets=[sock])
+
+    async def _counting_app(self, scope, receive, send):
+        if scope['type'] == 'http':
+            self._count_request()
+        await self.app(scope, receive, send)
@@ -0,0 +1,119 @@
+import struct
+from typing import Iterable, Optional, Tuple
+
+import msgpack
+import numpy as np
+import orjson
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+NDJSON = 'application/x-ndjson'
+OCTET_STREAM = 'application/octet-stream'
+# Pre-decoded pixels: TENSOR_HEADER, then N*H*W*C values in C order
+TENSOR = 'application/x-agri-tensor'
+
+# magic, version, dtype code, 2 padding bytes, then N, H, W, C as uint16 (16 bytes)
+TENSOR_HEADER = struct.Struct('<4sBBxxHHHH')
+TENSOR_MAGIC = b'AGTN'
+TENSOR_VERSION = 1
+# Only uint8 pixels are accepted; the codes leave room for others
+TENSOR_DTYPES = {1: np.dtype(np.uint8)}
+
+# Other names clients send for MessagePack
+_ALIASES = {
+    'application/x-msgpack': MSGPACK,
+    'application/vnd.msgpack': MSGPACK,
+}
+
+class UnsupportedMediaType(ValueError):
+    pass
+
+def media_type(header: Optional[str]) -> str:
+    """``Content-Type``/``Accept`` entry without parameters, lowercased; JSON when missing."""
+    if not header:
+        return JSON
+    base = header.split(';', 1)[0].strip().lower()
+    return _ALIASES.get(base, base)
+
+def negotiate(accept: Optional[str], offered: Iterable[str]) -> str:
+    """Pick the response type from an ``Accept`` header.
+
+    Highest q-value wins, ties go to the server's order in ``offered``. A
+    missing header, ``*/*`` or nothing acceptable gives the first offered
+    type, so clients that do not negotiate keep getting JSON.
+    """
+    offered = tuple(offered)
+    if not accept:
+        return offered[0]
+    best, best_q = offered[0], 0.0
+    for entry in accept.split(','):
+        base, _, params = entry.partition(';')
+        name = media_type(base)
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name in ('*/*', 'application/*'):
+            candidates = offered[:1]
+        else:
+            candidates = [name] if name in offered else []
+        for candidate in candidates:
+            better = q > best_q or (q == best_q and offered.index(candidate) < offered.index(best))
+            if q > 0 and better:
+                best, best_q = candidate, q
+    return best
+
+def _msgpack_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def dumps(content, media: str = JSON) -> bytes:
+    """Serialize a response body. NumPy scalars and arrays are accepted as-is."""
+    if media == MSGPACK:
+        return msgpack.packb(content, default=_msgpack_default, use_bin_type=True)
+    return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+def loads(body: bytes, media: str = JSON):
+    """Parse a request body. Malformed bodies raise ``ValueError`` (both decoders' errors subclass it)."""
+    if media == MSGPACK:
+        return msgpack.unpackb(body, raw=False)
+    if media == JSON:
+        return orjson.loads(body)
+    raise UnsupportedMediaType(f"Unsupported Content-Type {media}. Send {JSON} or {MSGPACK}")
+
+def pack_tensor(array: np.ndarray) -> bytes:
+    """Client side of ``TENSOR``: an (N, H, W, C) uint8 array as a request body."""
+    codes = {dtype: code for code, dtype in TENSOR_DTYPES.items()}
+    if array.ndim != 4 or array.dtype not in codes:
+        raise ValueError(f"Expected an (N, H, W, C) uint8 array, got {array.shape} {array.dtype}")
+    return TENSOR_HEADER.pack(TENSOR_MAGIC, TENSOR_VERSION, codes[array.dtype], *array.shape) + np.ascontiguousarray(array).tobytes()
+
+def unpack_tensor(body: bytes, item_shape: Tuple[int, int, int]) -> np.ndarray:
+    """Read-only (N, H, W, C) view of a ``TENSOR`` body, without copying the pixels.
+
+    The header must match ``item_shape`` (H, W, C) and uint8 exactly, and the
+    body must hold exactly N items; anything else raises ``ValueError``.
+    """
+    if len(body) < TENSOR_HEADER.size:
+        raise ValueError(f"Tensor body shorter than its {TENSOR_HEADER.size}-byte header")
+    magic, version, code, count, *shape = TENSOR_HEADER.unpack_from(body)
+    if magic != TENSOR_MAGIC or version != TENSOR_VERSION:
+        raise ValueError(f"Not a version {TENSOR_VERSION} tensor body (magic {magic!r}, version {version})")
+    dtype = TENSOR_DTYPES.get(code)
+    if dtype is None:
+        raise ValueError(f"Unsupported tensor dtype code {code}. Only uint8 (1) is accepted")
+    if tuple(shape) != tuple(item_shape):
+        raise ValueError(f"Tensor items must be {tuple(item_shape)} (H, W, C), got {tuple(shape)}")
+    if count < 1:
+        raise ValueError("Tensor body holds no items")
+    expected = TENSOR_HEADER.size + count * int(np.prod(item_shape)) * dtype.itemsize
+    if len(body) != expected:
+        raise ValueError(f"Tensor body is {len(body)} bytes, header says {expected}")
+    return np.frombuffer(body, dtype=dtype, offset=TENSOR_HEADER.size).reshape(count, *item_shape)
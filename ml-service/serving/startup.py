@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+MODEL_STATES = ('pending', 'loading', 'ready', 'failed')
+
+class StartupTracker:
+    """Loads models concurrently and tracks per-model readiness.
+
+    Each ``load`` runs its blocking loader in a thread, so several models
+    deserialize in parallel while the event loop keeps answering liveness
+    and readiness probes. A loader that raises marks only its own model as
+    failed; the service keeps serving whatever did load.
+
+    A model counts as ready only once ``mark_ready`` is called, which lets
+    the caller finish wiring (executor workers, batchers) first.
+    """
+
+    def __init__(self, model_names: Iterable[str]):
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+        # Service-level phase timings in ms (e.g. module import)
+        self.phases: Dict[str, float] = {}
+        self.models: Dict[str, dict] = {
+            name: {'status': 'pending', 'error': None, 'load_ms': None} for name in model_names
+        }
+
+    def record_phase(self, name: str, duration_ms: float):
+        self.phases[name] = round(duration_ms, 1)
+
+    async def load(self, name: str, loader: Callable[[], object]) -> Optional[object]:
+        """Run ``loader`` in a thread. Returns the loaded model, or None if it failed."""
+        return await asyncio.to_thread(self.load_now, name, loader)
+
+    def load_now(self, name: str, loader: Callable[[], object]) -> Optional[object]:
+        """Blocking ``load``, for loading before the event loop exists (pre-fork parent)."""
+        state = self.models[name]
+        state['status'] = 'loading'
+        start_time = time.time()
+        try:
+            model = loader()
+        except Exception as e:
+            state.update(status='failed', error=f"{type(e).__name__}: {e}")
+            logger.error(f"Failed to load {name} model: {e}")
+            return None
+        finally:
+            state['load_ms'] = round((time.time() - start_time) * 1000, 1)
+        logger.info(f"{name} model loaded in {state['load_ms']}ms")
+        return model
+
+    def mark_ready(self, name: str):
+        self.models[name]['status'] = 'ready'
+        if self.ready_at is None and self.is_ready():
+            self.ready_at = time.time()
+            logger.info(f"All models ready {self.ready_at - self.started_at:.1f}s after startup")
+
+    def mark_failed(self, name: str, error: str):
+        self.models[name].update(status='failed', error=error)
+
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        """Whether ``name`` (or, without a name, every model) is ready to serve."""
+        if name is not None:
+            return self.models[name]['status'] == 'ready'
+        return all(state['status'] == 'ready' for state in self.models.values())
+
+    @property
+    def status(self) -> str:
+        """ready, starting (still loading) or degraded (a model failed)."""
+        states = {state['status'] for state in self.models.values()}
+        if 'failed' in states:
+            return 'degraded'
+        return 'ready' if states == {'ready'} else 'starting'
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'status': self.status,
+            'models': {name: dict(state) for name, state in self.models.items()},
+            'phases': self.phases,
+            'ready_after_seconds': round(self.ready_at - self.started_at, 2) if self.ready_at else None,
+        }
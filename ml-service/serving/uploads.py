@@ -0,0 +1,168 @@
+import io
+import json
+import warnings
+from typing import Dict, Iterable, Optional, Tuple
+
+from PIL import Image
+from starlette.datastructures import UploadFile
+from starlette.exceptions import HTTPException
+
+# Formats the pest model accepts, identified by their leading bytes
+IMAGE_FORMATS = ('jpeg', 'png', 'webp')
+
+# Read this much of an upload to find the format and dimensions. JPEG metadata
+# (EXIF, XMP, ICC) before the frame header is normally well under this; a
+# header that does not fit is retried on the whole file
+HEADER_BYTES = 256 * 1024
+
+# Multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+def sniff_format(head: bytes) -> Optional[str]:
+    """Image format from the magic bytes, or None if it is not an accepted one."""
+    if head[:3] == b'\xff\xd8\xff':
+        return 'jpeg'
+    if head[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+class UploadRejected(Exception):
+    """An upload refused before decoding; ``code`` matches the API error codes."""
+
+    def __init__(self, status_code: int, code: str, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+
+class UploadLimits:
+    """Per-image limits checked from the byte count and the image header alone."""
+
+    def __init__(self, max_bytes: int, max_pixels: int, formats: Iterable[str] = IMAGE_FORMATS):
+        self.max_bytes = int(max_bytes)
+        self.max_pixels = int(max_pixels)
+        self.formats = tuple(formats)
+        unknown = set(self.formats) - set(IMAGE_FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown upload formats {sorted(unknown)}. Expected some of {IMAGE_FORMATS}")
+
+    def check_header(self, data: bytes, complete: bool = True) -> Tuple[str, int, int]:
+        """Format, width and height from the magic bytes and the header, without decoding pixels.
+
+        ``data`` may be just the start of the file (``complete=False``); if the
+        header does not fit in it, raises ``EOFError`` so the caller can retry
+        with the whole file.
+        """
+        image_format = sniff_format(data)
+        if image_format is None or image_format not in self.formats:
+            raise UploadRejected(400, 'INVALID_FILE_TYPE',
+                                 f"Invalid file type. Please upload an image file ({', '.join(self.formats)}).")
+        try:
+            # Image.open parses the header only; pixels are decoded on first access
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+                with Image.open(io.BytesIO(data)) as image:
+                    width, height = image.size
+        except Image.DecompressionBombError:
+            raise UploadRejected(413, 'IMAGE_TOO_LARGE',
+                                 f"Image dimensions too large. At most {self.max_pixels} pixels.")
+        except Exception:
+            if not complete:
+                raise EOFError("Image header extends past the bytes read")
+            raise UploadRejected(400, 'INVALID_IMAGE', "Could not read the image header.")
+        if width * height > self.max_pixels:
+            raise UploadRejected(413, 'IMAGE_TOO_LARGE',
+                                 f"Image dimensions too large ({width}x{height}). At most {self.max_pixels} pixels.")
+        return image_format, width, height
+
+def _check_size(size: int, limits: UploadLimits):
+    if size > limits.max_bytes:
+        raise UploadRejected(413, 'FILE_TOO_LARGE',
+                             f"File too large. At most {limits.max_bytes // (1024 * 1024)}MB per image.")
+
+def check_image_bytes(data: bytes, limits: UploadLimits) -> bytes:
+    """``read_image_upload`` for an image already in memory (a raw request body)."""
+    _check_size(len(data), limits)
+    limits.check_header(data)
+    return data
+
+async def read_image_upload(upload: UploadFile, limits: UploadLimits) -> bytes:
+    """Check an uploaded image's size, format and dimensions, then return its bytes.
+
+    The size comes from the spooled file and the checks read only the first
+    ``HEADER_BYTES``, so an oversized or mislabeled upload is rejected without
+    being read into memory. The returned ``bytes`` is the only copy made: the
+    decoder wraps it in ``io.BytesIO``, which shares the buffer.
+    """
+    size = upload.size
+    if size is None:
+        size = upload.file.seek(0, io.SEEK_END)
+        await upload.seek(0)
+    _check_size(size, limits)
+
+    head = await upload.read(HEADER_BYTES)
+    await upload.seek(0)
+    try:
+        limits.check_header(head, complete=len(head) >= size)
+    except EOFError:
+        data = await upload.read()
+        limits.check_header(data)
+        return data
+    return await upload.read()
+
+class BodyTooLarge(HTTPException):
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=413, detail=f"Request body too large. At most {max_bytes} bytes.")
+
+class BodySizeLimitMiddleware:
+    """Caps request bodies by path while they stream in.
+
+    A ``Content-Length`` over the limit is answered with 413 before any of the
+    body is read. Bodies without one (chunked) are counted as they arrive, and
+    the request fails with 413 as soon as the count passes the limit, instead
+    of after the whole upload has been spooled by the form parser.
+    """
+
+    def __init__(self, app, default_max_bytes: int, max_bytes_by_path: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.default_max_bytes = int(default_max_bytes)
+        self.max_bytes_by_path = dict(max_bytes_by_path or {})
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        limit = self.max_bytes_by_path.get(scope['path'], self.default_max_bytes)
+        if limit <= 0:
+            return await self.app(scope, receive, send)
+
+        for name, value in scope['headers']:
+            if name == b'content-length':
+                if value.isdigit() and int(value) > limit:
+                    return await self._reject(send, limit)
+                break
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    # Raised inside body parsing; FastAPI and Starlette turn it into a 413 response
+                    raise BodyTooLarge(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, send, limit: int):
+        body = json.dumps({'detail': BodyTooLarge(limit).detail}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                        (b'connection', b'close')],
+        })
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,47 @@
+"""A request without X-Internal-Key is refused before its body is parsed."""
+import asyncio
+
+import httpx
+import msgpack
+import pytest
+
+import main
+
+KEY = "test-key"
+MSGPACK = {"content-type": "application/msgpack"}
+
+@pytest.fixture(autouse=True)
+def internal_key(monkeypatch):
+    monkeypatch.setenv("INTERNAL_API_KEY", KEY)
+
+def post(path: str, **kwargs) -> httpx.Response:
+    async def send():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, **kwargs)
+    return asyncio.run(send())
+
+def test_soil_without_key_is_401():
+    response = post("/predict/soil", json={})
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Invalid or missing internal API key"}
+
+def test_soil_msgpack_without_key_is_401():
+    response = post("/predict/soil", content=msgpack.packb({"ph": 20}), headers=MSGPACK)
+    assert response.status_code == 401
+
+def test_soil_batch_without_key_is_401():
+    response = post("/predict/soil/batch", json={"ph": [20]})
+    assert response.status_code == 401
+
+def test_pest_batch_msgpack_without_key_is_401():
+    response = post("/predict/pest/batch", content=msgpack.packb({"images": [b"not an image"]}), headers=MSGPACK)
+    assert response.status_code == 401
+
+def test_soil_wrong_key_is_401():
+    response = post("/predict/soil", json={}, headers={"X-Internal-Key": "wrong"})
+    assert response.status_code == 401
+
+def test_soil_with_key_validates_body():
+    response = post("/predict/soil", json={}, headers={"X-Internal-Key": KEY})
+    assert response.status_code == 422
@@ -0,0 +1,32 @@
+"""MicroBatcher shutdown never leaves a caller waiting."""
+import asyncio
+
+from serving.batching import MicroBatcher
+
+def test_stop_fails_items_being_collected():
+    async def run():
+        batcher = MicroBatcher(lambda items: items, max_batch_size=8, max_wait_ms=5000)
+        await batcher.start()
+        callers = [asyncio.create_task(batcher.submit(i)) for i in range(3)]
+        await asyncio.sleep(0.05)
+        # Off the queue, waiting for the batch to fill
+        assert batcher._queue.qsize() == 0
+        await batcher.stop()
+        return await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), 1)
+    results = asyncio.run(run())
+    assert [type(result) for result in results] == [RuntimeError] * 3
+
+def test_stop_fails_queued_items():
+    async def run():
+        gate = asyncio.Event()
+        async def slow(items):
+            await gate.wait()
+            return items
+        batcher = MicroBatcher(slow, max_batch_size=1, max_wait_ms=0)
+        await batcher.start()
+        callers = [asyncio.create_task(batcher.submit(i)) for i in range(3)]
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        return await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), 1)
+    results = asyncio.run(run())
+    assert [type(result) for result in results] == [RuntimeError] * 3
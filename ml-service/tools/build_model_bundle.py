@@ -0,0 +1,88 @@
+"""Convert the trained soil and pest models into the versioned model bundle.
+
+Reads ``weights/soil_model.pkl`` and ``weights/pest_model_best.h5`` (through
+the same compatibility shim the service uses) and writes their bundle
+sections (see models/artifacts.py). The service then loads the bundle
+instead of unpickling and rebuilding Keras layers on every start.
+
+Run from the ml-service directory:
+
+    python -m tools.build_model_bundle                          # both models
+    python -m tools.build_model_bundle --only soil
+    python -m tools.build_model_bundle --pest-formats tflite onnx
+    python -m tools.build_model_bundle --stand-in --output-dir /tmp/bundle
+    python -m tools.build_model_bundle --verify                 # check file hashes
+"""
+import argparse
+import json
+import logging
+import os
+import pickle
+import sys
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+from models.artifacts import DEFAULT_BUNDLE_DIR, ModelBundle, write_pest_section, write_soil_section
+from models.pest_engines import ENGINE_ARTIFACTS
+
+WEIGHTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'weights')
+
+def bundle_soil(args):
+    if args.stand_in:
+        from benchmarks import stand_ins
+        model = stand_ins.build_soil_model(engine='xgboost')
+        artifacts = {'model': model.model, 'class_names': model.class_names, 'features': model.features}
+    else:
+        with open(args.soil_pickle, 'rb') as f:
+            artifacts = pickle.load(f)
+    metadata = {key: artifacts[key] for key in ('accuracy', 'n_classes') if key in artifacts}
+    return write_soil_section(artifacts['model'], artifacts['class_names'], artifacts['features'],
+                              args.output_dir, **metadata)
+
+def bundle_pest(args):
+    if args.stand_in:
+        from benchmarks import stand_ins
+        model = stand_ins.build_pest_model()
+        keras_model, class_labels = model.model, model.class_labels
+    else:
+        from models.pest_detection import load_keras_model
+        keras_model = load_keras_model(args.pest_h5)
+        with open(os.path.join(WEIGHTS_DIR, 'pest_class_labels.json')) as f:
+            class_labels = json.load(f)['idx_to_class']
+    return write_pest_section(keras_model, class_labels, args.output_dir, args.pest_formats, args.quantize)
+
+def run(args) -> bool:
+    if not args.verify:
+        for section in args.only:
+            version = bundle_soil(args) if section == 'soil' else bundle_pest(args)
+            print(f"{section}: {version}")
+
+    bundle = ModelBundle.open(args.output_dir)
+    passed = True
+    for section in ('soil', 'pest'):
+        if not bundle.has(section):
+            continue
+        entry = bundle.section(section)
+        mismatched = bundle.verify(section) if args.verify else []
+        passed &= not mismatched
+        status = f"MISMATCHED {mismatched}" if mismatched else ('ok' if args.verify else '')
+        print(f"{section:>5} {entry['version']} {entry['bytes'] / 1024 / 1024:8.2f} MB "
+              f"{len(entry['files'])} files {entry['created_at']} {status}")
+    return passed
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=['soil', 'pest'], default=['soil', 'pest'])
+    parser.add_argument('--output-dir', default=DEFAULT_BUNDLE_DIR, help='Bundle directory (default: weights/bundle)')
+    parser.add_argument('--soil-pickle', default=os.path.join(WEIGHTS_DIR, 'soil_model.pkl'))
+    parser.add_argument('--pest-h5', default=os.path.join(WEIGHTS_DIR, ENGINE_ARTIFACTS['keras']))
+    parser.add_argument('--pest-formats', nargs='*', default=[], choices=['tflite', 'onnx'],
+                        help='Also convert these pest engine artifacts into the bundle')
+    parser.add_argument('--quantize', action='store_true', help='Dynamic-range quantize the TFLite model')
+    parser.add_argument('--stand-in', action='store_true', help='Bundle the stand-in models instead')
+    parser.add_argument('--verify', action='store_true', help='Only check the bundle files against the manifest')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(0 if run(parse_args()) else 1)
@@ -0,0 +1,122 @@
+"""Build the first-stage pest classifier for the confidence-gated cascade.
+
+The first stage must take the same 224x224x3 input and predict the same
+classes as the full model; it only has to be cheaper. Two ways to get one:
+
+- ``quantize`` (default): the full ``pest_model_best.h5`` as a
+  dynamic-range quantized TFLite model. No training, same architecture,
+  int8 weights.
+- ``distill``: a MobileNetV2 (width ``--alpha``) on a ``--input-size``
+  downscale of the input, trained on the full model's soft labels for the
+  images in ``--images``. Unlabeled field photos are enough, the teacher
+  provides the targets.
+
+Either way the result is written as ``weights/pest_first_stage.tflite``, ready
+for ``PEST_CASCADE_THRESHOLD`` with ``PEST_CASCADE_ENGINE=tflite``. Pick the
+threshold with ``benchmarks.cascade_report``.
+
+Run from the ml-service directory:
+
+    python -m tools.build_pest_first_stage
+    python -m tools.build_pest_first_stage --method distill --images path/to/photos --epochs 5
+"""
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+import tensorflow as tf
+
+from models.pest_detection import INPUT_SIZE, PestDetectionModel, load_keras_model
+from models.pest_engines import ENGINE_ARTIFACTS, FIRST_STAGE_ARTIFACTS
+from models.pest_export import convert_tflite
+
+logger = logging.getLogger(__name__)
+
+WEIGHTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'weights')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+def build_student(num_classes: int, input_size: int = 128, alpha: float = 0.35, backbone_weights=None):
+    """MobileNetV2 on a downscaled copy of the service's [0, 1] input, softmax over ``num_classes``."""
+    inputs = tf.keras.Input(shape=(INPUT_SIZE, INPUT_SIZE, 3))
+    x = tf.keras.layers.Resizing(input_size, input_size)(inputs)
+    # MobileNetV2 expects [-1, 1]
+    x = tf.keras.layers.Rescaling(2.0, offset=-1.0)(x)
+    backbone = tf.keras.applications.MobileNetV2(
+        input_shape=(input_size, input_size, 3), alpha=alpha, include_top=False,
+        weights=backbone_weights, pooling='avg',
+    )
+    outputs = tf.keras.layers.Dense(num_classes, activation='softmax')(backbone(x))
+    return tf.keras.Model(inputs, outputs)
+
+def teacher_targets(teacher, images: np.ndarray, batch_size: int) -> np.ndarray:
+    return np.concatenate([
+        teacher.predict(images[i:i + batch_size], verbose=0) for i in range(0, len(images), batch_size)
+    ])
+
+def load_images(directory: str, limit: int = None) -> np.ndarray:
+    """Every image under ``directory``, preprocessed exactly as the service does."""
+    preprocessor = PestDetectionModel(preprocess_mode='exact')
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory) for name in names
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[:limit]
+    if not paths:
+        raise ValueError(f"No images found under {directory}")
+    batch = np.empty((len(paths), INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+    for i, path in enumerate(paths):
+        with open(path, 'rb') as f:
+            batch[i] = preprocessor.preprocess_image(f.read())[0]
+    return batch
+
+def distill(teacher, images: np.ndarray, input_size: int = 128, alpha: float = 0.35, backbone_weights=None,
+            epochs: int = 5, batch_size: int = 32, validation_split: float = 0.1):
+    """Train a student to match the teacher's class probabilities (KL divergence)."""
+    targets = teacher_targets(teacher, images, batch_size)
+    student = build_student(targets.shape[1], input_size, alpha, backbone_weights)
+    student.compile(optimizer=tf.keras.optimizers.Adam(1e-3), loss=tf.keras.losses.KLDivergence())
+    student.fit(images, targets, epochs=epochs, batch_size=batch_size,
+                validation_split=validation_split if len(images) >= 20 else 0.0, verbose=2)
+
+    agreement = np.mean(np.argmax(teacher_targets(student, images, batch_size), 1) == np.argmax(targets, 1))
+    logger.info(f"Student top-1 agreement with the teacher on the training images: {agreement:.1%}")
+    return student
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--method', default='quantize', choices=['quantize', 'distill'])
+    parser.add_argument('--source', default=os.path.join(WEIGHTS_DIR, ENGINE_ARTIFACTS['keras']),
+                        help='Full Keras .h5 model (quantized, or the teacher)')
+    parser.add_argument('--output', default=os.path.join(WEIGHTS_DIR, FIRST_STAGE_ARTIFACTS['tflite']))
+    parser.add_argument('--images', help='Directory of training images for --method distill')
+    parser.add_argument('--limit', type=int, help='Use at most this many images')
+    parser.add_argument('--input-size', type=int, default=128, help='Student input resolution')
+    parser.add_argument('--alpha', type=float, default=0.35, help='MobileNetV2 width multiplier')
+    parser.add_argument('--backbone-weights', default='imagenet', choices=['imagenet', 'none'])
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--no-quantize', action='store_true', help='Keep the distilled student in float32')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    start = time.time()
+    teacher = load_keras_model(args.source)
+    if args.method == 'distill':
+        if not args.images:
+            raise SystemExit("--method distill needs --images")
+        first_stage = distill(
+            teacher, load_images(args.images, args.limit), args.input_size, args.alpha,
+            None if args.backbone_weights == 'none' else args.backbone_weights, args.epochs, args.batch_size,
+        )
+        convert_tflite(first_stage, os.path.abspath(args.output), quantize=not args.no_quantize)
+    else:
+        convert_tflite(teacher, os.path.abspath(args.output), quantize=True)
+    size_mb = os.path.getsize(os.path.abspath(args.output)) / 1024 / 1024
+    logger.info(f"Wrote {args.output} ({size_mb:.1f} MB) in {time.time() - start:.1f}s")
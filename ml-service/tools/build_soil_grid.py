@@ -0,0 +1,46 @@
+"""Build the soil lookup grid ahead of time and print its build report.
+
+The service builds the grid on first start with SOIL_GRID_ENABLED=true; run
+this during deployment instead so no instance pays the build at startup.
+The report lists grid size, build time and the worst-case probability error
+against the live model, both at grid nodes and for arbitrary readings
+answered from their nearest node.
+
+Run from the ml-service directory:
+
+    python -m tools.build_soil_grid
+    python -m tools.build_soil_grid --axes "ph=4:9:0.5,rainfall=0:300:25" --top-k 5
+    python -m tools.build_soil_grid --stand-in --output-dir /tmp/soil_grid
+"""
+import argparse
+import json
+import logging
+
+from models.soil_grid import parse_axes
+from models.soil_recommendation import FEATURE_NAMES, SoilRecommendationModel
+
+def run(args):
+    options = {
+        'grid_axes': parse_axes(args.axes, FEATURE_NAMES),
+        'grid_top_k': args.top_k,
+        'grid_dir': args.output_dir,
+    }
+    if args.stand_in:
+        from benchmarks import stand_ins
+        model = stand_ins.build_soil_model(**options)
+    else:
+        model = SoilRecommendationModel(**options)
+        model.load()
+    print(json.dumps(model.grid.report, indent=2))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--axes', default='', help='Axis overrides, "feature=low:high:step,..."')
+    parser.add_argument('--top-k', type=int, default=3, help='Crops stored per grid node')
+    parser.add_argument('--output-dir', default=None, help='Grid directory (default: weights/soil_grid)')
+    parser.add_argument('--stand-in', action='store_true', help='Use the stand-in soil model')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    run(parse_args())
@@ -0,0 +1,36 @@
+"""Convert the trained pest classifier to TFLite and ONNX artifacts.
+
+Reads ``weights/pest_model_best.h5`` (through the same compatibility shim the
+service uses) and writes ``pest_model.tflite`` and/or ``pest_model.onnx`` next
+to it, ready for ``PEST_ENGINE=tflite`` / ``PEST_ENGINE=onnx``.
+
+Run from the ml-service directory:
+
+    python -m tools.convert_pest_model
+    python -m tools.convert_pest_model --formats tflite --quantize
+"""
+import argparse
+import logging
+import os
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+from models.pest_detection import load_keras_model
+from models.pest_engines import ENGINE_ARTIFACTS
+from models.pest_export import convert
+
+WEIGHTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'weights')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', default=os.path.join(WEIGHTS_DIR, ENGINE_ARTIFACTS['keras']),
+                        help='Keras .h5 model to convert')
+    parser.add_argument('--output-dir', default=WEIGHTS_DIR)
+    parser.add_argument('--formats', nargs='+', default=['tflite', 'onnx'], choices=['tflite', 'onnx'])
+    parser.add_argument('--quantize', action='store_true', help='Dynamic-range quantize the TFLite model')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    convert(load_keras_model(args.source), args.output_dir, args.formats, args.quantize)
@@ -0,0 +1,275 @@
+"""Re-score exported SoilReading rows offline into columnar files.
+
+Streams a CSV or Parquet export of the SoilReading table in ``--chunk-rows``
+chunks, scores each chunk with ``SoilRecommendationModel.score_matrix`` in
+a pool of worker processes (each loads the model once) and writes one
+``part-NNNNN.parquet`` (or ``.npz``) per chunk to ``--output-dir``. At most
+two chunks per worker are read ahead, so memory stays bounded whatever the
+input size.
+
+Progress is checkpointed in ``manifest.json`` next to the parts: the
+settings (input file, chunk size, model and rules versions) and every chunk
+written so far. Running the same command again skips the finished chunks;
+if the input or the model changed it refuses to mix results unless given
+``--restart``.
+
+Rows with a missing or out-of-range feature are not scored; they are kept
+with ``status`` "invalid" and empty score columns. ``issue_flags`` bit i
+stands for ``manifest.json["issues"][i]``.
+
+Parquet input or output needs pyarrow (``pip install pyarrow``); CSV input
+with ``--format npz`` only needs the service requirements.
+
+Run from the ml-service directory:
+
+    python -m tools.score_soil_readings soil_readings.csv --output-dir /tmp/rescored
+    python -m tools.score_soil_readings soil_readings.parquet --output-dir rescored --workers 4
+    python -m tools.score_soil_readings soil_readings.csv --output-dir /tmp/rescored --stand-in --format npz
+"""
+import argparse
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from models.soil_recommendation import FEATURE_BOUNDS, FEATURE_NAMES, SoilRecommendationModel
+from serving.executor import build_and_load
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('parquet', 'npz')
+MANIFEST = 'manifest.json'
+
+# Model owned by a pool worker (or this process with --workers 1)
+_worker_model = None
+
+def _init_worker(factory):
+    global _worker_model
+    _worker_model = factory()
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet input/output needs pyarrow: pip install pyarrow (or use CSV and --format npz)")
+    return pa, pq
+
+def read_chunks(path: str, chunk_rows: int, id_column: str, crop_column: str):
+    """Yield ``(index, chunk)`` per ``chunk_rows`` rows of a CSV or Parquet export."""
+    if path.endswith('.parquet'):
+        _, pq = _pyarrow()
+        parquet = pq.ParquetFile(path)
+        available = parquet.schema_arrow.names
+    else:
+        available = list(pd.read_csv(path, nrows=0).columns)
+    missing = [name for name in FEATURE_NAMES if name not in available]
+    if missing:
+        raise SystemExit(f"{path} has no column(s) {', '.join(missing)}")
+    id_column = id_column if id_column in available else None
+    crop_column = crop_column if crop_column in available else None
+    names = FEATURE_NAMES + [name for name in (id_column, crop_column) if name]
+
+    if path.endswith('.parquet'):
+        frames = (batch.to_pandas() for batch in parquet.iter_batches(batch_size=chunk_rows, columns=names))
+    else:
+        frames = pd.read_csv(path, usecols=names, chunksize=chunk_rows, dtype={name: object for name in names[7:]})
+
+    offset = 0
+    for index, frame in enumerate(frames):
+        features = np.column_stack([
+            pd.to_numeric(frame[name], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            for name in FEATURE_NAMES
+        ])
+        crops = None
+        if crop_column:
+            crops = frame[crop_column].astype(object).where(frame[crop_column].notna(), None).to_numpy()
+        yield index, {
+            'row': np.arange(offset, offset + len(frame), dtype=np.int64),
+            'id': frame[id_column].to_numpy() if id_column else None,
+            'features': features,
+            'crops': crops,
+        }
+        offset += len(frame)
+
+def score_chunk(index: int, chunk: dict, path: str, fmt: str, top_k: int) -> tuple:
+    """Score one chunk with the worker's model and write it to ``path``; returns (index, rows, invalid)."""
+    features = chunk['features']
+    valid = np.isfinite(features).all(axis=1) & (
+        (features >= FEATURE_BOUNDS[:, 0]) & (features <= FEATURE_BOUNDS[:, 1])
+    ).all(axis=1)
+    crops = chunk['crops']
+    scores = _worker_model.score_matrix(features[valid], None if crops is None else crops[valid].tolist(), top_k)
+
+    columns = {'row': chunk['row']}
+    if chunk['id'] is not None:
+        columns['id'] = chunk['id']
+    columns['status'] = np.where(valid, 'ok', 'invalid').astype(object)
+    for name, values in scores.items():
+        columns[name] = _scatter(values, valid)
+    write_part(path, columns, fmt)
+    return index, len(valid), int(len(valid) - valid.sum())
+
+def _scatter(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Spread scores of the valid rows back over the whole chunk; empty for the rest."""
+    if valid.all():
+        return values
+    if values.dtype == object:
+        full = np.full(len(valid), None, dtype=object)
+    elif values.dtype.kind == 'f':
+        full = np.full(len(valid), np.nan)
+    else:
+        full = np.zeros(len(valid), dtype=values.dtype)
+    full[valid] = values
+    return full
+
+def write_part(path: str, columns: dict, fmt: str):
+    """Write one part atomically, so an interrupted run never leaves a truncated part behind."""
+    tmp_path = f"{path}.tmp"
+    if fmt == 'parquet':
+        pa, pq = _pyarrow()
+        pq.write_table(pa.table({name: pa.array(values) for name, values in columns.items()}), tmp_path)
+    else:
+        arrays = {
+            name: np.where(pd.isna(values), '', values).astype(str) if values.dtype == object else values
+            for name, values in columns.items()
+        }
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+def part_path(output_dir: str, index: int, fmt: str) -> str:
+    return os.path.join(output_dir, f'part-{index:05d}.{fmt}')
+
+def write_manifest(output_dir: str, manifest: dict):
+    path = os.path.join(output_dir, MANIFEST)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+def resume(args, settings: dict) -> dict:
+    """Chunks already written by an earlier run with the same settings."""
+    path = os.path.join(args.output_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        previous = json.load(f)
+    if previous['settings'] != settings:
+        if not args.restart:
+            changed = sorted(k for k in settings if previous['settings'].get(k) != settings[k])
+            raise SystemExit(f"{path} was written with different {', '.join(changed)}; pass --restart to start over")
+        for name in os.listdir(args.output_dir):
+            if name.startswith('part-') or name == MANIFEST:
+                os.remove(os.path.join(args.output_dir, name))
+        return {}
+    return {
+        int(index): counts for index, counts in previous['completed'].items()
+        if os.path.exists(part_path(args.output_dir, int(index), settings['format']))
+    }
+
+def run(args) -> dict:
+    os.makedirs(args.output_dir, exist_ok=True)
+    options = {'engine': args.engine, 'rules_path': args.rules}
+    if args.stand_in:
+        from benchmarks import stand_ins
+        factory = functools.partial(stand_ins.build_soil_model, **options)
+    else:
+        factory = functools.partial(build_and_load, SoilRecommendationModel, warm_up=True, **options)
+    model = factory()
+
+    stat = os.stat(args.input)
+    settings = {
+        'input': os.path.abspath(args.input),
+        'input_bytes': stat.st_size,
+        'input_mtime_ns': stat.st_mtime_ns,
+        'chunk_rows': args.chunk_rows,
+        'format': args.format,
+        'top_k': args.top_k,
+        'id_column': args.id_column,
+        'crop_column': args.crop_column,
+        'model_version': model.model_version,
+        'rules_version': model.rules.version,
+    }
+    completed = resume(args, settings)
+    manifest = {'settings': settings, 'issues': model.rules.issue_texts, 'completed': completed, 'finished': False}
+    write_manifest(args.output_dir, manifest)
+    if completed:
+        logger.info(f"Resuming: {len(completed)} chunk(s) already written")
+
+    start = time.perf_counter()
+    scored_rows = 0
+
+    def record(index: int, rows: int, invalid: int):
+        nonlocal scored_rows
+        scored_rows += rows
+        completed[index] = {'rows': rows, 'invalid': invalid}
+        write_manifest(args.output_dir, manifest)
+        rate = scored_rows / (time.perf_counter() - start)
+        logger.info(f"Chunk {index}: {rows} rows ({invalid} invalid); {scored_rows} rows this run, {rate:,.0f} rows/s")
+
+    chunks = read_chunks(args.input, args.chunk_rows, args.id_column, args.crop_column)
+    todo = ((index, chunk) for index, chunk in chunks if index not in completed)
+    if args.workers <= 1:
+        _init_worker(lambda: model)
+        for index, chunk in todo:
+            record(*score_chunk(index, chunk, part_path(args.output_dir, index, args.format), args.format, args.top_k))
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(factory,),
+        )
+        with pool:
+            pending = set()
+            for index, chunk in todo:
+                if len(pending) >= 2 * args.workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(*future.result())
+                pending.add(pool.submit(
+                    score_chunk, index, chunk, part_path(args.output_dir, index, args.format), args.format, args.top_k
+                ))
+            for future in wait(pending).done:
+                record(*future.result())
+
+    seconds = time.perf_counter() - start
+    manifest['finished'] = True
+    write_manifest(args.output_dir, manifest)
+    return {
+        'output_dir': os.path.abspath(args.output_dir),
+        'chunks': len(completed),
+        'rows': sum(counts['rows'] for counts in completed.values()),
+        'invalid_rows': sum(counts['invalid'] for counts in completed.values()),
+        'rows_this_run': scored_rows,
+        'seconds': round(seconds, 2),
+        'rows_per_second': round(scored_rows / seconds) if seconds > 0 else None,
+        'workers': args.workers,
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help='SoilReading export, .csv or .parquet')
+    parser.add_argument('--output-dir', required=True, help='Directory for the parts and manifest.json')
+    parser.add_argument('--format', default='parquet', choices=FORMATS)
+    parser.add_argument('--chunk-rows', type=int, default=100_000, help='Rows per chunk (and per part file)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Scoring processes; 1 scores in this process')
+    parser.add_argument('--engine', default='auto', choices=['xgboost', 'numpy', 'auto'])
+    parser.add_argument('--rules', help='Soil rules table (default data/soil_rules.json)')
+    parser.add_argument('--top-k', type=int, default=3, help='Recommended crops per reading')
+    parser.add_argument('--id-column', default='id', help='Passed through to the output when present')
+    parser.add_argument('--crop-column', default='selected_crop', help='Selected crop column, when present')
+    parser.add_argument('--restart', action='store_true', help='Discard parts written with other settings')
+    parser.add_argument('--stand-in', action='store_true', help='Use the stand-in soil model')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    print(json.dumps(run(parse_args()), indent=2))